@@ -0,0 +1,157 @@
+"""
+Memory-bounded fallback checkpointer, used when Postgres isn't reachable.
+
+Plain MemorySaver keeps every thread forever. BoundedMemorySaver keeps a byte
+budget (MEMORY_CHECKPOINT_MAX_BYTES, counted as serialized checkpoint, blob and
+write sizes) and evicts least-recently-used threads once it's exceeded. With
+MEMORY_CHECKPOINT_SPILL_DIR set, evicted threads are written to that directory
+and loaded back transparently the next time they're used; otherwise they're
+dropped. The thread being written is never evicted, so one thread larger than
+the budget still works.
+
+Listing without a thread_id only covers resident threads.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+import hashlib
+import os
+import pickle
+import threading
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.metrics import MEMORY_CHECKPOINT_THREADS, MEMORY_CHECKPOINT_BYTES, MEMORY_CHECKPOINT_EVICTIONS
+
+MEMORY_CHECKPOINT_MAX_BYTES = int(os.getenv("MEMORY_CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+MEMORY_CHECKPOINT_SPILL_DIR = os.getenv("MEMORY_CHECKPOINT_SPILL_DIR", "")
+
+
+class BoundedMemorySaver(MemorySaver):
+    def __init__(self, max_bytes: int = MEMORY_CHECKPOINT_MAX_BYTES, spill_dir: Optional[str] = MEMORY_CHECKPOINT_SPILL_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir or None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        self.total_bytes = 0
+        # thread_id -> resident bytes, least recently used first
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        # thread_id -> keys of its entries in self.writes / self.blobs
+        self._write_keys: Dict[str, Set[Tuple]] = {}
+        self._blob_keys: Dict[str, Set[Tuple]] = {}
+        self._spilled: Set[str] = set()
+        self._lock = threading.RLock()
+
+    # --- bookkeeping ---
+
+    def _spill_path(self, thread_id: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha256(thread_id.encode()).hexdigest() + ".pkl")
+
+    def _use(self, thread_id: str, added: int = 0):
+        """Mark `thread_id` most recently used (loading it back if spilled) and account `added` bytes."""
+        loaded = thread_id in self._spilled and self._load(thread_id)
+        if thread_id in self._lru or added:
+            self._lru[thread_id] = self._lru.get(thread_id, 0) + added
+            self._lru.move_to_end(thread_id)
+            self.total_bytes += added
+        if added or loaded:
+            self._evict(keep=thread_id)
+
+    def _evict(self, keep: str):
+        while self.total_bytes > self.max_bytes:
+            victim = next((t for t in self._lru if t != keep), None)
+            if victim is None:
+                break
+            state = self._remove(victim)
+            if self.spill_dir:
+                with open(self._spill_path(victim), "wb") as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._spilled.add(victim)
+            MEMORY_CHECKPOINT_EVICTIONS.labels("spilled" if self.spill_dir else "dropped").inc()
+        self._report()
+
+    def _remove(self, thread_id: str) -> Dict[str, Any]:
+        """Take a thread's entries out of memory (already-serialized tuples, as stored)."""
+        self.total_bytes -= self._lru.pop(thread_id, 0)
+        storage = self.storage.pop(thread_id, {})
+        return {
+            "storage": {ns: dict(checkpoints) for ns, checkpoints in storage.items()},
+            "writes": {k: self.writes.pop(k) for k in self._write_keys.pop(thread_id, ()) if k in self.writes},
+            "blobs": {k: self.blobs.pop(k) for k in self._blob_keys.pop(thread_id, ()) if k in self.blobs},
+        }
+
+    def _load(self, thread_id: str) -> bool:
+        self._spilled.discard(thread_id)
+        path = self._spill_path(thread_id)
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            os.remove(path)
+        except OSError:
+            return False
+        size = 0
+        for ns, checkpoints in state["storage"].items():
+            self.storage[thread_id][ns].update(checkpoints)
+            size += sum(len(c[1]) + len(m[1]) for c, m, _ in checkpoints.values())
+        self.writes.update(state["writes"])
+        self._write_keys[thread_id] = set(state["writes"])
+        size += sum(len(w[2][1]) for writes in state["writes"].values() for w in writes.values())
+        self.blobs.update(state["blobs"])
+        self._blob_keys[thread_id] = set(state["blobs"])
+        size += sum(len(b[1]) for b in state["blobs"].values())
+        self._lru[thread_id] = size
+        self.total_bytes += size
+        return True
+
+    def _report(self):
+        MEMORY_CHECKPOINT_THREADS.set(len(self._lru))
+        MEMORY_CHECKPOINT_BYTES.set(self.total_bytes)
+
+    # --- BaseCheckpointSaver ---
+
+    def get_tuple(self, config):
+        with self._lock:
+            self._use(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._lock:
+            if config:
+                self._use(config["configurable"]["thread_id"])
+            # Materialized under the lock: eviction mutates the dicts being iterated
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._use(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            saved, saved_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            keys = {(thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()}
+            self._blob_keys.setdefault(thread_id, set()).update(keys)
+            added = len(saved[1]) + len(saved_metadata[1]) + sum(len(self.blobs[k][1]) for k in keys)
+            self._use(thread_id, added)
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._lock:
+            self._use(thread_id)
+            before = sum(len(w[2][1]) for w in self.writes.get(key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add(key)
+            after = sum(len(w[2][1]) for w in self.writes.get(key, {}).values())
+            self._use(thread_id, after - before)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._remove(thread_id)
+            if thread_id in self._spilled:
+                self._spilled.discard(thread_id)
+                try:
+                    os.remove(self._spill_path(thread_id))
+                except OSError:
+                    pass
+            self._report()
@@ -0,0 +1,228 @@
+"""
+Compact, LLM-facing projections of tool results.
+
+Tools return full SQLModel rows (including the Todoist/Google `raw_data` blobs),
+which end up verbatim in every later prompt of the thread. The helpers here
+reduce each result to the handful of fields the agent actually reasons about,
+with short keys and normalized dates, and are applied at the tool boundary.
+"""
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+import json
+
+import dateutil.parser
+
+# Longest free-text field we hand to the model (descriptions, snippets)
+MAX_TEXT_CHARS = 200
+
+
+def _get(obj: Any, key: str, default=None):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _truncate(text: Optional[str], limit: int = MAX_TEXT_CHARS) -> Optional[str]:
+    if not text:
+        return None
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…"
+
+
+def normalize_date(value: Any, assume_utc: bool = False) -> Optional[str]:
+    """
+    Normalize a date/datetime (object or string) to a short ISO form:
+    'YYYY-MM-DD' for dates, 'YYYY-MM-DDTHH:MM' (UTC, 'Z' suffix if aware) for datetimes.
+    `assume_utc` marks naive datetimes as UTC (as Google Calendar times are taken without an offset).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        # Plain dates stay dates (Todoist due dates, all-day events)
+        if len(value) == 10:
+            return value
+        try:
+            value = dateutil.parser.parse(value)
+        except (ValueError, OverflowError):
+            try:
+                value = parsedate_to_datetime(value)  # RFC 2822 (email headers)
+            except (TypeError, ValueError):
+                return value
+    if isinstance(value, datetime):
+        if value.tzinfo is None and assume_utc:
+            value = value.replace(tzinfo=timezone.utc)
+        if value.tzinfo:
+            return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%MZ")
+        return value.strftime("%Y-%m-%dT%H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _drop_empty(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if v not in (None, "", [], {})}
+
+
+def _error_or(result: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(result, dict) and "error" in result:
+        return {"error": str(result["error"])}
+    return None
+
+
+# --- Per-entity schemas ---
+
+def compact_task(task: Any) -> Dict[str, Any]:
+    """Task -> {id, text, desc, pri, due, labels}. Priority is shown as Todoist UI 'p1'..'p4'."""
+    if error := _error_or(task):
+        return error
+    priority = _get(task, "priority") or 1
+    due = _get(task, "due_date")
+    if due is None and isinstance(_get(task, "due"), dict):
+        due = _get(task, "due").get("datetime") or _get(task, "due").get("date")
+    return _drop_empty({
+        "id": _get(task, "id"),
+        "text": _get(task, "content"),
+        "desc": _truncate(_get(task, "description")),
+        "pri": f"p{5 - int(priority)}",
+        "due": normalize_date(due),
+        "labels": _get(task, "labels"),
+    })
+
+
+def compact_event(event: Any) -> Dict[str, Any]:
+    """Event -> {id, title, start, end, desc}. All-day events show dates (end exclusive)."""
+    if error := _error_or(event):
+        return error
+    start = _get(event, "start_time") or _get(event, "start")
+    end = _get(event, "end_time") or _get(event, "end")
+    if _get(event, "all_day") and isinstance(start, datetime) and isinstance(end, datetime):
+        start, end = start.date(), end.date()
+    return _drop_empty({
+        "id": _get(event, "id"),
+        "title": _get(event, "summary"),
+        "start": normalize_date(start, assume_utc=True),
+        "end": normalize_date(end, assume_utc=True),
+        "desc": _truncate(_get(event, "description")),
+    })
+
+
+def compact_free_block(block: Any) -> Dict[str, Any]:
+    """Free block -> {start, end, min}."""
+    if error := _error_or(block):
+        return error
+    return _drop_empty({
+        "start": normalize_date(_get(block, "start")),
+        "end": normalize_date(_get(block, "end")),
+        "min": _get(block, "duration_minutes"),
+    })
+
+
+def compact_email(email: Any) -> Dict[str, Any]:
+    """Email -> {id, from, subj, date, snippet}."""
+    if error := _error_or(email):
+        return error
+    return _drop_empty({
+        "id": _get(email, "id"),
+        "from": _get(email, "from") or _get(email, "sender"),
+        "subj": _get(email, "subject"),
+        "date": normalize_date(_get(email, "date")),
+        "snippet": _truncate(_get(email, "snippet"), 120),
+    })
+
+
+def compact_status(result: Any) -> Dict[str, Any]:
+    """Write acknowledgements (drafts, deletes, created events) -> {id, status}."""
+    if error := _error_or(result):
+        return error
+    if not isinstance(result, dict) and not hasattr(result, "id"):
+        return {"status": str(result)}
+    return _drop_empty({
+        "id": _get(result, "id"),
+        "status": _get(result, "status") or "success",
+    })
+
+
+def compact_batch_result(result: Any) -> Dict[str, Any]:
+    """Batch write -> {results: [{id, action, status|error}], tasks: [task...]}."""
+    if error := _error_or(result):
+        return error
+    return {
+        "results": [_drop_empty({
+            "id": _get(r, "id"),
+            "action": _get(r, "action"),
+            "status": _get(r, "status"),
+            "error": _get(r, "error"),
+        }) for r in _get(result, "results") or []],
+        "tasks": [compact_task(task) for task in _get(result, "tasks") or []],
+    }
+
+
+def _many(projector: Callable[[Any], Dict[str, Any]]) -> Callable[[Any], Any]:
+    def project(result: Any) -> Any:
+        if error := _error_or(result):
+            return error
+        if result is None:
+            return []
+        if not isinstance(result, list):
+            result = [result]
+        return [projector(item) for item in result]
+    return project
+
+
+def _one(projector: Callable[[Any], Dict[str, Any]]) -> Callable[[Any], Any]:
+    def project(result: Any) -> Any:
+        if result is None:
+            return None
+        if isinstance(result, str):
+            return {"error": result} if result.startswith("Error") else {"status": result}
+        return projector(result)
+    return project
+
+
+# Output schema per agent tool name
+TOOL_PROJECTIONS: Dict[str, Callable[[Any], Any]] = {
+    "list_tasks": _many(compact_task),
+    "search_tasks": _many(compact_task),
+    "get_next_task": _many(compact_task),
+    "create_task": _one(compact_task),
+    "update_task": _one(compact_task),
+    "delete_task": _one(compact_status),
+    "complete_task": _one(compact_status),
+    "apply_task_changes": _one(compact_batch_result),
+    "list_calendar_events": _many(compact_event),
+    "create_calendar_event": _one(compact_event),
+    "find_free_blocks": _many(compact_free_block),
+    "list_emails": _many(compact_email),
+    "create_email_draft": _one(compact_status),
+}
+
+
+def project_tool_result(tool_name: str, result: Any) -> Any:
+    """Apply the compact schema registered for `tool_name` (identity for unknown tools)."""
+    projector = TOOL_PROJECTIONS.get(tool_name)
+    if projector is None:
+        return result
+    return projector(result)
+
+
+def to_tool_content(result: Any) -> str:
+    """Serialize a (projected) tool result into compact ToolMessage content."""
+    if isinstance(result, str):
+        return result
+    try:
+        return json.dumps(result, default=str, ensure_ascii=False, separators=(",", ":"))
+    except (TypeError, ValueError):
+        return str(result)
+
+
+def compact(tool_name: str, result: Any) -> str:
+    """Project and serialize in one step; this is what agent tools return."""
+    return to_tool_content(project_tool_result(tool_name, result))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough provider-agnostic token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
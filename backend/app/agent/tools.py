@@ -1,12 +1,14 @@
 from langchain_core.tools import tool
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from datetime import date
 from app.core.db import engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.services.task_service import TaskService
 from app.services.calendar_service import CalendarService
-from app.services.gmail_service import GmailService
+from app.services.email_service import EmailService
 from app.mcp_client.calendar_client import calendar_client
+from app.agent.projections import compact
 
 async def get_service():
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
@@ -19,7 +21,7 @@ async def create_task(content: str, description: Optional[str] = None, due_strin
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = TaskService(session)
-        return await service.create_task(content, description, due_string, priority)
+        return compact("create_task", await service.create_task(content, description, due_string, priority))
 
 @tool
 async def update_task(task_id: str, content: Optional[str] = None, description: Optional[str] = None, due_string: Optional[str] = None, priority: Optional[int] = None):
@@ -27,7 +29,7 @@ async def update_task(task_id: str, content: Optional[str] = None, description:
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = TaskService(session)
-        return await service.update_task(task_id, content, description, due_string, priority)
+        return compact("update_task", await service.update_task(task_id, content, description, due_string, priority))
 
 @tool
 async def delete_task(task_id: str):
@@ -36,7 +38,7 @@ async def delete_task(task_id: str):
     async with async_session() as session:
         service = TaskService(session)
         await service.delete_task(task_id)
-        return {"status": "success"}
+        return compact("delete_task", {"id": task_id, "status": "success"})
 
 @tool
 async def complete_task(task_id: str):
@@ -45,15 +47,50 @@ async def complete_task(task_id: str):
     async with async_session() as session:
         service = TaskService(session)
         await service.close_task(task_id)
-        return {"status": "success"}
+        return compact("complete_task", {"id": task_id, "status": "success"})
 
 @tool
-async def list_tasks():
-    """List all active tasks from local cache."""
+async def apply_task_changes(changes: List[Dict[str, Any]]):
+    """
+    Apply several task changes at once in Todoist (use instead of many single create/update/delete/complete calls).
+    Each change: {"action": "create"|"update"|"move"|"delete"|"complete", "task_id", "content", "description",
+    "due_string", "priority", "project_id", "parent_id", "temp_id"}. A create can set "temp_id" (any string)
+    that later changes in the same list use as task_id or parent_id, e.g. to add subtasks to a new task.
+    """
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = TaskService(session)
-        return await service.list_tasks()
+        return compact("apply_task_changes", await service.apply_task_changes(changes))
+
+@tool
+async def list_tasks(label: Optional[str] = None, project_id: Optional[str] = None, priority: Optional[int] = None, due_before: Optional[date] = None, limit: Optional[int] = None):
+    """List active tasks from local cache. Optionally filter by label, project, priority (4 = p1) or due date (YYYY-MM-DD, exclusive), and cap the count."""
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        service = TaskService(session)
+        return compact("list_tasks", await service.query_tasks(
+            labels=[label] if label else None,
+            project_id=project_id,
+            priority=priority,
+            due_before=due_before,
+            limit=limit,
+        ))
+
+@tool
+async def search_tasks(query: str, limit: int = 5):
+    """Find tasks by words in their title or description (e.g. 'dentist'), best matches first. Prefer this over list_tasks when looking for specific tasks."""
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        service = TaskService(session)
+        return compact("search_tasks", await service.search_tasks(query, limit))
+
+@tool
+async def get_next_task(k: int = 1):
+    """Get the k most important tasks (highest priority, then earliest due date). Use this for "what should I do next?"."""
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        service = TaskService(session)
+        return compact("get_next_task", await service.get_next_tasks(k))
 
 @tool
 async def list_calendar_events(days: int = 7):
@@ -61,7 +98,7 @@ async def list_calendar_events(days: int = 7):
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = CalendarService(session)
-        return await service.list_events(days)
+        return compact("list_calendar_events", await service.list_events(days))
 
 @tool
 async def create_calendar_event(summary: str, start_time: str, end_time: str, description: str = ""):
@@ -69,7 +106,7 @@ async def create_calendar_event(summary: str, start_time: str, end_time: str, de
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = CalendarService(session)
-        return await service.create_event(summary, start_time, end_time, description)
+        return compact("create_calendar_event", await service.create_event(summary, start_time, end_time, description))
 
 @tool
 async def find_free_blocks(duration_minutes: int = 60, days: int = 3):
@@ -77,21 +114,25 @@ async def find_free_blocks(duration_minutes: int = 60, days: int = 3):
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     async with async_session() as session:
         service = CalendarService(session)
-        return await service.find_free_blocks(duration_minutes, days)
+        return compact("find_free_blocks", await service.find_free_blocks(duration_minutes, days))
 
 @tool
 async def list_emails(max_results: int = 10, query: str = ""):
     """List emails from Gmail. Query examples: 'is:unread', 'from:boss@example.com'."""
-    service = GmailService()
-    return await service.list_emails(max_results, query)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        service = EmailService(session)
+        return compact("list_emails", await service.list_emails(max_results, query))
 
 @tool
 async def create_email_draft(to: str, subject: str, body: str):
     """Create a draft email in Gmail."""
-    service = GmailService()
-    return await service.create_draft(to, subject, body)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        service = EmailService(session)
+        return compact("create_email_draft", await service.create_draft(to, subject, body))
 
-SAFE_TOOLS = [list_tasks, list_calendar_events, find_free_blocks, list_emails]
-SENSITIVE_TOOLS = [create_task, update_task, delete_task, complete_task, create_calendar_event, create_email_draft]
+SAFE_TOOLS = [list_tasks, search_tasks, get_next_task, list_calendar_events, find_free_blocks, list_emails]
+SENSITIVE_TOOLS = [create_task, update_task, delete_task, complete_task, apply_task_changes, create_calendar_event, create_email_draft]
 ALL_TOOLS = SAFE_TOOLS + SENSITIVE_TOOLS
 
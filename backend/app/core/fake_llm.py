@@ -0,0 +1,104 @@
+"""
+Deterministic stand-in for the chat model, used by the load-testing harness
+(LLM_PROVIDER=fake) so throughput can be measured without Anthropic/Vertex.
+
+It scripts tool calls from keywords in the latest user message and answers in
+plain text once a tool result comes back, chaining `find_free_blocks` into a
+`create_calendar_event` proposal so the approval flow is exercised.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "0"))
+
+# First matching keyword wins: (keywords, tool name, args)
+SCRIPT = [
+    (("next",), "get_next_task", {"k": 1}),
+    (("schedule", "focus", "block"), "find_free_blocks", {"duration_minutes": 60, "days": 3}),
+    (("add task", "create task", "remind me"), "create_task", None),
+    (("email", "inbox"), "list_emails", {"max_results": 10, "query": "is:unread"}),
+    (("calendar", "meeting"), "list_calendar_events", {"days": 7}),
+    (("tasks", "todo"), "list_tasks", {"limit": 20}),
+]
+
+
+def _tool_call(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+
+def _estimate_tokens(messages: List[BaseMessage]) -> int:
+    return sum(len(str(m.content)) for m in messages) // 4 + 1
+
+
+class FakeChatModel(BaseChatModel):
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    jitter_ms: float = FAKE_LLM_JITTER_MS
+    model_name: str = "fake-scripted"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool choice is scripted; the schemas aren't needed
+        return self
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return self._after_tool(last)
+        text = str(last.content) if isinstance(last, HumanMessage) else ""
+        lowered = text.lower()
+        if lowered.startswith("generate a very short"):
+            return AIMessage(content="Load test chat")
+        for keywords, name, args in SCRIPT:
+            if any(k in lowered for k in keywords):
+                if name == "create_task":
+                    args = {"content": text[:80], "priority": 3}
+                return AIMessage(content="", tool_calls=[_tool_call(name, dict(args))])
+        return AIMessage(content="Got it. Anything else?")
+
+    def _after_tool(self, message: ToolMessage) -> AIMessage:
+        if message.name == "find_free_blocks":
+            try:
+                blocks = json.loads(message.content)
+            except (TypeError, ValueError):
+                blocks = []
+            if isinstance(blocks, list) and blocks and isinstance(blocks[0], dict) and "start" in blocks[0]:
+                return AIMessage(content="I found a free slot. Shall I schedule it?", tool_calls=[_tool_call(
+                    "create_calendar_event",
+                    {"summary": "Focus block", "start_time": blocks[0]["start"], "end_time": blocks[0]["end"]},
+                )])
+        return AIMessage(content=f"Done ({message.name}).")
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        response = self.respond(messages)
+        input_tokens = _estimate_tokens(messages)
+        output_tokens = _estimate_tokens([response])
+        response.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages)
@@ -2,14 +2,23 @@ import os
 from langchain_anthropic import ChatAnthropic
 from langchain_google_vertexai import ChatVertexAI
 from langchain_core.language_models.chat_models import BaseChatModel
+from app.core.metrics import LLMMetricsCallback
+
+# "google", "anthropic" or "fake" (scripted model for load tests, see app/core/fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")
 
 class LLMFactory:
     @staticmethod
-    def get_llm(provider: str = "google", model_name: str = None) -> BaseChatModel:
+    def get_llm(provider: str = None, model_name: str = None) -> BaseChatModel:
         """
         Factory to get the LLM instance based on provider.
-        Default is Google Vertex AI (Gemini 1.5 Flash).
+        Default is LLM_PROVIDER (Google Vertex AI, Gemini 2.5 Flash, unless overridden).
         """
+        provider = provider or LLM_PROVIDER
+        if provider == "fake":
+            from app.core.fake_llm import FakeChatModel
+            return FakeChatModel(callbacks=[LLMMetricsCallback("fake", "fake-scripted")])
+
         if provider == "anthropic":
             api_key = os.getenv("ANTHROPIC_API_KEY")
             if not api_key:
@@ -21,7 +30,8 @@ class LLMFactory:
             return ChatAnthropic(
                 model=model,
                 api_key=api_key,
-                temperature=0
+                temperature=0,
+                callbacks=[LLMMetricsCallback("anthropic", model)]
             )
         
         elif provider == "google":
@@ -38,7 +48,8 @@ class LLMFactory:
                 model_name=model,
                 project=project_id,
                 location=location,
-                temperature=0
+                temperature=0,
+                callbacks=[LLMMetricsCallback("google", model)]
             )
             
         raise ValueError(f"Unsupported LLM provider: {provider}")
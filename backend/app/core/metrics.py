@@ -0,0 +1,194 @@
+"""
+Prometheus metrics, exposed at GET /metrics.
+
+Per-process registry: with several uvicorn workers each one is scraped separately
+(or run a single worker per container).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Sub-second resolution for cache reads, up to a minute for multi-step agent turns
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "pushstart_http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "pushstart_llm_request_duration_seconds", "LLM call latency",
+    ["provider", "model"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "pushstart_llm_tokens_total", "LLM tokens by direction (input/output)",
+    ["provider", "model", "direction"],
+)
+LLM_ERRORS = Counter("pushstart_llm_errors_total", "Failed LLM calls", ["provider", "model"])
+MCP_CALL_SECONDS = Histogram(
+    "pushstart_mcp_call_duration_seconds", "MCP tool call latency (connect + initialize + call)",
+    ["server", "tool"], buckets=LATENCY_BUCKETS,
+)
+MCP_ERRORS = Counter("pushstart_mcp_errors_total", "Failed MCP tool calls", ["server", "tool"])
+MCP_COALESCED_CALLS = Counter(
+    "pushstart_mcp_coalesced_calls_total", "MCP read calls served by an identical in-flight call",
+    ["server", "tool"],
+)
+MCP_RETRY_ATTEMPTS = Counter("pushstart_mcp_retries_total", "Retried MCP read attempts", ["server", "tool"])
+MCP_HEDGED_CALLS = Counter("pushstart_mcp_hedged_calls_total", "MCP reads that got a hedged duplicate request", ["server", "tool"])
+MCP_BREAKER_OPEN = Gauge("pushstart_mcp_circuit_open", "1 while the server's circuit breaker is open", ["server"])
+DB_POOL_CONNECTIONS = Gauge(
+    "pushstart_db_pool_connections", "Connection pool usage",
+    ["pool", "state"],
+)
+CHECKPOINT_BYTES = Histogram(
+    "pushstart_checkpoint_size_bytes",
+    "Bytes the checkpointer serialized per LangGraph checkpoint write (Postgres keeps primitives inline, unmeasured)",
+    buckets=SIZE_BUCKETS,
+)
+CHECKPOINT_ROWS_DELETED = Counter(
+    "pushstart_checkpoint_rows_deleted_total", "Checkpointer rows removed by compaction/retention", ["table"],
+)
+CHECKPOINT_BYTES_RECLAIMED = Counter(
+    "pushstart_checkpoint_bytes_reclaimed_total", "Size of checkpointer rows removed by compaction/retention",
+)
+MEMORY_CHECKPOINT_THREADS = Gauge("pushstart_memory_checkpoint_threads", "Threads resident in the in-memory checkpointer")
+MEMORY_CHECKPOINT_BYTES = Gauge("pushstart_memory_checkpoint_bytes", "Serialized bytes held by the in-memory checkpointer")
+MEMORY_CHECKPOINT_EVICTIONS = Counter(
+    "pushstart_memory_checkpoint_evictions_total", "Threads evicted from the in-memory checkpointer", ["outcome"],
+)
+TASK_OUTBOX_ENTRIES = Counter(
+    "pushstart_task_outbox_entries_total", "Optimistic task writes by outbox stage", ["stage"],
+)
+GUIDED_SESSIONS_STARTED = Counter("pushstart_guided_sessions_started_total", "Guided sessions started")
+GUIDED_TASKS = Counter("pushstart_guided_session_tasks_total", "Guided-session task actions", ["action"])
+GUIDED_SESSIONS_ACTIVE = Gauge("pushstart_guided_sessions_active", "Unexpired guided sessions")
+
+
+@contextmanager
+def observe_mcp_call(server: str, tool: str):
+    """
+    Time an MCP tool call and count its failures. Yields `check(result, is_error=False)`,
+    which counts a tool that reported an error instead of raising ({"error": ...}
+    payload or an isError result) and returns `result` unchanged.
+    """
+    def check(result: Any, is_error: bool = False) -> Any:
+        if is_error or (isinstance(result, dict) and "error" in result):
+            MCP_ERRORS.labels(server, tool).inc()
+        return result
+
+    start = time.perf_counter()
+    try:
+        yield check
+    except BaseException:
+        MCP_ERRORS.labels(server, tool).inc()
+        raise
+    finally:
+        MCP_CALL_SECONDS.labels(server, tool).observe(time.perf_counter() - start)
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Attached to every model built by LLMFactory: records latency, token usage and errors."""
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self._starts: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._observe(run_id)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if input_tokens:
+            LLM_TOKENS.labels(self.provider, self.model, "input").inc(input_tokens)
+        if output_tokens:
+            LLM_TOKENS.labels(self.provider, self.model, "output").inc(output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._observe(run_id)
+        LLM_ERRORS.labels(self.provider, self.model).inc()
+
+    def _observe(self, run_id: UUID):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_REQUEST_SECONDS.labels(self.provider, self.model).observe(time.perf_counter() - start)
+
+
+def register_pool(name: str, pool):
+    """Export a SQLAlchemy pool's usage, read at scrape time."""
+    DB_POOL_CONNECTIONS.labels(name, "size").set_function(pool.size)
+    DB_POOL_CONNECTIONS.labels(name, "checked_out").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(name, "overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+def register_psycopg_pool(name: str, pool):
+    """Export a psycopg_pool.AsyncConnectionPool's usage (e.g. the checkpointer's), read at scrape time."""
+    DB_POOL_CONNECTIONS.labels(name, "size").set_function(lambda: pool.get_stats().get("pool_size", 0))
+    DB_POOL_CONNECTIONS.labels(name, "checked_out").set_function(
+        lambda: pool.get_stats().get("pool_size", 0) - pool.get_stats().get("pool_available", 0)
+    )
+    DB_POOL_CONNECTIONS.labels(name, "waiting").set_function(lambda: pool.get_stats().get("requests_waiting", 0))
+
+
+# Sizes of what the checkpointer's serde produced during the current aput (None outside one)
+_serialized_sizes: ContextVar[Optional[List[int]]] = ContextVar("checkpoint_serialized_sizes", default=None)
+
+
+class _SizeRecordingSerde:
+    """Delegates to the checkpointer's serde, noting the size of every dumps_typed() inside an aput."""
+    def __init__(self, serde):
+        self._serde = serde
+
+    def dumps_typed(self, obj):
+        type_, data = self._serde.dumps_typed(obj)
+        sizes = _serialized_sizes.get()
+        if sizes is not None:
+            sizes.append(len(data))
+        return type_, data
+
+    def __getattr__(self, name):
+        return getattr(self._serde, name)
+
+
+def instrument_checkpointer(checkpointer):
+    """
+    Record the serialized size of every checkpoint written (in place). Sizes come from the
+    bytes the saver itself serializes, so nothing is serialized twice; the Postgres saver
+    hands blobs to a thread, which inherits the context.
+    """
+    original = checkpointer.aput
+    checkpointer.serde = _SizeRecordingSerde(checkpointer.serde)
+
+    async def aput(config, checkpoint, metadata, new_versions):
+        sizes: List[int] = []
+        token = _serialized_sizes.set(sizes)
+        try:
+            result = await original(config, checkpoint, metadata, new_versions)
+        finally:
+            _serialized_sizes.reset(token)
+        if sizes:
+            CHECKPOINT_BYTES.observe(sum(sizes))
+        return result
+
+    checkpointer.aput = aput
+    return checkpointer
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Route template (e.g. /guided/{session_id}/next) to keep label cardinality bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
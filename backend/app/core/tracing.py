@@ -0,0 +1,310 @@
+"""
+Lightweight request-scoped tracing.
+
+Each HTTP request (and each background sync run) opens a root span; LangGraph nodes,
+LLM calls, MCP calls (connect / initialize / call_tool), SQL queries and checkpoint
+reads/writes open child spans. Parenting follows `contextvars`, so it works across
+awaits, asyncio tasks and the executor threads LangGraph runs sync nodes in.
+
+When the root span ends the whole trace is handed to the configured exporter:
+- TRACING_EXPORTER=json: one JSON line per trace in TRACING_JSON_PATH
+- TRACING_EXPORTER=otlp: OTLP/HTTP (JSON encoding) to OTEL_EXPORTER_OTLP_ENDPOINT,
+  e.g. a local OpenTelemetry Collector or Jaeger
+- TRACING_EXPORTER=none (default): spans are no-ops
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import secrets
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_JSON_PATH = os.getenv("TRACING_JSON_PATH", "traces.jsonl")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "pushstart-backend")
+# Long SQL statements are cut to this many characters in span attributes
+TRACING_MAX_STATEMENT_LENGTH = int(os.getenv("TRACING_MAX_STATEMENT_LENGTH", "500"))
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonLinesExporter:
+    """Appends one line per finished trace: {"trace_id", "name", "duration_ms", "spans": [...]}."""
+    def __init__(self, path: str = TRACING_JSON_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace, root: Span):
+        line = json.dumps({
+            "trace_id": trace.trace_id,
+            "name": root.name,
+            "duration_ms": round(root.duration_ms, 3),
+            "spans": [s.to_dict() for s in trace.spans],
+        }, default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter:
+    """OTLP/HTTP JSON exporter. Posts from a daemon thread so requests never wait on the collector."""
+    def __init__(self, endpoint: str = OTEL_EXPORTER_OTLP_ENDPOINT, service_name: str = OTEL_SERVICE_NAME):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+
+    def encode(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        root = trace.spans[0] if trace.spans else None
+        for s in trace.spans:
+            span = {
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if s is root else 1,  # SERVER for the local root, INTERNAL otherwise
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                span["parentSpanId"] = s.parent_id
+            spans.append(span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "pushstart"}, "spans": spans}],
+        }]}
+
+    def export(self, trace: Trace, root: Span):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="otlp-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(self.encode(trace))
+        except queue.Full:
+            logger.warning("OTLP export queue full; dropping trace %s", trace.trace_id)
+
+    def _worker(self):
+        import httpx
+        with httpx.Client(timeout=5) as client:
+            while True:
+                payload = self._queue.get()
+                try:
+                    client.post(self.url, json=payload).raise_for_status()
+                except Exception as e:
+                    logger.warning("OTLP export failed: %s", e)
+
+
+def _make_exporter(name: str):
+    if name == "json":
+        return JsonLinesExporter()
+    if name == "otlp":
+        return OTLPExporter()
+    if name == "none":
+        return None
+    raise ValueError(f"Unsupported tracing exporter: {name}")
+
+
+exporter = _make_exporter(TRACING_EXPORTER)
+
+
+def tracing_enabled() -> bool:
+    return exporter is not None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, root: bool = False, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes):
+    """
+    Open a span as a child of the current one. Without a current span nothing is recorded
+    unless `root=True` (request/job entry points), which starts a new trace - optionally
+    continuing an upstream `trace_id`/`parent_id` (W3C traceparent).
+    Yields the Span, or None when not recording.
+    """
+    parent = _current_span.get()
+    if exporter is None or (parent is None and not root):
+        yield None
+        return
+
+    if parent is not None and not root:
+        trace, parent_span_id = parent.trace, parent.span_id
+    else:
+        trace, parent_span_id = Trace(trace_id), parent_id
+    s = Span(trace, name, parent_span_id, attributes)
+    trace.spans.append(s)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end_ns = time.time_ns()
+        # The local root (possibly continuing a remote parent) completes the trace
+        if trace is not (parent.trace if parent else None):
+            try:
+                exporter.export(trace, s)
+            except Exception as e:
+                logger.warning("Trace export failed: %s", e)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, error: Optional[str] = None, **attributes):
+    """Record an already-finished child span (for hooks that only see start/end callbacks)."""
+    parent = _current_span.get()
+    if exporter is None or parent is None:
+        return
+    s = Span(parent.trace, name, parent.span_id, attributes)
+    s.start_ns, s.end_ns, s.error = start_ns, end_ns, error
+    parent.trace.spans.append(s)
+
+
+def traced(name: str, **attributes):
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(header: Optional[str]):
+    """W3C `traceparent` -> (trace_id, parent_span_id), or (None, None) if absent/invalid."""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+# --- Instrumentation hooks ---
+
+def instrument_engine(engine):
+    """Record a span per SQL statement executed through `engine` (AsyncEngine or Engine)."""
+    from sqlalchemy import event
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_query_start", []).append(time.time_ns())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("trace_query_start")
+        if not starts:
+            return
+        start_ns = starts.pop()
+        record_span(
+            "db.query", start_ns, time.time_ns(),
+            statement=statement[:TRACING_MAX_STATEMENT_LENGTH],
+            rows=getattr(cursor, "rowcount", None),
+        )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("trace_query_start") if conn is not None else None
+        if starts:
+            start_ns = starts.pop()
+            record_span(
+                "db.query", start_ns, time.time_ns(),
+                error=str(exception_context.original_exception),
+                statement=(exception_context.statement or "")[:TRACING_MAX_STATEMENT_LENGTH],
+            )
+
+
+def instrument_checkpointer(checkpointer):
+    """Wrap a LangGraph checkpointer's async read/write methods in spans (in place)."""
+    def thread_id(config):
+        return (config or {}).get("configurable", {}).get("thread_id")
+
+    for method, span_name in (("aget_tuple", "checkpoint.read"), ("aput", "checkpoint.write"), ("aput_writes", "checkpoint.write_pending")):
+        original = getattr(checkpointer, method, None)
+        if original is None:
+            continue
+
+        def make_wrapper(original, span_name):
+            @functools.wraps(original)
+            async def wrapper(config, *args, **kwargs):
+                with span(span_name, thread_id=thread_id(config), saver=type(checkpointer).__name__):
+                    return await original(config, *args, **kwargs)
+            return wrapper
+
+        setattr(checkpointer, method, make_wrapper(original, span_name))
+    return checkpointer
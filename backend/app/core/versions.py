@@ -0,0 +1,49 @@
+"""
+Per-table version counters for conditional GETs.
+
+Writers call `bump_version` inside the transaction that changes a cached table, so the
+counter moves iff the rows did. Readers turn the counter into a strong ETag and can
+answer `If-None-Match` with a 304 after a single primary-key lookup, without touching
+the cached rows.
+"""
+from datetime import datetime
+from typing import Optional
+import hashlib
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from app.models.table_version import TableVersion
+
+# Clients may store responses but must revalidate with the ETag before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump_version(session: AsyncSession, name: str) -> int:
+    """Increment the version of `name` and return the new value. Does not commit; call before the writer's commit."""
+    statement = insert(TableVersion).values(name=name, version=1, updated_at=datetime.utcnow())
+    statement = statement.on_conflict_do_update(
+        index_elements=[TableVersion.name],
+        set_={"version": TableVersion.version + 1, "updated_at": statement.excluded.updated_at},
+    ).returning(TableVersion.version)
+    result = await session.exec(statement)
+    return result.scalar_one()
+
+
+async def get_version(session: AsyncSession, name: str) -> int:
+    result = await session.exec(select(TableVersion.version).where(TableVersion.name == name))
+    return result.first() or 0
+
+
+def make_etag(name: str, version: int, *variant: Optional[str]) -> str:
+    """Strong ETag for one representation of a table: the version plus whatever shapes the response (query params)."""
+    variant_key = "&".join("" if v is None else str(v) for v in variant)
+    digest = hashlib.sha1(variant_key.encode()).hexdigest()[:12]
+    return f'"{name}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip() for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
@@ -6,21 +6,69 @@ from pathlib import Path
 env_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+import logging
+import time
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import tasks, chat, calendar, guided
+from app.routers import tasks, chat, calendar, guided, sync, webhooks
 from app.core.db import init_db
 from app.agent.graph import close_graph
+from app.mcp_client.session import close_sessions
+from app.mcp_client.resilience import request_timeout, set_deadline, reset_deadline
+from app.services.sync_scheduler import sync_scheduler, SYNC_ENABLED
+from app.core.tracing import span, tracing_enabled, parse_traceparent
+from app.core.metrics import HTTP_REQUEST_SECONDS, GUIDED_SESSIONS_ACTIVE, route_label
+from app.services.guided_session_store import get_guided_session_store
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Pushstart Backend")
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    if sync_scheduler.jobs:
+        await sync_scheduler.start()
+    if SYNC_ENABLED:
+        await sync_scheduler.warm_caches()
+    elif sync_scheduler.jobs:
+        logger.warning("SYNC_ENABLED=false: caches are not synced; running only %s.",
+                       ", ".join(job.name for job in sync_scheduler.jobs))
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await sync_scheduler.stop()
     await close_graph()
+    await close_sessions()
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Latency histogram per route template, plus a root trace span per request
+    (everything the request does below it becomes a child span). Also sets the
+    request deadline (X-Request-Timeout, capped by REQUEST_TIMEOUT_SECONDS) that
+    bounds MCP tool calls made on its behalf.
+    """
+    start = time.perf_counter()
+    deadline = set_deadline(request_timeout(request.headers.get("X-Request-Timeout")))
+    status_code = 500  # unless a response comes back
+    try:
+        if tracing_enabled():
+            trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+            with span(f"{request.method} {request.url.path}", root=True, trace_id=trace_id, parent_id=parent_id,
+                      method=request.method, path=request.url.path) as s:
+                response = await call_next(request)
+                s.set_attribute("route", route_label(request.scope))
+                s.set_attribute("status_code", response.status_code)
+                response.headers["X-Trace-Id"] = s.trace.trace_id
+        else:
+            response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        reset_deadline(deadline)
+        HTTP_REQUEST_SECONDS.labels(request.method, route_label(request.scope), status_code).observe(time.perf_counter() - start)
+    return response
 
 # Configure CORS
 app.add_middleware(
@@ -29,12 +77,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Trace-Id"],
 )
 
 app.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(calendar.router)
 app.include_router(guided.router)
+app.include_router(sync.router)
+app.include_router(webhooks.router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    try:
+        GUIDED_SESSIONS_ACTIVE.set(await get_guided_session_store().count_active())
+    except Exception as e:
+        print(f"Error counting guided sessions: {e}")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/health")
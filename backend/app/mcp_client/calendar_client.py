@@ -1,48 +1,33 @@
 import os
 import sys
-import json
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from app.core.tracing import span
+from app.core.metrics import observe_mcp_call
+from app.mcp_client.session import mcp_session, call_tool, coalesce, parse_tool_result
+from app.mcp_client.resilience import guarded_call
 
 # URL of the MCP server
 CALENDAR_MCP_SERVER_URL = os.getenv("CALENDAR_MCP_SERVER_URL", "http://localhost:8002/sse")
+# Idempotent reads: concurrent identical calls share one round trip
+READ_TOOLS = ("list_events", "find_free_blocks")
 
 class CalendarClient:
+    async def _call(self, tool_name, arguments):
+        async with mcp_session("calendar", CALENDAR_MCP_SERVER_URL) as session:
+            return await call_tool(session, "calendar", tool_name, arguments)
+
     async def _run_tool(self, tool_name, arguments=None):
         if arguments is None:
             arguments = {}
             
         try:
-            async with sse_client(CALENDAR_MCP_SERVER_URL) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(tool_name, arguments)
-                    
-                    # Parse the result
-                    if not result.content:
-                        return None
-                    
-                    # If multiple content blocks, it might be a list of items split by FastMCP
-                    if len(result.content) > 1:
-                        items = []
-                        for content in result.content:
-                            try:
-                                item = json.loads(content.text)
-                                items.append(item)
-                            except json.JSONDecodeError:
-                                items.append(content.text)
-                        return items
-                    
-                    # Single content block
-                    text_content = result.content[0].text
-                    try:
-                        data = json.loads(text_content)
-                        # Handle case where MCP returns a single dict for a list-returning tool
-                        if tool_name in ["list_events", "find_free_blocks"] and isinstance(data, dict) and "error" not in data:
-                            return [data]
-                        return data
-                    except json.JSONDecodeError:
-                        return text_content
+            with span("mcp.tool", server="calendar", tool=tool_name), observe_mcp_call("calendar", tool_name) as check:
+                call = lambda: self._call(tool_name, arguments)
+                if tool_name in READ_TOOLS:
+                    result = await coalesce("calendar", tool_name, arguments,
+                                            lambda: guarded_call("calendar", tool_name, call, idempotent=True))
+                else:
+                    result = await guarded_call("calendar", tool_name, call)
+                return check(parse_tool_result(tool_name, result, list_tools=("list_events", "find_free_blocks")), result.isError)
         except Exception as e:
             print(f"Calendar MCP Error: {e}")
             # Return error dict so agent can see it
@@ -65,4 +50,16 @@ class CalendarClient:
             "days": days
         })
 
+    async def list_event_changes(self, sync_token=None):
+        arguments = {"sync_token": sync_token} if sync_token else {}
+        return await self._run_tool("list_event_changes", arguments)
+
+    async def watch_events(self, address, channel_id, token="", ttl_seconds=604800):
+        return await self._run_tool("watch_events", {
+            "address": address,
+            "channel_id": channel_id,
+            "token": token,
+            "ttl_seconds": ttl_seconds
+        })
+
 calendar_client = CalendarClient()
@@ -1,45 +1,33 @@
 import os
 import sys
-import json
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from app.core.tracing import span
+from app.core.metrics import observe_mcp_call
+from app.mcp_client.session import mcp_session, call_tool, coalesce, parse_tool_result
+from app.mcp_client.resilience import guarded_call
 
 # URL of the MCP server
 GMAIL_MCP_SERVER_URL = os.getenv("GMAIL_MCP_SERVER_URL", "http://localhost:8003/sse")
+# Idempotent reads: concurrent identical calls share one round trip
+READ_TOOLS = ("list_emails", "list_email_page")
 
 class GmailClient:
+    async def _call(self, tool_name, arguments):
+        async with mcp_session("gmail", GMAIL_MCP_SERVER_URL) as session:
+            return await call_tool(session, "gmail", tool_name, arguments)
+
     async def _run_tool(self, tool_name, arguments=None):
         if arguments is None:
             arguments = {}
             
         try:
-            async with sse_client(GMAIL_MCP_SERVER_URL) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(tool_name, arguments)
-                    
-                    if not result.content:
-                        return None
-                    
-                    if len(result.content) > 1:
-                        items = []
-                        for content in result.content:
-                            try:
-                                item = json.loads(content.text)
-                                items.append(item)
-                            except json.JSONDecodeError:
-                                items.append(content.text)
-                        return items
-                    
-                    text_content = result.content[0].text
-                    try:
-                        data = json.loads(text_content)
-                        # Handle case where MCP returns a single dict for a list-returning tool
-                        if tool_name in ["list_emails"] and isinstance(data, dict) and "error" not in data:
-                            return [data]
-                        return data
-                    except json.JSONDecodeError:
-                        return text_content
+            with span("mcp.tool", server="gmail", tool=tool_name), observe_mcp_call("gmail", tool_name) as check:
+                call = lambda: self._call(tool_name, arguments)
+                if tool_name in READ_TOOLS:
+                    result = await coalesce("gmail", tool_name, arguments,
+                                            lambda: guarded_call("gmail", tool_name, call, idempotent=True))
+                else:
+                    result = await guarded_call("gmail", tool_name, call)
+                return check(parse_tool_result(tool_name, result, list_tools=("list_emails",)), result.isError)
         except Exception as e:
             print(f"Gmail MCP Error: {e}")
             return {"error": str(e)}
@@ -47,6 +35,16 @@ class GmailClient:
     async def list_emails(self, max_results: int = 10, query: str = ""):
         return await self._run_tool("list_emails", {"max_results": max_results, "query": query})
 
+    async def list_email_page(self, query: str = "", max_results: int = 25, page_token=None):
+        arguments = {"query": query, "max_results": max_results}
+        if page_token:
+            arguments["page_token"] = page_token
+        return await self._run_tool("list_email_page", arguments)
+
+    async def list_email_changes(self, history_id=None):
+        arguments = {"history_id": history_id} if history_id else {}
+        return await self._run_tool("list_email_changes", arguments)
+
     async def create_draft(self, to: str, subject: str, body: str):
         return await self._run_tool("create_draft", {"to": to, "subject": subject, "body": body})
 
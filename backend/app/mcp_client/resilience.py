@@ -0,0 +1,220 @@
+"""
+Deadlines, retries, hedging and circuit breaking for MCP tool calls.
+
+- Every call gets a timeout: MCP_TIMEOUT_SECONDS, overridable per tool with
+  MCP_TOOL_TIMEOUTS="list_tasks=20,find_free_blocks=8", and capped by what's left
+  of the request deadline (set per HTTP request by the middleware in main.py).
+- Idempotent reads are retried up to MCP_RETRIES times with full-jitter
+  exponential backoff, as long as the deadline leaves room for another attempt.
+- With MCP_HEDGE_PERCENTILE set (e.g. 95), a read still running after that
+  percentile of its recent latencies gets a duplicate request; the first success
+  wins and the other one is cancelled.
+- A circuit breaker per server opens after MCP_BREAKER_FAILURES consecutive
+  failures, fails fast for MCP_BREAKER_RESET_SECONDS, then lets one trial call
+  through (half-open) to decide whether to close again.
+"""
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import asyncio
+import os
+import random
+import time
+
+from app.core.metrics import MCP_RETRY_ATTEMPTS, MCP_HEDGED_CALLS, MCP_BREAKER_OPEN
+
+def _parse_tool_timeouts(value: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tool, _, seconds = item.partition("=")
+        timeouts[tool.strip()] = float(seconds)
+    return timeouts
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "120"))
+MCP_TIMEOUT_SECONDS = float(os.getenv("MCP_TIMEOUT_SECONDS", "15"))
+MCP_TOOL_TIMEOUTS = _parse_tool_timeouts(os.getenv("MCP_TOOL_TIMEOUTS", ""))
+MCP_RETRIES = int(os.getenv("MCP_RETRIES", "2"))
+MCP_BACKOFF_BASE_SECONDS = float(os.getenv("MCP_BACKOFF_BASE_SECONDS", "0.2"))
+MCP_BACKOFF_MAX_SECONDS = float(os.getenv("MCP_BACKOFF_MAX_SECONDS", "2"))
+MCP_HEDGE_PERCENTILE = float(os.getenv("MCP_HEDGE_PERCENTILE", "0"))  # 0 disables hedging
+MCP_HEDGE_MIN_SAMPLES = int(os.getenv("MCP_HEDGE_MIN_SAMPLES", "20"))
+MCP_BREAKER_FAILURES = int(os.getenv("MCP_BREAKER_FAILURES", "5"))
+MCP_BREAKER_RESET_SECONDS = float(os.getenv("MCP_BREAKER_RESET_SECONDS", "30"))
+
+
+class MCPTimeoutError(TimeoutError):
+    """The tool's own timeout elapsed (counts against the server's breaker)."""
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline ran out; says nothing about the server's health."""
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("mcp_deadline", default=None)
+
+def request_timeout(header: Optional[str]) -> float:
+    """Seconds allowed for a request: the X-Request-Timeout header if valid, capped by REQUEST_TIMEOUT_SECONDS."""
+    try:
+        seconds = float(header) if header else REQUEST_TIMEOUT_SECONDS
+    except ValueError:
+        return REQUEST_TIMEOUT_SECONDS
+    return min(seconds, REQUEST_TIMEOUT_SECONDS) if seconds > 0 else REQUEST_TIMEOUT_SECONDS
+
+def set_deadline(seconds: float):
+    return _deadline.set(time.monotonic() + seconds)
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def tool_timeout(tool_name: str) -> float:
+    return MCP_TOOL_TIMEOUTS.get(tool_name, MCP_TIMEOUT_SECONDS)
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(MCP_BACKOFF_MAX_SECONDS, MCP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, server: str, failures: int = MCP_BREAKER_FAILURES, reset_seconds: float = MCP_BREAKER_RESET_SECONDS):
+        self.server = server
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._trial:
+            return False
+        self._trial = True  # half-open: exactly one call probes the server
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        MCP_BREAKER_OPEN.labels(self.server).set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            self.opened_at = time.monotonic()
+            MCP_BREAKER_OPEN.labels(self.server).set(1)
+
+    def release(self):
+        """The call ended without telling us anything (cancelled, deadline ran out)."""
+        self._trial = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+# Recent successful attempt latencies per (server, tool), for the hedge delay
+_latencies: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+
+def breaker_for(server: str) -> CircuitBreaker:
+    if server not in _breakers:
+        _breakers[server] = CircuitBreaker(server)
+    return _breakers[server]
+
+def hedge_delay(server: str, tool_name: str) -> Optional[float]:
+    if MCP_HEDGE_PERCENTILE <= 0:
+        return None
+    samples = _latencies[(server, tool_name)]
+    if len(samples) < MCP_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * MCP_HEDGE_PERCENTILE / 100))]
+
+
+async def _attempt(server: str, tool_name: str, call: Callable[[], Awaitable[Any]]):
+    budget, bounded_by_deadline = tool_timeout(tool_name), False
+    left = remaining()
+    if left is not None and left < budget:
+        if left <= 0:
+            raise DeadlineExceeded(f"{server}.{tool_name}: request deadline exceeded")
+        budget, bounded_by_deadline = left, True
+    start = time.monotonic()
+    try:
+        result = await asyncio.wait_for(call(), budget)
+    except asyncio.TimeoutError:
+        if bounded_by_deadline:
+            raise DeadlineExceeded(f"{server}.{tool_name}: request deadline exceeded")
+        raise MCPTimeoutError(f"{server}.{tool_name} timed out after {budget:.1f}s")
+    _latencies[(server, tool_name)].append(time.monotonic() - start)
+    return result
+
+async def _hedged(server: str, tool_name: str, call: Callable[[], Awaitable[Any]]):
+    delay = hedge_delay(server, tool_name)
+    if delay is None:
+        return await _attempt(server, tool_name, call)
+
+    attempts = [asyncio.ensure_future(_attempt(server, tool_name, call))]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done:
+            MCP_HEDGED_CALLS.labels(server, tool_name).inc()
+            attempts.append(asyncio.ensure_future(_attempt(server, tool_name, call)))
+        pending, error = set(attempts), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in attempts:
+            task.cancel()
+
+async def _with_retries(server: str, tool_name: str, call: Callable[[], Awaitable[Any]]):
+    for attempt in range(MCP_RETRIES + 1):
+        try:
+            return await _hedged(server, tool_name, call)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            delay = backoff_delay(attempt)
+            left = remaining()
+            if attempt == MCP_RETRIES or (left is not None and left <= delay):
+                raise
+            MCP_RETRY_ATTEMPTS.labels(server, tool_name).inc()
+            await asyncio.sleep(delay)
+
+async def guarded_call(server: str, tool_name: str, call: Callable[[], Awaitable[Any]], idempotent: bool = False):
+    """
+    Run `call()` under the server's breaker with a deadline-capped timeout; reads
+    (`idempotent`) also get retries and optional hedging. Writes are attempted once,
+    since a timed-out write may still have gone through.
+    """
+    breaker = breaker_for(server)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{server} MCP server is unavailable (circuit open), try again shortly")
+    try:
+        if idempotent:
+            result = await _with_retries(server, tool_name, call)
+        else:
+            result = await _attempt(server, tool_name, call)
+    except (asyncio.CancelledError, DeadlineExceeded):
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
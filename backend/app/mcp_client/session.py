@@ -0,0 +1,219 @@
+"""
+MCP client sessions with a transport selectable per server:
+
+- sse (default): HTTP SSE to the server at the configured URL
+- http: streamable HTTP (point the URL at the server's /mcp endpoint)
+- inprocess: import the FastMCP server from mcp/<server>_server/server.py and talk
+  to it over in-memory streams - no network hop, no separate process
+- stdio: one long-lived `python -m <server>_server.server` subprocess per server
+
+Set with e.g. TODOIST_MCP_TRANSPORT=inprocess. The in-process and stdio transports
+need the MCP servers' own dependencies installed next to the backend.
+"""
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+import asyncio
+import functools
+import importlib
+import json
+import os
+import sys
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client, StdioServerParameters
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.memory import create_connected_server_and_client_session
+from app.core.tracing import span
+from app.core.metrics import MCP_COALESCED_CALLS
+from app.mcp_client.resilience import DeadlineExceeded, _deadline, remaining
+
+TRANSPORTS = ("sse", "http", "inprocess", "stdio")
+# Directory holding todoist_server/, calendar_server/, gmail_server/
+MCP_SERVERS_PATH = os.getenv(
+    "MCP_SERVERS_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../mcp")),
+)
+
+def transport_for(server: str) -> str:
+    transport = os.getenv(f"{server.upper()}_MCP_TRANSPORT", "sse").lower()
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unsupported MCP transport for {server}: {transport}")
+    return transport
+
+_inprocess_servers: Dict[str, Any] = {}
+
+def load_server(server: str):
+    """The FastMCP instance defined in mcp/<server>_server/server.py (imported once)."""
+    if server not in _inprocess_servers:
+        if MCP_SERVERS_PATH not in sys.path:
+            sys.path.append(MCP_SERVERS_PATH)
+        _inprocess_servers[server] = importlib.import_module(f"{server}_server.server").mcp
+    return _inprocess_servers[server]
+
+
+class StdioConnection:
+    """
+    A long-lived stdio server process with one initialized session, shared by all
+    callers (ClientSession multiplexes concurrent requests). The session's context
+    lives in its own task; it is restarted on the next call if the process dies.
+    """
+    def __init__(self, params: StdioServerParameters):
+        self.params = params
+        self._session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> ClientSession:
+        async with self._lock:
+            if self._session is None or self._task is None or self._task.done():
+                ready = asyncio.get_running_loop().create_future()
+                self._closing = asyncio.Event()
+                self._task = asyncio.create_task(self._run(ready))
+                await ready
+            return self._session
+
+    async def _run(self, ready: asyncio.Future):
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self._session = session
+                    ready.set_result(None)
+                    await self._closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        finally:
+            self._session = None
+
+    async def close(self):
+        if self._task is not None:
+            self._closing.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_stdio_connections: Dict[str, StdioConnection] = {}
+
+async def close_sessions():
+    """Stop long-lived stdio server processes (app shutdown)."""
+    for connection in _stdio_connections.values():
+        await connection.close()
+    _stdio_connections.clear()
+
+@asynccontextmanager
+async def open_session(server: str, transport: str, url: Optional[str] = None):
+    """Initialized ClientSession for `server` over `transport`, tracing the connect and initialize phases."""
+    if transport == "stdio":
+        connection = _stdio_connections.get(server)
+        if connection is None:
+            connection = _stdio_connections[server] = StdioConnection(StdioServerParameters(
+                command=sys.executable, args=["-m", f"{server}_server.server"],
+                cwd=MCP_SERVERS_PATH, env=dict(os.environ, PYTHONPATH=MCP_SERVERS_PATH),
+            ))
+        with span("mcp.connect", server=server, transport=transport):
+            session = await connection.get()
+        yield session
+        return
+
+    async with AsyncExitStack() as stack:
+        with span("mcp.connect", server=server, transport=transport, url=url):
+            if transport == "inprocess":
+                # Initialized by the helper
+                session = await stack.enter_async_context(create_connected_server_and_client_session(load_server(server)))
+            else:
+                if transport == "http":
+                    read, write, _ = await stack.enter_async_context(streamablehttp_client(url))
+                else:
+                    read, write = await stack.enter_async_context(sse_client(url))
+                session = await stack.enter_async_context(ClientSession(read, write))
+        if transport != "inprocess":
+            with span("mcp.initialize", server=server):
+                await session.initialize()
+        yield session
+
+@asynccontextmanager
+async def mcp_session(server: str, url: str):
+    """Open a session to `server` with its configured transport (`url` is used by sse/http)."""
+    async with open_session(server, transport_for(server), url) as session:
+        yield session
+
+async def call_tool(session: ClientSession, server: str, tool_name: str, arguments: dict):
+    with span("mcp.call_tool", server=server, tool=tool_name):
+        return await session.call_tool(tool_name, arguments)
+
+_in_flight: Dict[tuple, asyncio.Task] = {}
+
+async def coalesce(server: str, tool_name: str, arguments: dict, call: Callable[[], Awaitable[Any]]):
+    """
+    Single-flight for idempotent reads: concurrent calls with the same server, tool
+    and arguments share one MCP round trip. The first caller starts `call()` as a
+    task and every caller awaits it shielded, so one waiter being cancelled doesn't
+    cancel the others. Share the raw CallToolResult and parse per caller, so
+    callers never mutate each other's data.
+
+    The shared flight runs without a request deadline (only the tool's own
+    timeout); each caller waits on it for no longer than its own deadline allows,
+    so a caller with a short deadline can't cut the call short for the others.
+    """
+    loop = asyncio.get_running_loop()
+    key = (loop, server, tool_name, json.dumps(arguments, sort_keys=True, default=str))
+    task = _in_flight.get(key)
+    if task is None:
+        task = _in_flight[key] = loop.create_task(_without_deadline(call))
+        task.add_done_callback(functools.partial(_flight_done, key))
+    else:
+        MCP_COALESCED_CALLS.labels(server, tool_name).inc()
+    left = remaining()
+    if left is None:
+        return await asyncio.shield(task)
+    if left <= 0:
+        raise DeadlineExceeded(f"{server}.{tool_name}: request deadline exceeded")
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), left)
+    except asyncio.TimeoutError:
+        if not task.done():
+            raise DeadlineExceeded(f"{server}.{tool_name}: request deadline exceeded")
+        raise
+
+async def _without_deadline(call: Callable[[], Awaitable[Any]]):
+    # The task runs in a copy of the starting caller's context; drop its deadline there
+    _deadline.set(None)
+    return await call()
+
+def _flight_done(key: tuple, task: asyncio.Task):
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+    if not task.cancelled():
+        task.exception()  # retrieved, even if every waiter went away
+
+def parse_tool_result(tool_name: str, result, list_tools: Iterable[str] = ()) -> Any:
+    """
+    Decode a CallToolResult: JSON per content block (FastMCP splits lists into one
+    block per item), raw text where a block isn't JSON. `list_tools` always yield a
+    list, even when the server returned a single item.
+    """
+    if not result.content:
+        return None
+
+    # If multiple content blocks, it might be a list of items split by FastMCP
+    if len(result.content) > 1:
+        items = []
+        for content in result.content:
+            try:
+                items.append(json.loads(content.text))
+            except json.JSONDecodeError:
+                items.append(content.text)
+        return items
+
+    # Single content block
+    text_content = result.content[0].text
+    try:
+        data = json.loads(text_content)
+    except json.JSONDecodeError:
+        return text_content
+    # Handle case where MCP returns a single dict for a list-returning tool
+    if tool_name in list_tools and isinstance(data, dict) and "error" not in data:
+        return [data]
+    return data
@@ -1,44 +1,36 @@
 import os
 import sys
-import json
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+import uuid
+from app.core.tracing import span
+from app.core.metrics import observe_mcp_call
+from app.mcp_client.session import mcp_session, call_tool, coalesce, parse_tool_result
+from app.mcp_client.resilience import guarded_call
 
 # URL of the MCP server
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8001/sse")
+# Idempotent reads: concurrent identical calls share one round trip
+READ_TOOLS = ("list_tasks", "get_task")
+# Writes Todoist deduplicates (commands carry a uuid), so they can be retried like reads
+RETRY_SAFE_TOOLS = ("batch_commands",)
 
 class TodoistClient:
+    async def _call(self, tool_name, arguments):
+        async with mcp_session("todoist", MCP_SERVER_URL) as session:
+            return await call_tool(session, "todoist", tool_name, arguments)
+
     async def _run_tool(self, tool_name, arguments=None):
         if arguments is None:
             arguments = {}
             
         try:
-            async with sse_client(MCP_SERVER_URL) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    result = await session.call_tool(tool_name, arguments)
-                    
-                    # Parse the result
-                    if not result.content:
-                        return None
-                    
-                    # If multiple content blocks, it might be a list of items split by FastMCP
-                    if len(result.content) > 1:
-                        items = []
-                        for content in result.content:
-                            try:
-                                item = json.loads(content.text)
-                                items.append(item)
-                            except json.JSONDecodeError:
-                                items.append(content.text)
-                        return items
-                    
-                    # Single content block
-                    text_content = result.content[0].text
-                    try:
-                        return json.loads(text_content)
-                    except json.JSONDecodeError:
-                        return text_content
+            with span("mcp.tool", server="todoist", tool=tool_name), observe_mcp_call("todoist", tool_name) as check:
+                call = lambda: self._call(tool_name, arguments)
+                if tool_name in READ_TOOLS:
+                    result = await coalesce("todoist", tool_name, arguments,
+                                            lambda: guarded_call("todoist", tool_name, call, idempotent=True))
+                else:
+                    result = await guarded_call("todoist", tool_name, call, idempotent=tool_name in RETRY_SAFE_TOOLS)
+                return check(parse_tool_result(tool_name, result), result.isError)
         except Exception as e:
             print(f"MCP Error: {e}")
             raise e
@@ -72,5 +64,11 @@ class TodoistClient:
     async def close_task(self, task_id):
         return await self._run_tool("complete_task", {"task_id": task_id})
 
+    async def batch_commands(self, commands):
+        """Many creates/updates/moves/deletes/completes in one Sync API request (see the MCP tool)."""
+        # uuids fixed before the first attempt make retries of the whole batch apply it once
+        commands = [{**command, "uuid": command.get("uuid") or str(uuid.uuid4())} for command in commands]
+        return await self._run_tool("batch_commands", {"commands": commands})
+
 # Singleton instance
 todoist_client = TodoistClient()
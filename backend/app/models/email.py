@@ -0,0 +1,24 @@
+from typing import Optional, Dict, Any, List
+from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import Index
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+class Email(SQLModel, table=True):
+    __table_args__ = (
+        # Serves label filters (`labels @> '["UNREAD"]'`) for cached list_emails queries
+        Index("ix_email_labels_gin", "labels", postgresql_using="gin"),
+    )
+
+    id: str = Field(primary_key=True)
+    thread_id: Optional[str] = None
+    subject: Optional[str] = None
+    sender: Optional[str] = None
+    date: Optional[str] = None
+    snippet: Optional[str] = None
+    labels: Optional[List[str]] = Field(default=None, sa_column=Column(JSONB))
+    # Gmail's internalDate (naive UTC), the order Gmail lists messages in
+    received_at: Optional[datetime] = Field(default=None, index=True)
+
+    # Store raw JSON for any extra fields
+    raw_data: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
@@ -1,13 +1,22 @@
 from typing import Optional, Dict, Any
 from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import DateTime, Index, text
 from datetime import datetime
 
 class Event(SQLModel, table=True):
+    __table_args__ = (
+        # Window queries ("events overlapping [a, b)") as `tstzrange(start_time, end_time, '[]') && tstzrange(a, b)`.
+        # Closed bounds: with the default '[)' a zero-length event is the empty range and never overlaps.
+        Index("ix_event_time_range_closed", text("tstzrange(start_time, end_time, '[]')"), postgresql_using="gist"),
+    )
+
     id: str = Field(primary_key=True)
     summary: str
     description: Optional[str] = None
-    start_time: datetime
-    end_time: datetime
+    start_time: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    end_time: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    # Google all-day event: start/end are dates (end exclusive), stored as midnight UTC
+    all_day: bool = False
     status: Optional[str] = None
     html_link: Optional[str] = None
     
@@ -0,0 +1,12 @@
+from typing import Optional, Dict, Any, List
+from sqlmodel import SQLModel, Field, Column, JSON
+from datetime import datetime
+
+class GuidedSession(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    # Compact task snapshots (id, content, description, priority, due_date, labels) - no raw_data
+    tasks: List[Dict[str, Any]] = Field(default_factory=list, sa_column=Column(JSON))
+    current_index: int = 0
+    completed_count: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
@@ -0,0 +1,13 @@
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class SyncState(SQLModel, table=True):
+    # Background sync job name, e.g. "tasks" or "calendar"
+    name: str = Field(primary_key=True)
+    last_attempt_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    # Incremental sync position, e.g. the Google Calendar syncToken for push-driven updates
+    cursor: Optional[str] = None
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class TableVersion(SQLModel, table=True):
+    # Cached table name, e.g. "task" or "event"
+    name: str = Field(primary_key=True)
+    # Bumped in the same transaction as every change to that table's rows
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
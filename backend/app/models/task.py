@@ -1,19 +1,30 @@
 from typing import Optional, Dict, Any, List
 from sqlmodel import SQLModel, Field, Column, JSON
+from sqlalchemy import Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
 class Task(SQLModel, table=True):
+    __table_args__ = (
+        # Serves label containment filters (`labels ?| array[...]`)
+        Index("ix_task_labels_gin", "labels", postgresql_using="gin"),
+        # One btree per sort order offered by GET /tasks (keyset pagination walks these)
+        Index("ix_task_order_id", "order", "id"),
+        Index("ix_task_priority_due_id", text("priority DESC"), "due_date", "id"),
+        Index("ix_task_due_priority_id", "due_date", text("priority DESC"), "id"),
+    )
+
     id: str = Field(primary_key=True)
     content: str
     description: Optional[str] = None
-    project_id: Optional[str] = None
+    project_id: Optional[str] = Field(default=None, index=True)
     section_id: Optional[str] = None
     parent_id: Optional[str] = None
     priority: int = 1
     due_string: Optional[str] = None
     due_date: Optional[str] = None
     is_completed: bool = False
-    labels: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
+    labels: Optional[List[str]] = Field(default=None, sa_column=Column(JSONB))
     order: Optional[int] = 0
     url: Optional[str] = None
     created_at: Optional[datetime] = None
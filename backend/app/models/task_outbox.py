@@ -0,0 +1,30 @@
+from typing import Optional, Dict, Any
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+
+class TaskOutbox(SQLModel, table=True):
+    """A task write applied to the local cache and waiting to be pushed to Todoist."""
+    __table_args__ = (
+        # The worker's queue scan: pending entries in write order
+        Index("ix_taskoutbox_pending", "id", postgresql_where=text("status = 'pending'")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # "create", "update", "complete" or "delete"
+    action: str
+    # Local task id: a temporary "tmp-..." id for creates (and writes queued behind one)
+    task_id: str = Field(index=True)
+    # Changed fields (content, description, due_string, priority)
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSONB))
+    # Sync API command uuid, fixed at enqueue time so re-sends are applied once
+    command_uuid: str
+    # "pending", "done" or "failed"
+    status: str = "pending"
+    attempts: int = 0
+    last_error: Optional[str] = None
+    # Todoist's id for a pushed create
+    remote_id: Optional[str] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
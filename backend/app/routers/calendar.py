@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.db import engine
 from app.services.calendar_service import CalendarService
+from app.core.versions import CACHE_CONTROL, get_version, make_etag, etag_matches
 
 router = APIRouter(
     prefix="/calendar",
@@ -17,9 +19,38 @@ async def get_service():
         yield CalendarService(session)
 
 @router.get("/events")
-async def list_events(days: int = 7, service: CalendarService = Depends(get_service)):
-    """List upcoming calendar events."""
+async def list_events(
+    response: Response,
+    days: int = 7,
+    if_none_match: Optional[str] = Header(default=None),
+    service: CalendarService = Depends(get_service),
+):
+    """
+    List upcoming calendar events from the local cache (kept fresh by the background sync,
+    or refreshed inline when it isn't running). Supports conditional GET via `If-None-Match`.
+    """
     try:
-        return await service.list_events(days=days)
+        await service.refresh_if_stale(days)
+        # The window end is truncated to the hour so the response (and its ETag) is stable between polls
+        now = datetime.now(timezone.utc)
+        window_end = (now + timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+        version = await get_version(service.session, "event")
+        etag = make_etag("event", version, days, now.date().isoformat(), window_end.isoformat())
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+        return await service.get_cached_events(days=days, window_end=window_end)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sync")
+async def sync_events(days: int = 14, service: CalendarService = Depends(get_service)):
+    """Refresh the local event cache from Google Calendar now."""
+    try:
+        await service.refresh_events(days)
+        return await service.get_cached_events(days)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
@@ -7,13 +7,15 @@ from datetime import datetime
 from langchain_core.messages import HumanMessage, ToolMessage, AIMessage, SystemMessage
 from app.agent.graph import get_app_graph
 from app.agent.tools import SENSITIVE_TOOLS, SAFE_TOOLS
-from app.core.db import engine
+from app.core.db import engine, get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import select
 from app.services.task_service import TaskService
 from app.models.thread import Thread
 from app.core.llm import LLMFactory
+from app.agent.projections import compact
+from app.core.versions import etag_matches, get_version, make_etag
 
 router = APIRouter()
 
@@ -38,27 +40,51 @@ async def generate_thread_title(first_message: str) -> str:
 class ChatRequest(BaseModel):
     message: str
     thread_id: Optional[str] = None
+    # Index of the first message the client doesn't have yet (None = full transcript)
+    since: Optional[int] = None
 
 class ApproveRequest(BaseModel):
     thread_id: str
     approved_tool_call_ids: Optional[List[str]] = None
     # Backward compatibility
     tool_call_id: Optional[str] = None
+    since: Optional[int] = None
 
 class RejectRequest(BaseModel):
     thread_id: str
     tool_call_id: Optional[str] = None
     reason: Optional[str] = "Rejected by user"
+    since: Optional[int] = None
 
 class ChatResponse(BaseModel):
     thread_id: str
     messages: List[Dict[str, Any]]
+    # Transcript index of messages[0]; clients splice the delta in at this position
+    offset: int = 0
+    total_messages: int = 0
+    # ETag of the caught-up view: send it with the next poll (since=total_messages)
+    etag: Optional[str] = None
     proposed_actions: List[Dict[str, Any]] = []
     # Backward compatibility (optional, can be removed if frontend is updated simultaneously, 
     # but safer to keep it null or the first action)
     proposed_action: Optional[Dict[str, Any]] = None
     status: str # "ready", "waiting_for_approval"
 
+def _state_etag(snapshot, task_version: int, offset: int, total: int) -> str:
+    """
+    Strong ETag for one view of a thread: every graph step writes a new checkpoint id,
+    the resolved delta window (offset, total) picks the messages, and proposed actions
+    embed task details, so the task table version is part of it too.
+    """
+    checkpoint_id = (snapshot.config or {}).get("configurable", {}).get("checkpoint_id") if snapshot else None
+    return make_etag("chat", task_version, checkpoint_id or "empty", offset, total)
+
+def _delta_window(total: int, since: Optional[int]) -> int:
+    """Start index of the delta. Out-of-range cursors (e.g. stale client) fall back to a full resync."""
+    if since is None or since < 0 or since > total:
+        return 0
+    return since
+
 def _format_messages(messages):
     # Convert LangChain messages to a simple dict format for frontend
     formatted = []
@@ -83,7 +109,28 @@ def _format_messages(messages):
         })
     return formatted
 
-async def _get_proposed_action_with_details(snapshot):
+async def _build_response(thread_id: str, snapshot, session: AsyncSession, since: Optional[int] = None,
+                          task_version: Optional[int] = None) -> ChatResponse:
+    """Format only messages[since:] so per-request cost tracks what changed, not thread length."""
+    messages = snapshot.values.get("messages", []) if snapshot and snapshot.values else []
+    total = len(messages)
+    offset = _delta_window(total, since)
+    if task_version is None:
+        task_version = await get_version(session, "task")
+    proposed_actions, status = await _get_proposed_action_with_details(snapshot, session)
+
+    return ChatResponse(
+        thread_id=thread_id,
+        messages=_format_messages(messages[offset:]),
+        offset=offset,
+        total_messages=total,
+        etag=_state_etag(snapshot, task_version, total, total),
+        proposed_actions=proposed_actions,
+        proposed_action=proposed_actions[0] if proposed_actions else None,
+        status=status
+    )
+
+async def _get_proposed_action_with_details(snapshot, session: AsyncSession):
     proposed_actions = []
     status = "ready"
     
@@ -100,12 +147,9 @@ async def _get_proposed_action_with_details(snapshot):
                 task_id = args.get("task_id")
                 if task_id:
                     try:
-                        async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-                        async with async_session() as session:
-                            service = TaskService(session)
-                            task = await service.get_task(task_id)
-                            if task:
-                                action["task_details"] = task.model_dump()
+                        task = await TaskService(session).get_task(task_id)
+                        if task:
+                            action["task_details"] = task.model_dump()
                     except Exception as e:
                         print(f"Failed to fetch task details: {e}")
                 proposed_actions.append(action)
@@ -127,50 +171,56 @@ async def get_chat_history():
         return {"threads": []}
 
 @router.get("/{thread_id}", response_model=ChatResponse)
-async def get_chat_state(thread_id: str):
+async def get_chat_state(
+    thread_id: str,
+    response: Response,
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+):
     config = {"configurable": {"thread_id": thread_id}}
     app_graph = await get_app_graph()
     snapshot = await app_graph.aget_state(config)
+
+    # Unchanged since the client's last fetch: skip formatting and task lookups entirely
+    total = len(snapshot.values.get("messages", [])) if snapshot.values else 0
+    task_version = await get_version(session, "task")
+    etag = _state_etag(snapshot, task_version, _delta_window(total, since), total)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     
     if not snapshot.values:
         # New thread or empty
         return ChatResponse(
             thread_id=thread_id,
             messages=[],
+            etag=etag,
             status="ready"
         )
 
-    proposed_actions, status = await _get_proposed_action_with_details(snapshot)
-    
-    return ChatResponse(
-        thread_id=thread_id,
-        messages=_format_messages(snapshot.values["messages"]),
-        proposed_actions=proposed_actions,
-        proposed_action=proposed_actions[0] if proposed_actions else None,
-        status=status
-    )
+    return await _build_response(thread_id, snapshot, session, since, task_version)
 
 @router.post("/message", response_model=ChatResponse)
-async def chat_message(request: ChatRequest):
+async def chat_message(request: ChatRequest, session: AsyncSession = Depends(get_session)):
     thread_id = request.thread_id or str(uuid.uuid4())
     
     # Handle Thread Metadata
     try:
-        async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-        async with async_session() as session:
-            thread = await session.get(Thread, thread_id)
-            if not thread:
-                # New thread, generate title
-                title = await generate_thread_title(request.message)
-                thread = Thread(id=thread_id, title=title)
-                session.add(thread)
-            else:
-                # Update timestamp
-                thread.updated_at = datetime.utcnow()
-                session.add(thread)
-            await session.commit()
+        thread = await session.get(Thread, thread_id)
+        if not thread:
+            # New thread, generate title
+            title = await generate_thread_title(request.message)
+            thread = Thread(id=thread_id, title=title)
+            session.add(thread)
+        else:
+            # Update timestamp
+            thread.updated_at = datetime.utcnow()
+            session.add(thread)
+        await session.commit()
     except Exception as e:
         print(f"Error updating thread metadata: {e}")
+        await session.rollback()
 
     config = {"configurable": {"thread_id": thread_id}}
     
@@ -216,18 +266,20 @@ async def chat_message(request: ChatRequest):
     # Check if we are interrupted
     snapshot = await app_graph.aget_state(config)
     
-    proposed_actions, status = await _get_proposed_action_with_details(snapshot)
-    
-    return ChatResponse(
-        thread_id=thread_id,
-        messages=_format_messages(snapshot.values["messages"]),
-        proposed_actions=proposed_actions,
-        proposed_action=proposed_actions[0] if proposed_actions else None,
-        status=status
+    return await _build_response(thread_id, snapshot, session, request.since)
+
+def _approved_tool_message(tool_call: Dict[str, Any], result: Any) -> ToolMessage:
+    # Tools already return compact JSON; project anything else the same way
+    # so full rows (raw_data etc.) never land in the transcript.
+    content_str = result if isinstance(result, str) else compact(tool_call["name"], result)
+    return ToolMessage(
+        tool_call_id=tool_call["id"],
+        content=content_str,
+        name=tool_call["name"]
     )
 
 @router.post("/approve", response_model=ChatResponse)
-async def approve_action(request: ApproveRequest):
+async def approve_action(request: ApproveRequest, session: AsyncSession = Depends(get_session)):
     config = {"configurable": {"thread_id": request.thread_id}}
     
     app_graph = await get_app_graph()
@@ -260,34 +312,7 @@ async def approve_action(request: ApproveRequest):
                 try:
                     # We need to await the tool execution
                     result = await tool.ainvoke(tool_call["args"])
-                    
-                    # Serialize result to JSON for better frontend handling
-                    import json
-                    content_str = str(result)
-                    try:
-                        if hasattr(result, "model_dump"):
-                            content_str = json.dumps(result.model_dump(), default=str)
-                        elif isinstance(result, list):
-                            # Handle list of models or dicts
-                            serialized_list = []
-                            for item in result:
-                                if hasattr(item, "model_dump"):
-                                    serialized_list.append(item.model_dump())
-                                else:
-                                    serialized_list.append(item)
-                            content_str = json.dumps(serialized_list, default=str)
-                        elif isinstance(result, dict):
-                            content_str = json.dumps(result, default=str)
-                    except Exception as e:
-                        print(f"Serialization error: {e}")
-                        # Fallback to string representation
-                        pass
-
-                    tool_outputs.append(ToolMessage(
-                        tool_call_id=tc_id,
-                        content=content_str,
-                        name=tool_name
-                    ))
+                    tool_outputs.append(_approved_tool_message(tool_call, result))
                 except Exception as e:
                     tool_outputs.append(ToolMessage(
                         tool_call_id=tc_id,
@@ -323,18 +348,10 @@ async def approve_action(request: ApproveRequest):
     # Check if there are more actions or if we are done
     snapshot = await app_graph.aget_state(config)
     
-    proposed_actions, status = await _get_proposed_action_with_details(snapshot)
-            
-    return ChatResponse(
-        thread_id=request.thread_id,
-        messages=_format_messages(snapshot.values["messages"]),
-        proposed_actions=proposed_actions,
-        proposed_action=proposed_actions[0] if proposed_actions else None,
-        status=status
-    )
+    return await _build_response(request.thread_id, snapshot, session, request.since)
 
 @router.post("/reject", response_model=ChatResponse)
-async def reject_action(request: RejectRequest):
+async def reject_action(request: RejectRequest, session: AsyncSession = Depends(get_session)):
     config = {"configurable": {"thread_id": request.thread_id}}
     
     app_graph = await get_app_graph()
@@ -370,12 +387,4 @@ async def reject_action(request: RejectRequest):
     
     snapshot = await app_graph.aget_state(config)
     
-    proposed_actions, status = await _get_proposed_action_with_details(snapshot)
-
-    return ChatResponse(
-        thread_id=request.thread_id,
-        messages=_format_messages(snapshot.values["messages"]),
-        proposed_actions=proposed_actions,
-        proposed_action=proposed_actions[0] if proposed_actions else None,
-        status=status
-    )
+    return await _build_response(request.thread_id, snapshot, session, request.since)
@@ -2,16 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from app.services.task_service import TaskService
+from app.services.guided_session_store import GuidedSessionStore, get_guided_session_store
+from app.models.guided_session import GuidedSession
+from app.models.task import Task
 from app.core.db import engine
+from app.core.metrics import GUIDED_SESSIONS_STARTED, GUIDED_TASKS
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 import uuid
 
 router = APIRouter(prefix="/guided", tags=["guided"])
 
-# In-memory session store
-sessions: Dict[str, Dict] = {}
-
 class GuidedSessionStart(BaseModel):
     duration_minutes: int = 30
     labels: List[str] = ["admin"]
@@ -27,76 +28,89 @@ async def get_task_service():
     async with async_session() as session:
         yield TaskService(session)
 
+def _session_task(task: Task) -> Dict[str, Any]:
+    """Compact snapshot of a task: only what the guided view shows (no raw_data)."""
+    return {
+        "id": task.id,
+        "content": task.content,
+        "description": task.description,
+        "priority": task.priority,
+        "due_date": task.due_date,
+        "labels": task.labels,
+    }
+
+def _state(session: GuidedSession) -> GuidedSessionState:
+    idx = session.current_index
+    tasks = session.tasks
+    return GuidedSessionState(
+        session_id=session.id,
+        current_task=tasks[idx] if idx < len(tasks) else None,
+        remaining_tasks=max(0, len(tasks) - idx),
+        completed_tasks=session.completed_count
+    )
+
+async def _load(store: GuidedSessionStore, session_id: str) -> GuidedSession:
+    session = await store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
 @router.post("/start", response_model=GuidedSessionState)
-async def start_session(params: GuidedSessionStart, service: TaskService = Depends(get_task_service)):
-    # Get tasks
-    all_tasks = await service.list_tasks()
-    
-    # Filter tasks
+async def start_session(
+    params: GuidedSessionStart,
+    service: TaskService = Depends(get_task_service),
+    store: GuidedSessionStore = Depends(get_guided_session_store),
+):
+    # Filter tasks in SQL
     # 1. By label
-    filtered = [t for t in all_tasks if any(l in t.labels for l in params.labels)]
+    filtered = await service.query_tasks(labels=params.labels) if params.labels else []
     
     # 2. If not enough, take top priority
     if not filtered:
-        # Sort by priority (descending)
-        filtered = sorted(all_tasks, key=lambda t: t.priority, reverse=True)[:5]
-    
-    session_id = str(uuid.uuid4())
-    # Store as dicts using model_dump()
-    sessions[session_id] = {
-        "tasks": [t.model_dump() for t in filtered], 
-        "current_index": 0,
-        "completed_count": 0
-    }
-    
-    current_task = sessions[session_id]["tasks"][0] if sessions[session_id]["tasks"] else None
+        filtered = await service.query_tasks(order_by="priority", limit=5)
+
+    # Opportunistic cleanup of abandoned sessions
+    await store.purge_expired()
     
-    return GuidedSessionState(
-        session_id=session_id,
-        current_task=current_task,
-        remaining_tasks=len(sessions[session_id]["tasks"]),
-        completed_tasks=0
+    session = GuidedSession(
+        id=str(uuid.uuid4()),
+        tasks=[_session_task(t) for t in filtered],
     )
+    session = await store.save(session)
+    GUIDED_SESSIONS_STARTED.inc()
+    return _state(session)
 
 @router.post("/{session_id}/next", response_model=GuidedSessionState)
-async def next_task(session_id: str):
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = sessions[session_id]
-    session["current_index"] += 1
-    
-    idx = session["current_index"]
-    tasks = session["tasks"]
-    
-    current_task = tasks[idx] if idx < len(tasks) else None
-    
-    return GuidedSessionState(
-        session_id=session_id,
-        current_task=current_task,
-        remaining_tasks=max(0, len(tasks) - idx),
-        completed_tasks=session["completed_count"]
-    )
+async def next_task(session_id: str, store: GuidedSessionStore = Depends(get_guided_session_store)):
+    session = await _load(store, session_id)
+    session.current_index += 1
+    session = await store.save(session)
+    return _state(session)
 
 @router.post("/{session_id}/complete", response_model=GuidedSessionState)
-async def complete_current_task(session_id: str, service: TaskService = Depends(get_task_service)):
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    session = sessions[session_id]
-    idx = session["current_index"]
-    tasks = session["tasks"]
+async def complete_current_task(
+    session_id: str,
+    service: TaskService = Depends(get_task_service),
+    store: GuidedSessionStore = Depends(get_guided_session_store),
+):
+    session = await _load(store, session_id)
+    idx = session.current_index
+    tasks = session.tasks
     
     if idx < len(tasks):
         task = tasks[idx]
         # Complete in Todoist
         await service.close_task(task["id"])
-        session["completed_count"] += 1
+        session.completed_count += 1
+        GUIDED_TASKS.labels("completed").inc()
     
     # Move to next
-    return await next_task(session_id)
+    session.current_index += 1
+    session = await store.save(session)
+    return _state(session)
 
 @router.post("/{session_id}/skip", response_model=GuidedSessionState)
-async def skip_current_task(session_id: str):
+async def skip_current_task(session_id: str, store: GuidedSessionStore = Depends(get_guided_session_store)):
     # Just move next without completing
-    return await next_task(session_id)
+    GUIDED_TASKS.labels("skipped").inc()
+    return await next_task(session_id, store)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from typing import List
+from app.models.sync_state import SyncState
+from app.services.sync_scheduler import sync_scheduler
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+@router.get("/status", response_model=List[SyncState])
+async def get_sync_status():
+    """Last attempt/success timestamps and failure streaks of the background sync jobs."""
+    return await sync_scheduler.status()
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, List, Any
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from pydantic import BaseModel, Field
+from typing import Optional, List, Any, Literal
+from datetime import date
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.db import get_session
-from app.services.task_service import TaskService
+from app.services.task_service import TaskService, TASK_SORTS, task_cursor, decode_task_cursor
+from app.core.versions import CACHE_CONTROL, get_version, make_etag, etag_matches
 
 router = APIRouter()
 
+# One Todoist Sync API request holds at most 100 commands
+MAX_BULK_OPERATIONS = 100
+
 class TaskCreate(BaseModel):
     content: str
     description: Optional[str] = None
@@ -19,11 +24,87 @@ class TaskUpdate(BaseModel):
     due_string: Optional[str] = None
     priority: Optional[int] = None
 
+class BulkTaskOperation(BaseModel):
+    action: Literal["create", "update", "close", "delete"]
+    task_id: Optional[str] = None
+    # Lets later operations in the same request refer to a task created here (as task_id)
+    temp_id: Optional[str] = None
+    content: Optional[str] = None
+    description: Optional[str] = None
+    due_string: Optional[str] = None
+    priority: Optional[int] = None
+
+class BulkTaskRequest(BaseModel):
+    operations: List[BulkTaskOperation] = Field(min_length=1, max_length=MAX_BULK_OPERATIONS)
+
 @router.get("/")
-async def get_tasks(session: AsyncSession = Depends(get_session)):
-    """Fetch all tasks from local DB."""
+async def get_tasks(
+    request: Request,
+    response: Response,
+    project_id: Optional[str] = None,
+    label: Optional[List[str]] = Query(default=None),
+    priority: Optional[int] = Query(default=None, ge=1, le=4),
+    due_before: Optional[date] = None,
+    due_after: Optional[date] = None,
+    q: Optional[str] = None,
+    sort: str = "order",
+    limit: Optional[int] = Query(default=None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Fetch tasks from local DB, optionally filtered and paginated.
+    With `limit`, the `X-Next-Cursor` response header carries the cursor for the next page.
+    Supports conditional GET: a matching `If-None-Match` gets a 304 without reading any task rows.
+    """
+    version = await get_version(session, "task")
+    etag = make_etag("task", version, *sorted(request.query_params.multi_items()))
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
     service = TaskService(session)
-    return await service.get_all_tasks()
+    if sort not in TASK_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(TASK_SORTS)}")
+    try:
+        after = decode_task_cursor(cursor, sort) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    tasks = await service.query_tasks(
+        labels=label,
+        order_by=sort,
+        limit=limit,
+        project_id=project_id,
+        priority=priority,
+        due_before=due_before,
+        due_after=due_after,
+        text=q,
+        after=after,
+    )
+    if limit is not None and len(tasks) == limit:
+        response.headers["X-Next-Cursor"] = task_cursor(tasks[-1], sort)
+    return tasks
+
+@router.get("/search")
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1),
+    limit: int = Query(default=10, ge=1, le=100),
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+):
+    """Ranked full-text search over cached task content and descriptions."""
+    version = await get_version(session, "task")
+    etag = make_etag("task", version, *sorted(request.query_params.multi_items()))
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return await TaskService(session).search_tasks(q, limit)
 
 @router.post("/sync")
 async def sync_tasks(session: AsyncSession = Depends(get_session)):
@@ -45,6 +126,48 @@ async def create_task(task: TaskCreate, session: AsyncSession = Depends(get_sess
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk")
+async def bulk_tasks(bulk: BulkTaskRequest, session: AsyncSession = Depends(get_session)):
+    """
+    Apply mixed create/update/close/delete operations in one batched Todoist call and one
+    local-cache transaction. Returns one result per operation, in order:
+    {index, action, id, status: "ok"|"error", error?, task?}. Failed operations don't fail the request.
+    """
+    for index, op in enumerate(bulk.operations):
+        if op.action == "create" and not op.content:
+            raise HTTPException(status_code=422, detail=f"operations[{index}]: create needs content")
+        if op.action != "create" and not op.task_id:
+            raise HTTPException(status_code=422, detail=f"operations[{index}]: {op.action} needs task_id")
+
+    changes = [
+        {**op.model_dump(exclude_none=True), "action": "complete" if op.action == "close" else op.action}
+        for op in bulk.operations
+    ]
+    try:
+        result = await TaskService(session).apply_task_changes(changes)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    tasks = {task.id: task for task in result["tasks"]}
+    results = []
+    batch_results = result["results"]
+    for index, op in enumerate(bulk.operations):
+        if index >= len(batch_results):
+            # Todoist returned fewer results than commands: never report those as applied
+            results.append({"index": index, "action": op.action, "id": op.task_id,
+                            "status": "error", "error": "No result returned for this operation"})
+            continue
+        item = batch_results[index]
+        entry = {"index": index, "action": op.action, "id": item.get("id")}
+        if item.get("status") == "ok":
+            entry["status"] = "ok"
+            if item.get("id") in tasks:
+                entry["task"] = tasks[item["id"]]
+        else:
+            entry.update(status="error", error=item.get("error"))
+        results.append(entry)
+    return {"results": results}
+
 @router.put("/{task_id}")
 async def update_task(task_id: str, task: TaskUpdate, session: AsyncSession = Depends(get_session)):
     """Update a task via MCP and update local DB."""
@@ -0,0 +1,101 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, BackgroundTasks
+from typing import Optional
+import base64
+import hashlib
+import hmac
+import json
+import os
+import uuid
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.db import engine
+from app.services.task_service import TaskService
+from app.services.sync_scheduler import sync_calendar_changes
+from app.mcp_client.calendar_client import calendar_client
+
+# Todoist app client secret: webhook bodies are signed with HMAC-SHA256 using it
+TODOIST_CLIENT_SECRET = os.getenv("TODOIST_CLIENT_SECRET")
+# Token registered with the Google Calendar watch channel, echoed back in X-Goog-Channel-Token
+GOOGLE_CALENDAR_CHANNEL_TOKEN = os.getenv("GOOGLE_CALENDAR_CHANNEL_TOKEN")
+# Public HTTPS base URL of this backend, used when registering the Google watch channel
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")
+
+router = APIRouter(
+    prefix="/webhooks",
+    tags=["webhooks"],
+)
+
+async def get_task_service():
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        yield TaskService(session)
+
+def todoist_signature(secret: str, body: bytes) -> str:
+    """Value of X-Todoist-Hmac-SHA256 for `body`: base64(HMAC-SHA256(client secret, raw body))."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+def verify_todoist_signature(secret: Optional[str], body: bytes, signature: Optional[str]):
+    if not secret:
+        raise HTTPException(status_code=503, detail="Todoist webhooks are not configured")
+    if not signature or not hmac.compare_digest(todoist_signature(secret, body), signature):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+@router.post("/todoist")
+async def todoist_webhook(
+    request: Request,
+    x_todoist_hmac_sha256: Optional[str] = Header(default=None),
+    service: TaskService = Depends(get_task_service),
+):
+    """
+    Todoist webhook receiver. Applies the single changed item to the local cache
+    instead of waiting for the next full sync.
+    """
+    body = await request.body()
+    verify_todoist_signature(TODOIST_CLIENT_SECRET, body, x_todoist_hmac_sha256)
+    try:
+        payload = json.loads(body)
+        event_name = payload["event_name"]
+        event_data = payload.get("event_data") or {}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed webhook payload")
+
+    applied = await service.apply_todoist_event(event_name, event_data)
+    return {"status": "applied" if applied else "ignored"}
+
+@router.post("/google-calendar")
+async def google_calendar_webhook(
+    background_tasks: BackgroundTasks,
+    x_goog_channel_token: Optional[str] = Header(default=None),
+    x_goog_resource_state: Optional[str] = Header(default=None),
+):
+    """
+    Google Calendar push notification receiver. Notifications carry no event data,
+    so the changed events are pulled incrementally (syncToken) after acknowledging.
+    """
+    if not GOOGLE_CALENDAR_CHANNEL_TOKEN:
+        raise HTTPException(status_code=503, detail="Calendar push notifications are not configured")
+    if not x_goog_channel_token or not hmac.compare_digest(x_goog_channel_token, GOOGLE_CALENDAR_CHANNEL_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid channel token")
+
+    # "sync" is the handshake sent when the channel is created
+    if x_goog_resource_state != "sync":
+        background_tasks.add_task(sync_calendar_changes)
+    return {"status": "accepted"}
+
+@router.post("/google-calendar/watch")
+async def watch_google_calendar(ttl_seconds: int = 604800):
+    """Register (or renew) the Google Calendar push channel pointing at this backend."""
+    if not WEBHOOK_BASE_URL or not GOOGLE_CALENDAR_CHANNEL_TOKEN:
+        raise HTTPException(status_code=503, detail="WEBHOOK_BASE_URL and GOOGLE_CALENDAR_CHANNEL_TOKEN must be set")
+    # Establish the sync position first so the first notification only pulls new changes
+    await sync_calendar_changes()
+    result = await calendar_client.watch_events(
+        address=f"{WEBHOOK_BASE_URL.rstrip('/')}/webhooks/google-calendar",
+        channel_id=str(uuid.uuid4()),
+        token=GOOGLE_CALENDAR_CHANNEL_TOKEN,
+        ttl_seconds=ttl_seconds,
+    )
+    if not isinstance(result, dict) or "error" in result:
+        raise HTTPException(status_code=502, detail=f"Failed to register watch channel: {result}")
+    return result
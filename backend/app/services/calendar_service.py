@@ -1,84 +1,199 @@
 from sqlmodel import select, delete
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import func, literal_column
 from datetime import datetime, timedelta, timezone
 from app.models.event import Event
+from app.models.sync_state import SyncState
 from app.mcp_client.calendar_client import calendar_client
+from app.core.versions import bump_version
+from typing import Optional, Dict, Any, Tuple
+import os
+import time
 import dateutil.parser
 
+# Background refresh cadence of the "calendar" job (see sync_scheduler)
+CALENDAR_SYNC_INTERVAL_SECONDS = float(os.getenv("CALENDAR_SYNC_INTERVAL_SECONDS", "300"))
+CALENDAR_SYNC_STATE = "calendar"
+# Minimum interval between inline refreshes triggered by reads (per process)
+CALENDAR_REFRESH_SECONDS = float(os.getenv("CALENDAR_REFRESH_SECONDS", "60"))
+_last_inline_refresh: Optional[float] = None
+
+def parse_event_time(value: str) -> Tuple[datetime, bool]:
+    """
+    Google start/end string -> (aware UTC datetime, all_day). All-day events carry a bare
+    date, kept as midnight UTC; naive datetimes are taken as UTC.
+    """
+    dt = dateutil.parser.parse(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc), len(value.strip()) == 10
+
+# Inclusive event range, spelled exactly like the ix_event_time_range_closed index expression
+EVENT_RANGE = func.tstzrange(Event.start_time, Event.end_time, literal_column("'[]'"))
+
+def overlapping(start: datetime, end: datetime):
+    """Events overlapping [start, end), zero-length ones included, answered by the GiST range index."""
+    return EVENT_RANGE.op("&&")(func.tstzrange(start, end))
+
+def _today_start() -> datetime:
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
 class CalendarService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def list_events(self, days: int = 7):
         """
-        Fetch events from MCP, update local cache, and return cached events.
-        Implements 'Write-Through' cache policy.
+        Return upcoming events from the local cache.
+        The cache is kept fresh by the background sync scheduler (see refresh_events),
+        or refreshed inline when that isn't running (see refresh_if_stale).
+        """
+        await self.refresh_if_stale(days)
+        return await self.get_cached_events(days)
+
+    async def refresh_if_stale(self, days: int = 7) -> bool:
+        """
+        Refresh inline unless the background "calendar" job succeeded recently (within two
+        intervals): covers SYNC_ENABLED=false, startup before its first run, and a stalled job.
+        Inline refreshes are attempted at most every CALENDAR_REFRESH_SECONDS per process, so
+        polling stays cheap, and a failed one serves the cache as is.
+        Returns True if it refreshed.
         """
-        # 1. Fetch from MCP
+        global _last_inline_refresh
+        state = await self.session.get(SyncState, CALENDAR_SYNC_STATE)
+        if state and state.last_success_at and \
+                datetime.utcnow() - state.last_success_at < timedelta(seconds=2 * CALENDAR_SYNC_INTERVAL_SECONDS):
+            return False
+        if _last_inline_refresh is not None and time.monotonic() - _last_inline_refresh < CALENDAR_REFRESH_SECONDS:
+            return False
+        _last_inline_refresh = time.monotonic()
         try:
-            mcp_events = await calendar_client.list_events(days=days)
+            await self.refresh_events(days)
         except Exception as e:
-            print(f"Error fetching from MCP: {e}")
-            mcp_events = []
-        
-        # Check for error response from MCP
-        if mcp_events and isinstance(mcp_events, list) and len(mcp_events) > 0 and "error" in mcp_events[0]:
-             print(f"MCP returned error: {mcp_events[0]['error']}")
-             mcp_events = []
+            print(f"Error refreshing calendar cache: {e}")
+            return False
+        return True
+
+    async def refresh_events(self, days: int = 7) -> bool:
+        """
+        Pull events from MCP and upsert them into the local cache.
+        Returns True if the cached rows changed. Raises if MCP fails, so the cache
+        (and the sync job's last success) is left untouched.
+        """
+        # 1. Fetch from MCP (the client reports failures as {"error": ...})
+        mcp_events = await calendar_client.list_events(days=days) or []
+        if isinstance(mcp_events, list) and mcp_events and isinstance(mcp_events[0], dict) and "error" in mcp_events[0]:
+            mcp_events = mcp_events[0]
+        if not isinstance(mcp_events, list):
+            error = mcp_events.get("error") if isinstance(mcp_events, dict) else mcp_events
+            raise RuntimeError(f"Calendar MCP error: {error}")
 
         # 2. Clean up old events (older than today)
         # We keep events starting from today onwards
-        now = datetime.utcnow()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        today_start = _today_start()
         
         # Delete events that end before today
         statement = delete(Event).where(Event.end_time < today_start)
-        await self.session.exec(statement)
+        result = await self.session.exec(statement)
+        changed = bool(result.rowcount)
         
         # 3. Upsert fetched events
-        if mcp_events:
-            for event_data in mcp_events:
-                try:
-                    # Parse dates (Google returns ISO strings)
-                    start_dt = dateutil.parser.parse(event_data["start"])
-                    end_dt = dateutil.parser.parse(event_data["end"])
-                    
-                    # Convert to naive UTC for Postgres TIMESTAMP WITHOUT TIME ZONE
-                    if start_dt.tzinfo:
-                        start_dt = start_dt.astimezone(timezone.utc).replace(tzinfo=None)
-                    if end_dt.tzinfo:
-                        end_dt = end_dt.astimezone(timezone.utc).replace(tzinfo=None)
-                    
-                    # Check if exists
-                    existing = await self.session.get(Event, event_data["id"])
-                    if existing:
-                        existing.summary = event_data["summary"]
-                        existing.description = event_data.get("description")
-                        existing.start_time = start_dt
-                        existing.end_time = end_dt
-                        existing.raw_data = event_data
-                        self.session.add(existing)
-                    else:
-                        event = Event(
-                            id=event_data["id"],
-                            summary=event_data["summary"],
-                            description=event_data.get("description"),
-                            start_time=start_dt,
-                            end_time=end_dt,
-                            raw_data=event_data
-                        )
-                        self.session.add(event)
-                except Exception as e:
-                    print(f"Error processing event {event_data.get('id')}: {e}")
+        for event_data in mcp_events:
+            try:
+                changed = await self._upsert_event(event_data) or changed
+            except Exception as e:
+                print(f"Error processing event {event_data.get('id')}: {e}")
         
+        if changed:
+            await bump_version(self.session, "event")
         await self.session.commit()
+        return changed
+
+    async def _upsert_event(self, event_data: Dict[str, Any]) -> bool:
+        """Insert or update one event from MCP data (not committed). Returns True if the row changed."""
+        start_dt, all_day = parse_event_time(event_data["start"])
+        # tstzrange() rejects end < start
+        end_dt = max(parse_event_time(event_data["end"])[0], start_dt)
         
-        # 4. Return from DB (sorted)
-        # We want events from now up to days
-        # Actually, let's just return all future events we have, or limit by the requested window
-        end_window = now + timedelta(days=days)
-        
-        statement = select(Event).where(Event.start_time >= today_start).where(Event.start_time <= end_window).order_by(Event.start_time)
+        # Check if exists
+        existing = await self.session.get(Event, event_data["id"])
+        if existing:
+            if existing.raw_data == event_data:
+                return False
+            existing.summary = event_data["summary"]
+            existing.description = event_data.get("description")
+            existing.start_time = start_dt
+            existing.end_time = end_dt
+            existing.all_day = all_day
+            existing.raw_data = event_data
+            self.session.add(existing)
+        else:
+            event = Event(
+                id=event_data["id"],
+                summary=event_data["summary"],
+                description=event_data.get("description"),
+                start_time=start_dt,
+                end_time=end_dt,
+                all_day=all_day,
+                raw_data=event_data
+            )
+            self.session.add(event)
+        return True
+
+    async def upsert_event(self, event_data: Dict[str, Any]) -> bool:
+        """Apply a single upstream event (e.g. from a push notification) to the cache."""
+        changed = await self._upsert_event(event_data)
+        if changed:
+            await bump_version(self.session, "event")
+            await self.session.commit()
+        return changed
+
+    async def delete_local_event(self, event_id: str) -> bool:
+        event = await self.session.get(Event, event_id)
+        if not event:
+            return False
+        await self.session.delete(event)
+        await bump_version(self.session, "event")
+        await self.session.commit()
+        return True
+
+    async def apply_event_changes(self, sync_token: Optional[str]) -> Tuple[int, Optional[str]]:
+        """
+        Incremental sync driven by Google Calendar push notifications: fetch only events changed
+        since `sync_token` and upsert/delete them one by one. Returns (events applied, next sync token).
+        Without a token (or if Google expired it) this only establishes a fresh token, since the
+        scheduled refresh keeps the cache populated.
+        """
+        result = await calendar_client.list_event_changes(sync_token)
+        if isinstance(result, dict) and result.get("error") == "sync_token_expired" and sync_token:
+            result = await calendar_client.list_event_changes(None)
+        if not isinstance(result, dict) or "error" in result:
+            raise Exception(f"Failed to fetch calendar changes: {result}")
+
+        today_start = _today_start()
+        applied = 0
+        for event_data in result.get("events", []):
+            try:
+                if event_data.get("status") == "cancelled":
+                    changed = await self.delete_local_event(event_data["id"])
+                elif parse_event_time(event_data["end"])[0] >= today_start:
+                    changed = await self.upsert_event(event_data)
+                else:
+                    changed = False
+                applied += int(changed)
+            except Exception as e:
+                print(f"Error applying change for event {event_data.get('id')}: {e}")
+                await self.session.rollback()
+        return applied, result.get("next_sync_token")
+
+    async def get_cached_events(self, days: int = 7, window_end: Optional[datetime] = None):
+        """Events overlapping [today, `window_end`) (default: now + days), from the local cache."""
+        end_window = window_end or datetime.now(timezone.utc) + timedelta(days=days)
+        return await self.get_events_between(_today_start(), end_window)
+
+    async def get_events_between(self, start: datetime, end: datetime):
+        """Cached events overlapping [start, end) (aware datetimes), ordered by start."""
+        statement = select(Event).where(overlapping(start, end)).order_by(Event.start_time, Event.id)
         results = await self.session.exec(statement)
         return results.all()
 
@@ -91,14 +206,8 @@ class CalendarService:
 
         # 2. Add to DB
         try:
-            start_dt = dateutil.parser.parse(start_time)
-            end_dt = dateutil.parser.parse(end_time)
-            
-            # Convert to naive UTC
-            if start_dt.tzinfo:
-                start_dt = start_dt.astimezone(timezone.utc).replace(tzinfo=None)
-            if end_dt.tzinfo:
-                end_dt = end_dt.astimezone(timezone.utc).replace(tzinfo=None)
+            start_dt, all_day = parse_event_time(start_time)
+            end_dt = max(parse_event_time(end_time)[0], start_dt)
             
             event = Event(
                 id=result["id"],
@@ -106,11 +215,13 @@ class CalendarService:
                 description=description,
                 start_time=start_dt,
                 end_time=end_dt,
+                all_day=all_day,
                 status=result.get("status"),
                 html_link=result.get("link"),
                 raw_data=result
             )
             self.session.add(event)
+            await bump_version(self.session, "event")
             await self.session.commit()
             await self.session.refresh(event)
             return event
@@ -0,0 +1,136 @@
+"""
+Compaction and retention for the LangGraph Postgres checkpointer's tables.
+
+AsyncPostgresSaver writes several checkpoints per chat turn and never deletes any.
+The app only ever reads a thread's latest checkpoint (`aget_state`), which also
+carries a pending interrupt (the sensitive-tool approval) and its pending writes,
+so older checkpoints are dead weight:
+
+- compaction keeps the newest CHECKPOINT_KEEP_LATEST checkpoints per thread and
+  namespace, their pending writes, and the channel blobs they still reference;
+- retention drops threads whose latest checkpoint is older than
+  CHECKPOINT_RETENTION_DAYS entirely (checkpoints, writes, blobs, Thread row).
+
+Runs as the "checkpoints" background job (see sync_scheduler). Freed space is
+returned to Postgres by (auto)vacuum; the byte counts are the deleted row sizes.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+import logging
+import os
+
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import CHECKPOINT_ROWS_DELETED, CHECKPOINT_BYTES_RECLAIMED
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEEP_LATEST = max(1, int(os.getenv("CHECKPOINT_KEEP_LATEST", "2")))
+CHECKPOINT_RETENTION_DAYS = float(os.getenv("CHECKPOINT_RETENTION_DAYS", "90"))  # 0 keeps threads forever
+
+_DELETED = "SELECT count(*), coalesce(sum(size), 0) FROM deleted"
+
+COMPACT_STATEMENTS = {
+    "checkpoint_writes": """
+        WITH deleted AS (
+            DELETE FROM checkpoint_writes w USING doomed_checkpoints d
+            WHERE w.thread_id = d.thread_id AND w.checkpoint_ns = d.checkpoint_ns AND w.checkpoint_id = d.checkpoint_id
+            RETURNING pg_column_size(w.*) AS size
+        ) """ + _DELETED,
+    "checkpoints": """
+        WITH deleted AS (
+            DELETE FROM checkpoints c USING doomed_checkpoints d
+            WHERE c.thread_id = d.thread_id AND c.checkpoint_ns = d.checkpoint_ns AND c.checkpoint_id = d.checkpoint_id
+            RETURNING pg_column_size(c.*) AS size
+        ) """ + _DELETED,
+    # Only blob versions the deleted checkpoints referenced, so blobs written ahead of a
+    # checkpoint that isn't committed yet (newer versions) are never touched
+    "checkpoint_blobs": """
+        WITH deleted AS (
+            DELETE FROM checkpoint_blobs b
+            WHERE (b.thread_id, b.checkpoint_ns, b.channel, b.version) IN (
+                SELECT d.thread_id, d.checkpoint_ns, v.key, v.value
+                FROM doomed_checkpoints d, jsonb_each_text(d.channel_versions) v
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM checkpoints c, jsonb_each_text(c.checkpoint -> 'channel_versions') v
+                WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                  AND v.key = b.channel AND v.value = b.version
+            )
+            RETURNING pg_column_size(b.*) AS size
+        ) """ + _DELETED,
+}
+
+
+class CheckpointRetentionService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _tables_exist(self) -> bool:
+        # Absent until AsyncPostgresSaver.setup() ran (or with the MemorySaver fallback)
+        result = await self.session.execute(text("SELECT to_regclass('checkpoints') IS NOT NULL"))
+        return bool(result.scalar())
+
+    async def _delete(self, table: str, statement: str, stats: Dict[str, int], **params):
+        rows, size = (await self.session.execute(text(statement), params)).one()
+        stats[f"{table}_rows"] = stats.get(f"{table}_rows", 0) + rows
+        stats["bytes"] = stats.get("bytes", 0) + size
+        CHECKPOINT_ROWS_DELETED.labels(table).inc(rows)
+        CHECKPOINT_BYTES_RECLAIMED.inc(size)
+
+    async def compact(self, keep: int = CHECKPOINT_KEEP_LATEST) -> Dict[str, int]:
+        """Delete all but the newest `keep` (>= 1) checkpoints of every thread. Commits."""
+        stats: Dict[str, int] = {}
+        if not await self._tables_exist():
+            return stats
+        # checkpoint_id is a time-ordered UUIDv6, the saver's own "latest" ordering
+        await self.session.execute(text("""
+            CREATE TEMP TABLE doomed_checkpoints ON COMMIT DROP AS
+            SELECT thread_id, checkpoint_ns, checkpoint_id, channel_versions FROM (
+                SELECT thread_id, checkpoint_ns, checkpoint_id, checkpoint -> 'channel_versions' AS channel_versions,
+                       row_number() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rank
+                FROM checkpoints
+            ) ranked
+            WHERE rank > :keep
+        """), {"keep": max(1, keep)})
+        for table, statement in COMPACT_STATEMENTS.items():
+            await self._delete(table, statement, stats)
+        await self.session.commit()
+        return stats
+
+    async def prune_abandoned(self, days: float = CHECKPOINT_RETENTION_DAYS) -> Dict[str, int]:
+        """Delete threads whose latest checkpoint is older than `days`. Commits."""
+        stats: Dict[str, int] = {}
+        if days <= 0 or not await self._tables_exist():
+            return stats
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        result = await self.session.execute(text("""
+            SELECT thread_id FROM checkpoints
+            GROUP BY thread_id
+            HAVING max((checkpoint ->> 'ts')::timestamptz) < :cutoff
+        """), {"cutoff": cutoff})
+        thread_ids = [row[0] for row in result.all()]
+        if not thread_ids:
+            return stats
+        for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+            await self._delete(table, f"""
+                WITH deleted AS (
+                    DELETE FROM {table} t WHERE t.thread_id = ANY(:ids) RETURNING pg_column_size(t.*) AS size
+                ) """ + _DELETED, stats, ids=thread_ids)
+        await self.session.execute(text("DELETE FROM thread WHERE id = ANY(:ids)"), {"ids": thread_ids})
+        stats["threads"] = len(thread_ids)
+        await self.session.commit()
+        return stats
+
+    async def run(self) -> Dict[str, int]:
+        stats = await self.prune_abandoned()
+        for key, value in (await self.compact()).items():
+            stats[key] = stats.get(key, 0) + value
+        if stats.get("bytes"):
+            logger.info(
+                "Checkpoint retention: %d threads dropped, %d checkpoints / %d writes / %d blobs deleted, ~%.1f MB reclaimed",
+                stats.get("threads", 0), stats.get("checkpoints_rows", 0), stats.get("checkpoint_writes_rows", 0),
+                stats.get("checkpoint_blobs_rows", 0), stats.get("bytes", 0) / 1e6,
+            )
+        return stats
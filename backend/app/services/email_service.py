@@ -0,0 +1,148 @@
+from sqlmodel import select, delete, not_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import os
+from app.models.email import Email
+from app.models.sync_state import SyncState
+from app.mcp_client.gmail_client import gmail_client
+
+EMAIL_SYNC_STATE = "emails"
+# Initial backfill: this many of the most recent messages, plus up to as many unread ones
+EMAIL_BACKFILL_MAX = int(os.getenv("EMAIL_BACKFILL_MAX", "200"))
+# Messages per backfill call: the server fetches each one, so a page has to fit in one
+# MCP call's timeout (MCP_TIMEOUT_SECONDS, or list_email_page in MCP_TOOL_TIMEOUTS)
+EMAIL_BACKFILL_PAGE_SIZE = int(os.getenv("EMAIL_BACKFILL_PAGE_SIZE", "25"))
+
+# Gmail search operators the cache can answer: operator -> (label, present)
+CACHED_OPERATORS = {
+    "is:unread": ("UNREAD", True),
+    "is:read": ("UNREAD", False),
+    "in:inbox": ("INBOX", True),
+    "is:starred": ("STARRED", True),
+    "is:important": ("IMPORTANT", True),
+}
+# Gmail's own list leaves these out unless asked for
+HIDDEN_LABELS = ("TRASH", "SPAM")
+
+def cached_filters(query: str) -> Optional[List[Tuple[str, bool]]]:
+    """Label filters equivalent to `query`, or None if it needs Gmail's search."""
+    filters = []
+    for term in query.lower().split():
+        if term not in CACHED_OPERATORS:
+            return None
+        filters.append(CACHED_OPERATORS[term])
+    return filters
+
+def _received_at(email_data: Dict[str, Any]) -> Optional[datetime]:
+    internal_date = email_data.get("internalDate")
+    return datetime.utcfromtimestamp(int(internal_date) / 1000) if internal_date else None
+
+class EmailService:
+    """
+    Local cache of recent Gmail messages. The background "emails" job backfills it once
+    and then applies Gmail history (since the stored historyId); list_emails answers
+    label-only queries such as 'is:unread' from the cache and sends anything else to Gmail.
+    """
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def list_emails(self, max_results: int = 10, query: str = "") -> List[Dict[str, Any]]:
+        filters = cached_filters(query)
+        state = await self.session.get(SyncState, EMAIL_SYNC_STATE)
+        if filters is None or not (state and state.cursor):
+            return await gmail_client.list_emails(max_results, query)
+
+        statement = select(Email).order_by(Email.received_at.desc(), Email.id).limit(max_results)
+        for label, present in filters:
+            condition = Email.labels.contains([label])
+            statement = statement.where(condition if present else not_(condition))
+        result = await self.session.exec(statement)
+        return [email.raw_data for email in result.all()]
+
+    async def create_draft(self, to: str, subject: str, body: str) -> Dict[str, Any]:
+        """Create a draft via MCP."""
+        return await gmail_client.create_draft(to, subject, body)
+
+    async def sync_emails(self) -> int:
+        """
+        Bring the cache up to date: apply history since the stored historyId, or backfill
+        when there is none yet (or Gmail expired it). Commits. Returns messages applied.
+        """
+        state = await self.session.get(SyncState, EMAIL_SYNC_STATE) or SyncState(name=EMAIL_SYNC_STATE)
+        if state.cursor:
+            result = await gmail_client.list_email_changes(state.cursor)
+            if isinstance(result, dict) and result.get("error") == "history_id_expired":
+                state.cursor = None
+            elif not isinstance(result, dict) or "error" in result:
+                raise Exception(f"Failed to fetch email changes: {result}")
+            else:
+                applied = 0
+                for email_data in result.get("emails", []):
+                    applied += int(await self._upsert_email(email_data))
+                for email_id in result.get("deleted", []):
+                    applied += int(await self._delete_email(email_id))
+                state.cursor = result.get("history_id") or state.cursor
+                self.session.add(state)
+                await self.session.commit()
+                return applied
+        return await self._backfill(state)
+
+    async def _backfill(self, state: SyncState) -> int:
+        # Take the history id first: changes made during the backfill are replayed next sync
+        start = await gmail_client.list_email_changes(None)
+        if not isinstance(start, dict) or not start.get("history_id"):
+            raise Exception(f"Failed to get Gmail history id: {start}")
+
+        emails: Dict[str, Dict[str, Any]] = {}
+        for query in ("", "is:unread"):
+            # Paged, so no single call has to fetch EMAIL_BACKFILL_MAX messages within its timeout
+            fetched, page_token = 0, None
+            while fetched < EMAIL_BACKFILL_MAX:
+                page = await gmail_client.list_email_page(
+                    query, min(EMAIL_BACKFILL_PAGE_SIZE, EMAIL_BACKFILL_MAX - fetched), page_token
+                )
+                if not isinstance(page, dict) or "error" in page:
+                    raise Exception(f"Failed to backfill emails: {page}")
+                batch = page.get("emails") or []
+                emails.update((e["id"], e) for e in batch if isinstance(e, dict) and "id" in e)
+                fetched += len(batch)
+                page_token = page.get("next_page_token")
+                if not batch or not page_token:
+                    break
+
+        # Anything else cached may have changed while we weren't following history
+        await self.session.exec(delete(Email).where(not_(Email.id.in_(list(emails)))))
+        for email_data in emails.values():
+            await self._upsert_email(email_data)
+        state.cursor = str(start["history_id"])
+        self.session.add(state)
+        await self.session.commit()
+        return len(emails)
+
+    async def _upsert_email(self, email_data: Dict[str, Any]) -> bool:
+        """Insert or update one message from MCP data (not committed). Returns True if the row changed."""
+        if any(label in HIDDEN_LABELS for label in email_data.get("labels") or []):
+            return await self._delete_email(email_data["id"])
+
+        existing = await self.session.get(Email, email_data["id"])
+        if existing and existing.raw_data == email_data:
+            return False
+        email = existing or Email(id=email_data["id"])
+        email.thread_id = email_data.get("threadId")
+        email.subject = email_data.get("subject")
+        email.sender = email_data.get("from")
+        email.date = email_data.get("date")
+        email.snippet = email_data.get("snippet")
+        email.labels = email_data.get("labels") or []
+        email.received_at = _received_at(email_data)
+        email.raw_data = email_data
+        self.session.add(email)
+        return True
+
+    async def _delete_email(self, email_id: str) -> bool:
+        email = await self.session.get(Email, email_id)
+        if not email:
+            return False
+        await self.session.delete(email)
+        return True
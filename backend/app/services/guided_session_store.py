@@ -0,0 +1,150 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+import os
+
+from sqlmodel import delete, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.db import engine
+from app.models.guided_session import GuidedSession
+
+# "postgres" (shared across uvicorn workers) or "memory" (single process)
+GUIDED_SESSION_STORE = os.getenv("GUIDED_SESSION_STORE", "postgres")
+GUIDED_SESSION_TTL_SECONDS = int(os.getenv("GUIDED_SESSION_TTL_SECONDS", str(4 * 60 * 60)))
+GUIDED_SESSION_MAX = int(os.getenv("GUIDED_SESSION_MAX", "1000"))
+
+
+class GuidedSessionStore(ABC):
+    """
+    Storage for guided sessions. Sessions expire `ttl_seconds` after their last write,
+    so abandoned sessions don't accumulate.
+    """
+    def __init__(self, ttl_seconds: int = GUIDED_SESSION_TTL_SECONDS):
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[GuidedSession]:
+        ...
+
+    @abstractmethod
+    async def save(self, session: GuidedSession) -> GuidedSession:
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    async def count_active(self) -> int:
+        ...
+
+    @abstractmethod
+    async def purge_expired(self) -> int:
+        """Drop expired sessions. Returns the number removed."""
+        ...
+
+    def _touch(self, session: GuidedSession):
+        session.expires_at = datetime.utcnow() + self.ttl
+
+
+class InMemoryGuidedSessionStore(GuidedSessionStore):
+    """Process-local LRU with TTL. Bounded by `max_sessions`; only suitable for a single worker."""
+    def __init__(self, max_sessions: int = GUIDED_SESSION_MAX, ttl_seconds: int = GUIDED_SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, GuidedSession]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def get(self, session_id: str) -> Optional[GuidedSession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.expires_at and session.expires_at <= datetime.utcnow():
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return session.model_copy(deep=True)
+
+    async def save(self, session: GuidedSession) -> GuidedSession:
+        self._touch(session)
+        self._sessions[session.id] = session.model_copy(deep=True)
+        self._sessions.move_to_end(session.id)
+        self._evict()
+        return session
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def count_active(self) -> int:
+        self._evict()
+        return len(self._sessions)
+
+    async def purge_expired(self) -> int:
+        return self._drop_expired()
+
+    def _drop_expired(self) -> int:
+        now = datetime.utcnow()
+        expired = [sid for sid, s in self._sessions.items() if s.expires_at and s.expires_at <= now]
+        for sid in expired:
+            del self._sessions[sid]
+        return len(expired)
+
+    def _evict(self):
+        self._drop_expired()
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class PostgresGuidedSessionStore(GuidedSessionStore):
+    """Sessions live in the `guidedsession` table, so every worker sees the same state."""
+    def __init__(self, ttl_seconds: int = GUIDED_SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self._sessionmaker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get(self, session_id: str) -> Optional[GuidedSession]:
+        async with self._sessionmaker() as db:
+            session = await db.get(GuidedSession, session_id)
+            if session is None or (session.expires_at and session.expires_at <= datetime.utcnow()):
+                return None
+            return session
+
+    async def save(self, session: GuidedSession) -> GuidedSession:
+        self._touch(session)
+        async with self._sessionmaker() as db:
+            session = await db.merge(session)
+            await db.commit()
+            return session
+
+    async def delete(self, session_id: str):
+        async with self._sessionmaker() as db:
+            await db.exec(delete(GuidedSession).where(GuidedSession.id == session_id))
+            await db.commit()
+
+    async def count_active(self) -> int:
+        async with self._sessionmaker() as db:
+            result = await db.exec(select(func.count()).select_from(GuidedSession).where(GuidedSession.expires_at > datetime.utcnow()))
+            return result.one()
+
+    async def purge_expired(self) -> int:
+        async with self._sessionmaker() as db:
+            result = await db.exec(delete(GuidedSession).where(GuidedSession.expires_at <= datetime.utcnow()))
+            await db.commit()
+            return result.rowcount or 0
+
+
+_store: Optional[GuidedSessionStore] = None
+
+def get_guided_session_store() -> GuidedSessionStore:
+    global _store
+    if _store is None:
+        if GUIDED_SESSION_STORE == "memory":
+            _store = InMemoryGuidedSessionStore()
+        elif GUIDED_SESSION_STORE == "postgres":
+            _store = PostgresGuidedSessionStore()
+        else:
+            raise ValueError(f"Unsupported guided session store: {GUIDED_SESSION_STORE}")
+    return _store
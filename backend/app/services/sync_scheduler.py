@@ -0,0 +1,281 @@
+"""
+In-process background jobs: sync for the local Task, Event and Email caches, the
+push of queued optimistic task writes (task_outbox), plus checkpoint compaction.
+
+Every worker runs the scheduler, but each job run is guarded by a Postgres advisory
+lock plus the shared `syncstate` row: a worker only syncs when it holds the lock and
+the job is due (last attempt older than its interval, or its backoff after failures).
+Read paths therefore serve from the cache and never wait on Todoist/Google.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import random
+import zlib
+
+from sqlalchemy import text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.db import engine
+from app.models.sync_state import SyncState
+from app.services.task_service import TaskService
+from app.services.task_outbox import outbox_wakeup, OPTIMISTIC_TASK_WRITES
+from app.services.calendar_service import CalendarService, CALENDAR_SYNC_INTERVAL_SECONDS, CALENDAR_SYNC_STATE
+from app.services.email_service import EmailService
+from app.services.checkpoint_retention import CheckpointRetentionService
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+SYNC_ENABLED = os.getenv("SYNC_ENABLED", "true").lower() == "true"
+TASK_SYNC_INTERVAL_SECONDS = float(os.getenv("TASK_SYNC_INTERVAL_SECONDS", "300"))
+EMAIL_SYNC_INTERVAL_SECONDS = float(os.getenv("EMAIL_SYNC_INTERVAL_SECONDS", "120"))
+# Retry cadence for queued task writes; new writes wake the job immediately
+TASK_OUTBOX_INTERVAL_SECONDS = float(os.getenv("TASK_OUTBOX_INTERVAL_SECONDS", "10"))
+CHECKPOINT_COMPACTION_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL_SECONDS", "3600"))
+# How far ahead the calendar cache is kept (should cover the largest `days` clients ask for)
+CALENDAR_SYNC_DAYS = int(os.getenv("CALENDAR_SYNC_DAYS", "14"))
+SYNC_JITTER = float(os.getenv("SYNC_JITTER", "0.1"))
+SYNC_MAX_BACKOFF_SECONDS = float(os.getenv("SYNC_MAX_BACKOFF_SECONDS", "3600"))
+# How long startup waits for the first sync round before serving anyway
+SYNC_WARM_TIMEOUT_SECONDS = float(os.getenv("SYNC_WARM_TIMEOUT_SECONDS", "10"))
+
+
+class SyncJob:
+    def __init__(self, name: str, run: Callable[[AsyncSession], Awaitable[None]], interval_seconds: float,
+                 wake: Optional[asyncio.Event] = None):
+        self.name = name
+        self.run = run
+        self.interval_seconds = interval_seconds
+        # Set to run the job before its interval is up
+        self.wake = wake
+
+
+async def _sync_tasks(session: AsyncSession):
+    await TaskService(session).sync_tasks()
+
+
+async def _sync_calendar(session: AsyncSession):
+    await CalendarService(session).refresh_events(days=CALENDAR_SYNC_DAYS)
+
+
+async def _sync_emails(session: AsyncSession):
+    await EmailService(session).sync_emails()
+
+
+async def _push_task_outbox(session: AsyncSession):
+    await TaskService(session).push_outbox()
+
+
+async def _compact_checkpoints(session: AsyncSession):
+    await CheckpointRetentionService(session).run()
+
+
+TASK_OUTBOX_JOB = SyncJob("task_outbox", _push_task_outbox, TASK_OUTBOX_INTERVAL_SECONDS, wake=outbox_wakeup)
+CHECKPOINT_COMPACTION_JOB = SyncJob("checkpoints", _compact_checkpoints, CHECKPOINT_COMPACTION_INTERVAL_SECONDS)
+
+DEFAULT_JOBS = [
+    SyncJob("tasks", _sync_tasks, TASK_SYNC_INTERVAL_SECONDS),
+    SyncJob(CALENDAR_SYNC_STATE, _sync_calendar, CALENDAR_SYNC_INTERVAL_SECONDS),
+    SyncJob("emails", _sync_emails, EMAIL_SYNC_INTERVAL_SECONDS),
+    TASK_OUTBOX_JOB,
+    CHECKPOINT_COMPACTION_JOB,
+]
+
+
+def enabled_jobs(sync_enabled: bool = SYNC_ENABLED, optimistic_writes: bool = OPTIMISTIC_TASK_WRITES) -> List[SyncJob]:
+    """
+    Jobs this process runs. With SYNC_ENABLED=false the caches aren't refreshed, but queued
+    optimistic task writes only ever reach Todoist through the outbox job, so it still runs,
+    and checkpoint retention has nothing to do with cache sync, so compaction always runs.
+    """
+    if sync_enabled:
+        return DEFAULT_JOBS
+    return ([TASK_OUTBOX_JOB] if optimistic_writes else []) + [CHECKPOINT_COMPACTION_JOB]
+
+
+def backoff_delay(interval_seconds: float, failures: int, max_backoff: float = SYNC_MAX_BACKOFF_SECONDS) -> float:
+    """Interval between runs: the job interval, doubled per consecutive failure, capped."""
+    if failures <= 0:
+        return interval_seconds
+    return min(interval_seconds * (2 ** failures), max(max_backoff, interval_seconds))
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(f"pushstart-sync:{name}".encode())
+
+
+@asynccontextmanager
+async def _job_lock(name: str, wait: bool = False):
+    """
+    Cluster-wide lock (Postgres advisory lock). Yields whether it was acquired;
+    with `wait=True` blocks until it is.
+    """
+    async with engine.connect() as conn:
+        if wait:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _lock_key(name)})
+            acquired = True
+        else:
+            acquired = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _lock_key(name)})).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _lock_key(name)})
+
+
+class SyncScheduler:
+    def __init__(self, jobs: List[SyncJob], jitter: float = SYNC_JITTER):
+        self.jobs = jobs
+        self.jitter = jitter
+        self._sessionmaker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        self._loops: List[asyncio.Task] = []
+        self._failures: Dict[str, int] = {}
+        self._warm: Dict[str, asyncio.Event] = {}
+
+    async def start(self):
+        for job in self.jobs:
+            self._warm[job.name] = asyncio.Event()
+            self._loops.append(asyncio.create_task(self._loop(job)))
+
+    async def stop(self):
+        for loop in self._loops:
+            loop.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+
+    async def warm_caches(self, timeout: float = SYNC_WARM_TIMEOUT_SECONDS) -> bool:
+        """
+        Wait (bounded) until every job has completed its first round - run, or skipped because
+        another worker synced recently - then build this process's next-task ranking.
+        """
+        try:
+            await asyncio.wait_for(asyncio.gather(*(e.wait() for e in self._warm.values())), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cache warm-up still running after %.0fs; continuing in background.", timeout)
+            return False
+        async with self._sessionmaker() as session:
+            await TaskService(session).get_next_tasks(1)
+        return True
+
+    async def run_job(self, job: SyncJob, force: bool = False) -> Optional[bool]:
+        """
+        Run `job` if this worker gets the lock and the job is due.
+        Returns True on success, False on failure, None if skipped.
+        """
+        async with _job_lock(job.name) as acquired:
+            if not acquired:
+                return None
+            async with self._sessionmaker() as session:
+                state = await session.get(SyncState, job.name) or SyncState(name=job.name)
+                now = datetime.utcnow()
+                delay = backoff_delay(job.interval_seconds, state.consecutive_failures)
+                if not force and state.last_attempt_at and now < state.last_attempt_at + timedelta(seconds=delay * (1 - self.jitter)):
+                    return None
+
+                previous_failures = state.consecutive_failures
+                error = None
+                try:
+                    with span(f"sync {job.name}", root=True, job=job.name):
+                        await job.run(session)
+                except Exception as e:
+                    logger.warning("Background sync '%s' failed: %s", job.name, e)
+                    await session.rollback()
+                    error = e
+
+                # Re-read: the job commits (or rolled back) on this session
+                state = await session.get(SyncState, job.name) or SyncState(name=job.name)
+                state.last_attempt_at = now
+                if error is None:
+                    state.last_success_at = datetime.utcnow()
+                    state.last_error = None
+                    state.consecutive_failures = 0
+                else:
+                    state.last_error = str(error)[:500]
+                    state.consecutive_failures = previous_failures + 1
+                success = error is None
+
+                session.add(state)
+                await session.commit()
+                self._failures[job.name] = state.consecutive_failures
+                return success
+
+    async def _loop(self, job: SyncJob):
+        woken = False
+        while True:
+            try:
+                await self.run_job(job, force=woken)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Lock/DB trouble: back off like a failed run
+                logger.warning("Background sync '%s' could not run: %s", job.name, e)
+                self._failures[job.name] = self._failures.get(job.name, 0) + 1
+            finally:
+                self._warm[job.name].set()
+
+            delay = backoff_delay(job.interval_seconds, self._failures.get(job.name, 0))
+            woken = await self._sleep(job, delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def _sleep(self, job: SyncJob, seconds: float) -> bool:
+        """Wait for the next run; True if the job's wake event cut the wait short."""
+        if job.wake is None:
+            await asyncio.sleep(seconds)
+            return False
+        try:
+            await asyncio.wait_for(job.wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            return False
+        job.wake.clear()
+        return True
+
+    async def status(self) -> List[SyncState]:
+        async with self._sessionmaker() as session:
+            result = await session.exec(select(SyncState).order_by(SyncState.name))
+            return result.all()
+
+
+CALENDAR_PUSH_STATE = "calendar_push"
+
+
+async def sync_calendar_changes() -> int:
+    """
+    Apply calendar changes announced by a Google push notification. Serialized across
+    workers so each syncToken is consumed exactly once. Returns the number of events applied.
+    """
+    async with _job_lock(CALENDAR_PUSH_STATE, wait=True):
+        Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with Session() as session:
+            state = await session.get(SyncState, CALENDAR_PUSH_STATE) or SyncState(name=CALENDAR_PUSH_STATE)
+            now = datetime.utcnow()
+            try:
+                with span("sync calendar_push", root=True, job=CALENDAR_PUSH_STATE):
+                    applied, next_token = await CalendarService(session).apply_event_changes(state.cursor)
+            except Exception as e:
+                logger.warning("Calendar push sync failed: %s", e)
+                await session.rollback()
+                state = await session.get(SyncState, CALENDAR_PUSH_STATE) or SyncState(name=CALENDAR_PUSH_STATE)
+                state.last_attempt_at = now
+                state.last_error = str(e)[:500]
+                state.consecutive_failures += 1
+                session.add(state)
+                await session.commit()
+                return 0
+
+            state = await session.get(SyncState, CALENDAR_PUSH_STATE) or SyncState(name=CALENDAR_PUSH_STATE)
+            state.cursor = next_token or state.cursor
+            state.last_attempt_at = now
+            state.last_success_at = datetime.utcnow()
+            state.last_error = None
+            state.consecutive_failures = 0
+            session.add(state)
+            await session.commit()
+            return applied
+
+
+# Singleton instance
+sync_scheduler = SyncScheduler(enabled_jobs())
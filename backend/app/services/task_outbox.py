@@ -0,0 +1,108 @@
+"""
+Write-behind queue for optimistic task writes (TASK_WRITE_MODE=optimistic).
+
+TaskService applies a create/update/complete/delete to the local cache and adds a
+TaskOutbox row in the same transaction, then returns. The "task_outbox" background
+job (see sync_scheduler, woken right after each write) pushes pending rows to
+Todoist in write order as one batch_commands call, and TaskService.push_outbox
+reconciles the cache with the result. Creates get a temporary "tmp-..." id until
+Todoist assigns the real one, and writes queued behind a create use the temporary
+id too (the Sync API resolves it within a batch; later batches get the real id).
+
+Each row keeps its command uuid across attempts, so a batch resent after a lost
+response is applied once. A row fails after TASK_OUTBOX_MAX_ATTEMPTS unsuccessful
+pushes, or as soon as Todoist rejects its command; the next full task sync then
+restores Todoist's state in the cache.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import os
+import uuid
+
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.task_outbox import TaskOutbox
+from app.core.metrics import TASK_OUTBOX_ENTRIES
+
+# "sync" (wait for Todoist) or "optimistic" (local commit + outbox)
+TASK_WRITE_MODE = os.getenv("TASK_WRITE_MODE", "sync").lower()
+OPTIMISTIC_TASK_WRITES = TASK_WRITE_MODE == "optimistic"
+TASK_OUTBOX_MAX_ATTEMPTS = int(os.getenv("TASK_OUTBOX_MAX_ATTEMPTS", "10"))
+# How long pushed/failed rows are kept (temp id lookups, debugging)
+TASK_OUTBOX_RETENTION_DAYS = float(os.getenv("TASK_OUTBOX_RETENTION_DAYS", "7"))
+# Sync API limit per request
+TASK_OUTBOX_BATCH_SIZE = int(os.getenv("TASK_OUTBOX_BATCH_SIZE", "100"))
+
+TEMP_ID_PREFIX = "tmp-"
+
+# Set after a write is queued; the outbox job waits on it between runs
+outbox_wakeup = asyncio.Event()
+
+def new_temp_id() -> str:
+    return TEMP_ID_PREFIX + uuid.uuid4().hex
+
+def is_temp_id(task_id: Optional[str]) -> bool:
+    return bool(task_id) and task_id.startswith(TEMP_ID_PREFIX)
+
+def outbox_change(entry: TaskOutbox) -> Dict[str, Any]:
+    """Outbox row -> TodoistClient.batch_commands change."""
+    change = {**entry.payload, "action": entry.action, "uuid": entry.command_uuid}
+    if entry.action == "create":
+        change["temp_id"] = entry.task_id
+    else:
+        change["task_id"] = entry.task_id
+    return change
+
+
+class TaskOutboxQueue:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def enqueue(self, action: str, task_id: str, payload: Optional[Dict[str, Any]] = None) -> TaskOutbox:
+        """Add a write to the caller's transaction (not committed)."""
+        entry = TaskOutbox(
+            action=action,
+            task_id=task_id,
+            payload={k: v for k, v in (payload or {}).items() if v is not None},
+            command_uuid=str(uuid.uuid4()),
+        )
+        self.session.add(entry)
+        TASK_OUTBOX_ENTRIES.labels("queued").inc()
+        return entry
+
+    async def pending(self, limit: int = TASK_OUTBOX_BATCH_SIZE) -> List[TaskOutbox]:
+        result = await self.session.exec(
+            select(TaskOutbox).where(TaskOutbox.status == "pending").order_by(TaskOutbox.id).limit(limit)
+        )
+        return result.all()
+
+    async def pending_task_ids(self) -> Set[str]:
+        """Tasks whose local state is ahead of Todoist; syncs must not overwrite them."""
+        result = await self.session.exec(select(TaskOutbox.task_id).where(TaskOutbox.status == "pending").distinct())
+        return set(result.all())
+
+    async def resolve(self, task_id: str) -> str:
+        """Todoist's id for a temporary id whose create was already pushed, else `task_id`."""
+        if not is_temp_id(task_id):
+            return task_id
+        result = await self.session.exec(
+            select(TaskOutbox.remote_id).where(
+                TaskOutbox.task_id == task_id, TaskOutbox.action == "create", TaskOutbox.remote_id.is_not(None)
+            )
+        )
+        return result.first() or task_id
+
+    async def rename(self, temp_id: str, remote_id: str):
+        """Point pending writes queued behind a pushed create at its real id (not committed)."""
+        for entry in await self.pending(limit=None):
+            if entry.task_id == temp_id:
+                entry.task_id = remote_id
+                self.session.add(entry)
+
+    async def prune(self, days: float = TASK_OUTBOX_RETENTION_DAYS) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        result = await self.session.exec(
+            delete(TaskOutbox).where(TaskOutbox.status != "pending", TaskOutbox.processed_at < cutoff)
+        )
+        return result.rowcount
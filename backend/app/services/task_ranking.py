@@ -0,0 +1,79 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from app.models.task import Task
+
+# Undated tasks rank after every dated task of the same priority
+_NO_DUE = "9999-12-31"
+
+RankKey = Tuple[int, str, int, str]
+
+
+def rank_key(task: Task) -> RankKey:
+    """Highest priority first (Todoist API 4 == p1), then earliest due date, then Todoist order."""
+    return (-(task.priority or 1), task.due_date or _NO_DUE, task.order or 0, task.id)
+
+
+class TaskRanking:
+    """
+    In-process "what's next" index over the local task cache: a sorted list of rank keys
+    plus the ranked tasks. TaskService keeps it current on sync and on every local write,
+    so picking the next task is a slice instead of a full-list LLM reasoning pass.
+
+    The index is tagged with the "task" table version it reflects. A version mismatch
+    (e.g. a write made by another worker) means it must be rebuilt from the DB.
+    """
+    def __init__(self):
+        self._keys: List[RankKey] = []
+        self._tasks: Dict[str, Tuple[RankKey, Task]] = {}
+        self.version: Optional[int] = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def is_stale(self, version: int) -> bool:
+        return self.version is None or self.version != version
+
+    def invalidate(self):
+        self.version = None
+
+    def rebuild(self, tasks: List[Task], version: Optional[int] = None):
+        entries = [(rank_key(t), t) for t in tasks if not t.is_completed]
+        entries.sort(key=lambda e: e[0])
+        self._keys = [key for key, _ in entries]
+        self._tasks = {t.id: (key, t) for key, t in entries}
+        self.version = version
+
+    def advance(self, version: int) -> bool:
+        """
+        Move to `version` after a local write. Only valid if this write is the sole change
+        since our version; otherwise the index is invalidated and False is returned.
+        """
+        if self.version is not None and self.version + 1 == version:
+            self.version = version
+            return True
+        self.invalidate()
+        return False
+
+    def upsert(self, task: Task):
+        self.remove(task.id)
+        if task.is_completed:
+            return
+        key = rank_key(task)
+        insort(self._keys, key)
+        self._tasks[task.id] = (key, task)
+
+    def remove(self, task_id: str):
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return
+        idx = bisect_left(self._keys, entry[0])
+        if idx < len(self._keys) and self._keys[idx] == entry[0]:
+            del self._keys[idx]
+
+    def top(self, k: int = 1) -> List[Task]:
+        return [self._tasks[key[3]][1] for key in self._keys[:max(0, k)]]
+
+
+# Singleton instance
+task_ranking = TaskRanking()
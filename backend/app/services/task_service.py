@@ -1,8 +1,92 @@
 from sqlmodel import select, delete
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import Text, cast, and_, or_, false, func, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY
 from app.models.task import Task
+from app.models.task_outbox import TaskOutbox
 from app.mcp_client.todoist_client import todoist_client
-from typing import List, Dict, Any
+from app.services.task_ranking import task_ranking
+from app.core.versions import bump_version, get_version
+from app.services.task_outbox import (
+    TaskOutboxQueue, OPTIMISTIC_TASK_WRITES, TASK_OUTBOX_MAX_ATTEMPTS, new_temp_id, outbox_change, outbox_wakeup,
+)
+from app.core.metrics import TASK_OUTBOX_ENTRIES
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional
+import base64
+import json
+import re
+
+# Sort orders for query_tasks: (column, descending). Each ends in Task.id so keyset cursors are unique.
+# Ascending columns may be NULL (sorted last); descending ones are NOT NULL.
+TASK_SORTS = {
+    "order": [(Task.order, False), (Task.id, False)],
+    # Todoist API priority 4 == p1 (highest)
+    "priority": [(Task.priority, True), (Task.due_date, False), (Task.id, False)],
+    "due_date": [(Task.due_date, False), (Task.priority, True), (Task.id, False)],
+}
+
+def _keyset_after(sort, values):
+    """WHERE clause selecting rows strictly after `values` in the given sort order."""
+    clauses = []
+    equal_so_far = []
+    for (column, descending), value in zip(sort, values):
+        if descending:
+            beyond = column < value
+        elif value is None:
+            beyond = false()  # NULLs sort last: nothing is beyond them on this column
+        else:
+            beyond = or_(column > value, column.is_(None))
+        clauses.append(and_(*equal_so_far, beyond))
+        equal_so_far.append(column.is_(None) if value is None else column == value)
+    return or_(*clauses)
+
+def task_cursor(task: Task, order_by: str = "order") -> str:
+    """Opaque keyset cursor pointing just after `task` in the given sort order."""
+    values = [getattr(task, column.key) for column, _ in TASK_SORTS[order_by]]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_task_cursor(cursor: str, order_by: str = "order") -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(TASK_SORTS[order_by]):
+        raise ValueError("Invalid cursor")
+    return values
+
+# Generated tsvector column, added in db.SCHEMA_UPGRADES (not part of the model)
+TASK_SEARCH_VECTOR = literal_column("task.search_vector")
+
+def search_query(text: str) -> Optional[str]:
+    """
+    to_tsquery() input for free text: any of the words, each as a prefix, so
+    "dentist appt" matches "Book dentist appointment". None if there are no words.
+    """
+    terms = re.findall(r"\w+", text.lower())
+    return " | ".join(f"{term}:*" for term in terms) or None
+
+def optimistic_due_date(due_string: Optional[str]) -> Optional[str]:
+    """Local guess at Todoist's due date: only ISO dates are taken as-is ("tomorrow" waits for the push)."""
+    return due_string if due_string and re.fullmatch(r"\d{4}-\d{2}-\d{2}", due_string) else None
+
+def apply_task_data(task: Task, t_data: Dict[str, Any]) -> Task:
+    """Map a Todoist (MCP) task dict onto a Task row."""
+    # Note: 'due' in Todoist is a dict, we flatten it slightly for our model
+    due = t_data.get("due")
+    task.content = t_data.get("content")
+    task.description = t_data.get("description")
+    task.project_id = t_data.get("project_id")
+    task.section_id = t_data.get("section_id")
+    task.parent_id = t_data.get("parent_id")
+    task.priority = t_data.get("priority", 1)
+    task.due_string = due.get("string") if due else None
+    task.due_date = due.get("date") if due else None
+    task.labels = t_data.get("labels")
+    task.order = t_data.get("order")
+    task.url = t_data.get("url")
+    task.raw_data = t_data
+    return task
 
 class TaskService:
     def __init__(self, session: AsyncSession):
@@ -16,6 +100,92 @@ class TaskService:
         """Alias for get_all_tasks to match tool interface."""
         return await self.get_all_tasks()
 
+    async def query_tasks(
+        self,
+        labels: Optional[List[str]] = None,
+        order_by: str = "order",
+        limit: Optional[int] = None,
+        project_id: Optional[str] = None,
+        priority: Optional[int] = None,
+        due_before: Optional[date] = None,
+        due_after: Optional[date] = None,
+        text: Optional[str] = None,
+        after: Optional[List[Any]] = None,
+    ) -> List[Task]:
+        """
+        Filtered read from the local cache, evaluated in SQL.
+        - labels: tasks carrying any of these labels (JSONB `?|`, served by the GIN index)
+        - order_by: "order" (Todoist order), "priority" (highest first, then earliest due)
+          or "due_date" (earliest due first, undated last)
+        - limit: max rows to return
+        - project_id / priority: exact matches
+        - due_after / due_before: half-open date window [due_after, due_before)
+        - text: case-insensitive substring of content or description
+        - after: keyset cursor from `task_cursor()` of the last row of the previous page
+        """
+        if order_by not in TASK_SORTS:
+            raise ValueError(f"Unsupported task ordering: {order_by}")
+        sort = TASK_SORTS[order_by]
+
+        statement = select(Task)
+        if labels:
+            statement = statement.where(Task.labels.has_any(cast(labels, ARRAY(Text))))
+        if project_id:
+            statement = statement.where(Task.project_id == project_id)
+        if priority is not None:
+            statement = statement.where(Task.priority == priority)
+        # due_date is stored as ISO text, which orders like the date it holds
+        if due_after:
+            statement = statement.where(Task.due_date >= due_after.isoformat())
+        if due_before:
+            statement = statement.where(Task.due_date < due_before.isoformat())
+        if text:
+            # Match % and _ literally, not as wildcards
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            statement = statement.where(or_(Task.content.ilike(pattern, escape="\\"),
+                                            Task.description.ilike(pattern, escape="\\")))
+        if after is not None:
+            statement = statement.where(_keyset_after(sort, after))
+
+        statement = statement.order_by(*[
+            column.desc() if descending else column.asc().nulls_last()
+            for column, descending in sort
+        ])
+
+        if limit is not None:
+            statement = statement.limit(limit)
+
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def search_tasks(self, query: str, limit: int = 10) -> List[Task]:
+        """
+        Full-text search over content and description (GIN index on task.search_vector),
+        best matches first: tasks matching more of the words, and in the content rather
+        than the description, rank higher.
+        """
+        tsquery_text = search_query(query)
+        if not tsquery_text:
+            return []
+        tsquery = func.to_tsquery("english", tsquery_text)
+        rank = func.ts_rank_cd(TASK_SEARCH_VECTOR, tsquery)
+        statement = (
+            select(Task)
+            .where(TASK_SEARCH_VECTOR.op("@@")(tsquery))
+            .order_by(rank.desc(), Task.priority.desc(), Task.id)
+            .limit(limit)
+        )
+        result = await self.session.exec(statement)
+        return result.all()
+
+    async def get_next_tasks(self, k: int = 1) -> List[Task]:
+        """Top-k tasks by priority, then due date, from the precomputed ranking."""
+        version = await get_version(self.session, "task")
+        if task_ranking.is_stale(version):
+            task_ranking.rebuild(await self.get_all_tasks(), version)
+        return task_ranking.top(k)
+
     async def get_task(self, task_id: str) -> Task | None:
         return await self.session.get(Task, task_id)
 
@@ -32,39 +202,28 @@ class TaskService:
             # Error or empty
             return []
 
-        # 2. Upsert
-        active_ids = set()
+        # 2. Upsert (except tasks with optimistic writes not pushed yet: the cache is ahead there)
+        pending_ids = await TaskOutboxQueue(self.session).pending_task_ids() if OPTIMISTIC_TASK_WRITES else set()
+        active_ids = set(pending_ids)
+        changed = False
         for t_data in mcp_tasks:
             task_id = t_data.get("id")
             if not task_id:
                 continue
             
             active_ids.add(task_id)
-            
-            # Map MCP dict to Task model
-            # Note: 'due' in Todoist is a dict, we flatten it slightly for our model
-            due = t_data.get("due")
-            due_string = due.get("string") if due else None
-            due_date = due.get("date") if due else None
+            if task_id in pending_ids:
+                continue
             
             task = await self.session.get(Task, task_id)
             if not task:
                 task = Task(id=task_id, content=t_data.get("content"))
+            elif task.raw_data == t_data:
+                # Unchanged upstream
+                continue
+            changed = True
             
-            # Update fields
-            task.content = t_data.get("content")
-            task.description = t_data.get("description")
-            task.project_id = t_data.get("project_id")
-            task.section_id = t_data.get("section_id")
-            task.parent_id = t_data.get("parent_id")
-            task.priority = t_data.get("priority", 1)
-            task.due_string = due_string
-            task.due_date = due_date
-            task.labels = t_data.get("labels")
-            task.order = t_data.get("order")
-            task.url = t_data.get("url")
-            task.raw_data = t_data
-            
+            apply_task_data(task, t_data)
             self.session.add(task)
         
         # 3. Delete stale tasks
@@ -81,11 +240,17 @@ class TaskService:
             # Batch delete
             statement = delete(Task).where(Task.id.in_(to_delete))
             await self.session.exec(statement)
-            
+            changed = True
+
+        if changed:
+            await bump_version(self.session, "task")
         await self.session.commit()
         
         # Return fresh list
-        return await self.get_all_tasks()
+        version = await get_version(self.session, "task")
+        tasks = await self.get_all_tasks()
+        task_ranking.rebuild(tasks, version)
+        return tasks
 
     async def update_local_task(self, task_data: Dict[str, Any]):
         """Update or Insert a single task from MCP data (e.g. after create/update)"""
@@ -93,42 +258,64 @@ class TaskService:
         if not task_id:
             return
 
-        due = task_data.get("due")
-        due_string = due.get("string") if due else None
-        due_date = due.get("date") if due else None
-
         task = await self.session.get(Task, task_id)
         if not task:
             task = Task(id=task_id, content=task_data.get("content"))
         
-        task.content = task_data.get("content")
-        task.description = task_data.get("description")
-        task.project_id = task_data.get("project_id")
-        task.section_id = task_data.get("section_id")
-        task.parent_id = task_data.get("parent_id")
-        task.priority = task_data.get("priority", 1)
-        task.due_string = due_string
-        task.due_date = due_date
-        task.labels = task_data.get("labels")
-        task.order = task_data.get("order")
-        task.url = task_data.get("url")
-        task.raw_data = task_data
-        
+        apply_task_data(task, task_data)
         self.session.add(task)
+        version = await bump_version(self.session, "task")
         await self.session.commit()
         await self.session.refresh(task)
+        if task_ranking.advance(version):
+            task_ranking.upsert(task)
         return task
 
     async def delete_local_task(self, task_id: str):
         task = await self.session.get(Task, task_id)
         if task:
             await self.session.delete(task)
+            version = await bump_version(self.session, "task")
             await self.session.commit()
+            if task_ranking.advance(version):
+                task_ranking.remove(task_id)
+
+    async def apply_todoist_event(self, event_name: str, event_data: Dict[str, Any]) -> bool:
+        """
+        Apply a Todoist webhook event (Sync API item payload) to the local cache.
+        Returns False for events we don't track. Out-of-order deliveries are
+        reconciled by the next scheduled full sync.
+        """
+        task_id = event_data.get("id")
+        if not task_id or not event_name.startswith("item:"):
+            return False
+        if OPTIMISTIC_TASK_WRITES and task_id in await TaskOutboxQueue(self.session).pending_task_ids():
+            # Our own queued write is newer; the push reconciles the cache
+            return False
+
+        if event_name in ("item:completed", "item:deleted") or event_data.get("checked") or event_data.get("is_deleted"):
+            # The cache only holds active tasks
+            await self.delete_local_task(task_id)
+            return True
+        if event_name in ("item:added", "item:updated", "item:uncompleted"):
+            task_data = dict(event_data)
+            # Sync API naming -> REST naming used by the rest of the cache
+            if "order" not in task_data and "child_order" in task_data:
+                task_data["order"] = task_data["child_order"]
+            await self.update_local_task(task_data)
+            return True
+        return False
 
     # --- Unified Write Methods (MCP + Local Cache) ---
 
     async def create_task(self, content: str, description: str = None, due_string: str = None, priority: int = None) -> Task:
         """Create in Todoist -> Update Local Cache"""
+        if OPTIMISTIC_TASK_WRITES:
+            task = Task(id=new_temp_id(), content=content, description=description, priority=priority or 1,
+                        due_string=due_string, due_date=optimistic_due_date(due_string), labels=[])
+            fields = {"content": content, "description": description, "due_string": due_string, "priority": priority}
+            return await self._write_optimistically("create", task.id, fields, task=task)
+
         # 1. Create in Todoist
         new_task_data = await todoist_client.create_task(
             content=content,
@@ -144,6 +331,21 @@ class TaskService:
 
     async def update_task(self, task_id: str, content: str = None, description: str = None, due_string: str = None, priority: int = None) -> Task:
         """Update in Todoist -> Update Local Cache"""
+        if OPTIMISTIC_TASK_WRITES:
+            task_id = await TaskOutboxQueue(self.session).resolve(task_id)
+            task = await self.session.get(Task, task_id)
+            if not task:
+                raise Exception(f"Task {task_id} not found")
+            fields = {"content": content, "description": description, "due_string": due_string, "priority": priority}
+            for field, value in fields.items():
+                if value is not None:
+                    setattr(task, field, value)
+            if due_string is not None:
+                task.due_date = optimistic_due_date(due_string)
+            # No longer Todoist's payload: the next sync must not skip this row as unchanged
+            task.raw_data = None
+            return await self._write_optimistically("update", task_id, fields, task=task)
+
         # 1. Update in Todoist
         updated_task_data = await todoist_client.update_task(
             task_id=task_id,
@@ -160,6 +362,9 @@ class TaskService:
 
     async def delete_task(self, task_id: str):
         """Delete in Todoist -> Delete from Local Cache"""
+        if OPTIMISTIC_TASK_WRITES:
+            await self._write_optimistically("delete", await TaskOutboxQueue(self.session).resolve(task_id))
+            return
         # 1. Delete in Todoist
         await todoist_client.delete_task(task_id)
         # 2. Delete from local DB
@@ -167,6 +372,9 @@ class TaskService:
 
     async def close_task(self, task_id: str):
         """Close in Todoist -> Delete from Local Cache (since it's completed)"""
+        if OPTIMISTIC_TASK_WRITES:
+            await self._write_optimistically("complete", await TaskOutboxQueue(self.session).resolve(task_id))
+            return
         # 1. Close in Todoist
         result = await todoist_client.close_task(task_id)
         
@@ -177,3 +385,168 @@ class TaskService:
         # 2. Delete from local DB
         await self.delete_local_task(task_id)
 
+    async def apply_task_changes(self, changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply a list of changes (see TodoistClient.batch_commands) in one Todoist round trip,
+        then update the local cache in one transaction. Returns the per-change results and
+        the created/updated tasks. Changes that failed upstream are reported, not raised.
+        """
+        result = await todoist_client.batch_commands(changes)
+        if not isinstance(result, dict) or "error" in result:
+            raise Exception(f"Failed to apply task changes: {result}")
+
+        results = result.get("results", [])
+        removed = {r["id"] for r in results if r.get("status") == "ok" and r.get("action") in ("delete", "complete")}
+        tasks = []
+        for t_data in result.get("tasks", []):
+            if t_data.get("is_completed") or t_data.get("is_deleted"):
+                removed.add(t_data["id"])
+                continue
+            task = await self.session.get(Task, t_data["id"]) or Task(id=t_data["id"], content=t_data.get("content"))
+            apply_task_data(task, t_data)
+            self.session.add(task)
+            tasks.append(task)
+        for task_id in removed:
+            task = await self.session.get(Task, task_id)
+            if task:
+                await self.session.delete(task)
+        if not tasks and not removed:
+            return {"results": results, "tasks": []}
+
+        version = await bump_version(self.session, "task")
+        await self.session.commit()
+        if task_ranking.advance(version):
+            for task_id in removed:
+                task_ranking.remove(task_id)
+            for task in tasks:
+                task_ranking.upsert(task)
+        return {"results": results, "tasks": tasks}
+
+    # --- Optimistic writes (TASK_WRITE_MODE=optimistic, see task_outbox) ---
+
+    async def _write_optimistically(self, action: str, task_id: str, fields: Dict[str, Any] = None, task: Task = None) -> Optional[Task]:
+        """Apply a write to the cache and queue it for Todoist in one local transaction."""
+        TaskOutboxQueue(self.session).enqueue(action, task_id, fields)
+        if task is not None:
+            self.session.add(task)
+        else:
+            # Complete/delete: the cache only holds active tasks
+            existing = await self.session.get(Task, task_id)
+            if existing:
+                await self.session.delete(existing)
+        version = await bump_version(self.session, "task")
+        await self.session.commit()
+        if task is not None:
+            await self.session.refresh(task)
+        if task_ranking.advance(version):
+            if task is not None:
+                task_ranking.upsert(task)
+            else:
+                task_ranking.remove(task_id)
+        outbox_wakeup.set()
+        return task
+
+    def _record_push_attempt(self, entry: TaskOutbox, error: str):
+        """Count an unsuccessful push of an outbox entry; fail it once it runs out of attempts."""
+        entry.attempts += 1
+        entry.last_error = error[:500]
+        if entry.attempts >= TASK_OUTBOX_MAX_ATTEMPTS:
+            entry.status = "failed"
+            entry.processed_at = datetime.utcnow()
+            TASK_OUTBOX_ENTRIES.labels("failed").inc()
+        self.session.add(entry)
+
+    async def push_outbox(self) -> int:
+        """
+        Push the oldest pending optimistic writes to Todoist in one batch and reconcile the
+        cache: temporary ids become real ones, pushed tasks take Todoist's state, rejected
+        creates are dropped. Commits. Returns the number of writes pushed; raises (after
+        recording the attempt) if Todoist couldn't be reached.
+        """
+        queue = TaskOutboxQueue(self.session)
+        entries = await queue.pending()
+        if not entries:
+            await queue.prune()
+            await self.session.commit()
+            return 0
+
+        try:
+            result = await todoist_client.batch_commands([outbox_change(entry) for entry in entries])
+            if not isinstance(result, dict) or "error" in result:
+                raise Exception(f"Failed to push task writes: {result}")
+        except Exception as e:
+            for entry in entries:
+                self._record_push_attempt(entry, str(e))
+            await self.session.commit()
+            raise
+
+        now = datetime.utcnow()
+        pushed = 0
+        rejected_ids = set()
+        results = result.get("results", [])
+        # Writes Todoist returned no result for stay queued (command uuids make the retry
+        # safe) but count as a failed attempt, so they can't stay pending forever
+        for entry in entries[len(results):]:
+            self._record_push_attempt(entry, "No result returned for this write")
+        for entry, item in zip(entries, results):
+            entry.attempts += 1
+            entry.processed_at = now
+            if item.get("status") == "ok":
+                entry.status = "done"
+                pushed += 1
+                if entry.action == "create" and item.get("id") != entry.task_id:
+                    entry.remote_id = item.get("id")
+                    await self._replace_temp_task(entry.task_id, entry.remote_id)
+                    await queue.rename(entry.task_id, entry.remote_id)
+            else:
+                entry.status = "failed"
+                entry.last_error = str(item.get("error"))[:500]
+                if entry.action == "create":
+                    # Never reached Todoist: drop the optimistic row
+                    await self._replace_temp_task(entry.task_id, None)
+                else:
+                    rejected_ids.add(entry.task_id)
+            TASK_OUTBOX_ENTRIES.labels(entry.status).inc()
+            self.session.add(entry)
+
+        # Pushed tasks take Todoist's view, unless more writes to them are still queued.
+        # Rejected writes are rolled back from Todoist where possible; otherwise the next
+        # full sync does it (optimistic rows carry no raw_data, so it won't skip them).
+        pending_ids = await queue.pending_task_ids()
+        tasks = list(result.get("tasks", []))
+        for task_id in rejected_ids - pending_ids:
+            try:
+                t_data = await todoist_client.get_task(task_id)
+            except Exception as e:
+                print(f"Could not roll back task {task_id} after a rejected write: {e}")
+                continue
+            if isinstance(t_data, dict) and t_data.get("id"):
+                tasks.append(t_data)
+        for t_data in tasks:
+            if t_data["id"] in pending_ids:
+                continue
+            if t_data.get("is_completed") or t_data.get("is_deleted"):
+                existing = await self.session.get(Task, t_data["id"])
+                if existing:
+                    await self.session.delete(existing)
+                continue
+            task = await self.session.get(Task, t_data["id"]) or Task(id=t_data["id"], content=t_data.get("content"))
+            apply_task_data(task, t_data)
+            self.session.add(task)
+
+        await bump_version(self.session, "task")
+        await self.session.commit()
+        # Ids changed underneath the ranking: rebuild on next read
+        task_ranking.invalidate()
+        return pushed
+
+    async def _replace_temp_task(self, temp_id: str, remote_id: Optional[str]):
+        """Re-key (or, with no remote_id, drop) the cached row of an optimistic create."""
+        task = await self.session.get(Task, temp_id)
+        if not task:
+            return
+        await self.session.delete(task)
+        if remote_id and not await self.session.get(Task, remote_id):
+            data = task.model_dump(exclude={"id"})
+            self.session.add(Task(id=remote_id, **data))
+
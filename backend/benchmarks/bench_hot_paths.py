@@ -0,0 +1,127 @@
+"""
+Micro-benchmarks for CPU-bound backend hot paths (pytest-benchmark).
+
+Not collected by a plain `pytest` run (file name doesn't match test_*.py); run it
+explicitly from backend/:
+
+    # Record a baseline (stored under benchmarks/.baselines/<machine>/)
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-storage=benchmarks/.baselines --benchmark-autosave
+
+    # Compare against the latest stored baseline; fail if any mean regressed > 20%
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-storage=benchmarks/.baselines \
+        --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Baselines are machine-specific: record them on the machine (or CI runner class)
+that runs the comparison. CI does exactly that for pull requests (the
+`benchmarks` job in .github/workflows/ci.yml): it benchmarks the base commit and
+then the PR on the same runner, and fails the PR on a >20% mean regression.
+"""
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from mcp.types import CallToolResult, TextContent
+
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../mcp")))
+
+from app.routers.chat import _format_messages, _approved_tool_message
+from app.services.task_service import apply_task_data
+from app.mcp_client.session import parse_tool_result
+from app.models.task import Task
+from calendar_server.server import day_free_blocks
+
+rng = random.Random(42)
+
+
+def _todoist_task(i: int) -> dict:
+    return {
+        "id": str(7_000_000 + i),
+        "content": f"Task {i}: review the quarterly report and send notes",
+        "description": "Longer description " * rng.randint(0, 5),
+        "project_id": str(rng.randint(1, 9)),
+        "section_id": None,
+        "parent_id": None,
+        "priority": rng.randint(1, 4),
+        "due": {"date": "2025-06-01", "string": "Jun 1", "is_recurring": False, "lang": "en"} if i % 3 else None,
+        "labels": ["admin", "deep"][: i % 3],
+        "order": i,
+        "url": f"https://todoist.com/showTask?id={i}",
+        "comment_count": 0,
+        "created_at": "2025-01-01T09:00:00.000000Z",
+        "creator_id": "1",
+        "is_completed": False,
+    }
+
+
+def _history(turns: int):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"Message {i}: what should I do next?"))
+        call = {"name": "get_next_task", "args": {"k": 1}, "id": f"call_{i}", "type": "tool_call"}
+        messages.append(AIMessage(content=[{"type": "text", "text": "Let me check."}], tool_calls=[call]))
+        messages.append(ToolMessage(content=json.dumps([{"id": str(i), "text": "Write report", "pri": "p1"}]),
+                                    tool_call_id=f"call_{i}", name="get_next_task"))
+        messages.append(AIMessage(content="Your next task is 'Write report'. Ready to start?"))
+    return messages
+
+
+def _calendar_day(events: int):
+    tz = pytz.timezone("Europe/Berlin")
+    day = tz.localize(datetime(2025, 6, 2, 0, 0))
+    items = []
+    start = day.replace(hour=8)
+    for _ in range(events):
+        start += timedelta(minutes=rng.choice([15, 30, 45, 60]))
+        end = start + timedelta(minutes=rng.choice([15, 30, 60]))
+        items.append({"start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}})
+        start = end
+    return items, day.replace(hour=9), day.replace(hour=17), tz
+
+
+@pytest.mark.parametrize("turns", [25, 250])
+def test_format_messages(benchmark, turns):
+    messages = _history(turns)
+    formatted = benchmark(_format_messages, messages)
+    assert len(formatted) == 4 * turns
+
+
+def test_approve_serialization(benchmark):
+    task = apply_task_data(Task(id="1", content=""), _todoist_task(1))
+    tool_call = {"name": "update_task", "args": {"task_id": "1", "priority": 4}, "id": "call_1"}
+    message = benchmark(_approved_tool_message, tool_call, task)
+    assert "raw_data" not in message.content
+
+
+def test_free_block_gaps(benchmark):
+    events, work_start, work_end, tz = _calendar_day(24)
+    blocks = benchmark(day_free_blocks, events, work_start, work_end, 15, tz)
+    assert all(b["duration_minutes"] >= 15 for b in blocks)
+
+
+def test_task_dict_to_model(benchmark):
+    payloads = [_todoist_task(i) for i in range(500)]
+
+    def map_all():
+        return [apply_task_data(Task(id=p["id"], content=p["content"]), p) for p in payloads]
+
+    tasks = benchmark(map_all)
+    assert len(tasks) == 500
+
+
+@pytest.mark.parametrize("shape", ["split_list", "single_block"])
+def test_mcp_result_parsing(benchmark, shape):
+    payloads = [_todoist_task(i) for i in range(200)]
+    if shape == "split_list":
+        # FastMCP returns one content block per list item
+        content = [TextContent(type="text", text=json.dumps(p)) for p in payloads]
+    else:
+        content = [TextContent(type="text", text=json.dumps(payloads))]
+    result = CallToolResult(content=content)
+    parsed = benchmark(parse_tool_result, "list_tasks", result)
+    assert len(parsed) == 200
@@ -0,0 +1,257 @@
+"""
+Local fake Todoist / Calendar / Gmail MCP servers for load testing.
+
+Same tool names and result shapes as mcp/*/server.py, backed by seeded in-memory
+data, with a configurable per-call latency standing in for the upstream API.
+
+Usage (from backend/):
+    python -m benchmarks.fake_mcp_servers [--tasks 200] [--latency-ms 50] [--port-base 8101]
+    # Todoist on port-base, Calendar on +1, Gmail on +2 (SSE at /sse)
+    python -m benchmarks.fake_mcp_servers --transport http    # streamable HTTP at /mcp
+    python -m benchmarks.fake_mcp_servers --transport stdio --server todoist
+"""
+import argparse
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+
+
+class FakeData:
+    def __init__(self, tasks: int = 200, events: int = 40, emails: int = 30, seed: int = 7):
+        rng = random.Random(seed)
+        today = datetime.now(timezone.utc).date()
+        labels = ["admin", "deep", "errand", "call", "home", "work"]
+        self.tasks = {}
+        for i in range(tasks):
+            task_id = str(9_000_000 + i)
+            due = today + timedelta(days=rng.randint(-3, 20)) if rng.random() < 0.7 else None
+            self.tasks[task_id] = {
+                "id": task_id,
+                "content": f"Task {i}: " + rng.choice(["Write report", "Call bank", "Review PR", "Plan sprint", "Pay invoice"]),
+                "description": rng.choice(["", "Some longer description of what needs doing. " * 3]),
+                "project_id": str(rng.randint(1, 5)),
+                "section_id": None,
+                "parent_id": None,
+                "priority": rng.randint(1, 4),
+                "due": {"date": due.isoformat(), "string": due.isoformat(), "is_recurring": False} if due else None,
+                "labels": rng.sample(labels, rng.randint(0, 2)),
+                "order": i,
+                "url": f"https://todoist.com/showTask?id={task_id}",
+                "is_completed": False,
+                "created_at": "2024-01-01T00:00:00Z",
+            }
+        self.events = {}
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for i in range(events):
+            start = now + timedelta(hours=rng.randint(1, 14 * 24))
+            self.events[f"evt{i}"] = {
+                "id": f"evt{i}",
+                "summary": rng.choice(["Standup", "1:1", "Design review", "Lunch", "Customer call"]),
+                "start": start.isoformat(),
+                "end": (start + timedelta(minutes=rng.choice([30, 45, 60]))).isoformat(),
+                "description": "",
+            }
+        self.emails = [{
+            "id": f"msg{i}",
+            "threadId": f"thr{i}",
+            "subject": f"Subject {i}",
+            "from": f"sender{i}@example.com",
+            "date": (now - timedelta(hours=i)).strftime("%a, %d %b %Y %H:%M:%S +0000"),
+            "snippet": "Hi, just following up on the thing we discussed last week...",
+            "labels": ["INBOX", "UNREAD"] if i % 3 == 0 else ["INBOX"],
+            "internalDate": str(int((now - timedelta(hours=i)).timestamp() * 1000)),
+            "historyId": str(1000 + i),
+        } for i in range(emails)]
+
+
+def build_servers(data: FakeData, latency_ms: float = 0):
+    async def upstream():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000 * random.uniform(0.8, 1.2))
+
+    todoist = FastMCP("todoist", log_level="WARNING")
+    calendar = FastMCP("calendar", log_level="WARNING")
+    gmail = FastMCP("gmail", log_level="WARNING")
+
+    @todoist.tool()
+    async def list_tasks():
+        await upstream()
+        return list(data.tasks.values())
+
+    @todoist.tool()
+    async def get_task(task_id: str):
+        await upstream()
+        return data.tasks.get(task_id) or f"Error: task {task_id} not found"
+
+    @todoist.tool()
+    async def create_task(content: str, description: Optional[str] = None, due_string: Optional[str] = None, priority: Optional[int] = None):
+        await upstream()
+        task_id = str(uuid.uuid4().int % 10**10)
+        data.tasks[task_id] = {
+            "id": task_id, "content": content, "description": description or "", "project_id": "1",
+            "section_id": None, "parent_id": None, "priority": priority or 1,
+            "due": {"date": due_string, "string": due_string} if due_string else None,
+            "labels": [], "order": len(data.tasks), "url": f"https://todoist.com/showTask?id={task_id}",
+            "is_completed": False,
+        }
+        return data.tasks[task_id]
+
+    @todoist.tool()
+    async def update_task(task_id: str, content: Optional[str] = None, description: Optional[str] = None, due_string: Optional[str] = None, priority: Optional[int] = None):
+        await upstream()
+        task = data.tasks.get(task_id)
+        if not task:
+            return {"success": False, "id": task_id}
+        if content is not None:
+            task["content"] = content
+        if description is not None:
+            task["description"] = description
+        if due_string is not None:
+            task["due"] = {"date": due_string, "string": due_string}
+        if priority is not None:
+            task["priority"] = priority
+        return task
+
+    @todoist.tool()
+    async def delete_task(task_id: str):
+        await upstream()
+        return {"success": data.tasks.pop(task_id, None) is not None, "id": task_id}
+
+    @todoist.tool()
+    async def complete_task(task_id: str):
+        await upstream()
+        return {"success": data.tasks.pop(task_id, None) is not None, "id": task_id}
+
+    @todoist.tool()
+    async def batch_commands(commands: List[dict]):
+        await upstream()
+        mapping, results, touched = {}, [], []
+        for command in commands:
+            action = command["action"]
+            task_id = mapping.get(command.get("task_id"), command.get("task_id"))
+            if action == "create":
+                task_id = str(uuid.uuid4().int % 10**10)
+                mapping[command.get("temp_id") or task_id] = task_id
+                data.tasks[task_id] = {
+                    "id": task_id, "content": command.get("content"), "description": command.get("description") or "",
+                    "project_id": command.get("project_id") or "1", "section_id": None,
+                    "parent_id": mapping.get(command.get("parent_id"), command.get("parent_id")),
+                    "priority": command.get("priority") or 1,
+                    "due": {"date": command["due_string"], "string": command["due_string"]} if command.get("due_string") else None,
+                    "labels": [], "order": len(data.tasks), "url": f"https://todoist.com/showTask?id={task_id}",
+                    "is_completed": False,
+                }
+            elif task_id not in data.tasks:
+                results.append({"uuid": command.get("uuid"), "action": action, "id": task_id, "error": "Task not found"})
+                continue
+            elif action in ("delete", "complete"):
+                data.tasks.pop(task_id)
+            else:
+                task = data.tasks[task_id]
+                for key in ("content", "description", "priority", "project_id", "parent_id"):
+                    if command.get(key) is not None:
+                        task[key] = command[key]
+                if command.get("due_string") is not None:
+                    task["due"] = {"date": command["due_string"], "string": command["due_string"]}
+            if action in ("create", "update", "move"):
+                touched.append(task_id)
+            results.append({"uuid": command.get("uuid"), "action": action, "id": task_id, "status": "ok"})
+        tasks = [data.tasks[task_id] for task_id in dict.fromkeys(touched) if task_id in data.tasks]
+        return {"results": results, "temp_id_mapping": mapping, "tasks": tasks}
+
+    @calendar.tool()
+    async def list_events(days: int = 7) -> List[dict]:
+        await upstream()
+        now = datetime.now(timezone.utc)
+        end = now + timedelta(days=days)
+        return sorted(
+            (e for e in data.events.values() if now <= datetime.fromisoformat(e["start"]) <= end),
+            key=lambda e: e["start"],
+        )
+
+    @calendar.tool()
+    async def create_event(summary: str, start_time: str, end_time: str, description: str = "") -> dict:
+        await upstream()
+        event_id = f"evt{uuid.uuid4().hex[:10]}"
+        data.events[event_id] = {"id": event_id, "summary": summary, "start": start_time, "end": end_time, "description": description}
+        return {"id": event_id, "summary": summary, "status": "created", "link": ""}
+
+    @calendar.tool()
+    async def find_free_blocks(duration_minutes: int = 60, days: int = 3) -> List[dict]:
+        await upstream()
+        now = datetime.now(timezone.utc)
+        blocks = []
+        for i in range(days):
+            day = now + timedelta(days=i)
+            start = max(day.replace(hour=9, minute=0, second=0, microsecond=0), now)
+            end = day.replace(hour=17, minute=0, second=0, microsecond=0)
+            if end - start >= timedelta(minutes=duration_minutes):
+                blocks.append({"start": start.isoformat(), "end": end.isoformat(),
+                               "duration_minutes": int((end - start).total_seconds() // 60)})
+        return blocks
+
+    @calendar.tool()
+    async def list_event_changes(sync_token: Optional[str] = None) -> dict:
+        await upstream()
+        return {"events": [], "next_sync_token": "fake-sync-token"}
+
+    @gmail.tool()
+    async def list_emails(max_results: int = 10, query: str = "") -> List[dict]:
+        await upstream()
+        emails = [e for e in data.emails if "is:unread" not in query or "UNREAD" in e["labels"]]
+        return emails[:max_results]
+
+    @gmail.tool()
+    async def list_email_page(query: str = "", max_results: int = 25, page_token: Optional[str] = None) -> dict:
+        await upstream()
+        emails = [e for e in data.emails if "is:unread" not in query or "UNREAD" in e["labels"]]
+        start = int(page_token or 0)
+        end = start + max_results
+        return {"emails": emails[start:end], "next_page_token": str(end) if end < len(emails) else None}
+
+    @gmail.tool()
+    async def list_email_changes(history_id: Optional[str] = None) -> dict:
+        await upstream()
+        return {"emails": [], "deleted": [], "history_id": "2000"}
+
+    @gmail.tool()
+    async def create_draft(to: str, subject: str, body: str) -> dict:
+        await upstream()
+        return {"id": f"draft{uuid.uuid4().hex[:8]}", "message": {}, "status": "Draft created successfully"}
+
+    return {"todoist": todoist, "calendar": calendar, "gmail": gmail}
+
+
+async def serve(port_base: int, tasks: int, latency_ms: float, host: str = "127.0.0.1", transport: str = "sse"):
+    servers = build_servers(FakeData(tasks=tasks), latency_ms)
+    uvicorn_servers = [
+        uvicorn.Server(uvicorn.Config(
+            mcp.streamable_http_app() if transport == "http" else mcp.sse_app(),
+            host=host, port=port_base + offset, log_level="warning",
+        ))
+        for offset, mcp in enumerate(servers.values())
+    ]
+    await asyncio.gather(*(s.serve() for s in uvicorn_servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port-base", type=int, default=8101)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--transport", choices=["sse", "http", "stdio"], default="sse")
+    parser.add_argument("--server", choices=["todoist", "calendar", "gmail"], default="todoist", help="stdio only")
+    args = parser.parse_args()
+    if args.transport == "stdio":
+        build_servers(FakeData(tasks=args.tasks), args.latency_ms)[args.server].run("stdio")
+    else:
+        asyncio.run(serve(args.port_base, args.tasks, args.latency_ms, transport=args.transport))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+End-to-end load test: boots the fake MCP servers and the backend (LLM_PROVIDER=fake),
+then drives multi-turn conversations with approvals from concurrent virtual users
+and reports p50/p95/p99 latency and requests/sec per endpoint.
+
+Each virtual user repeats this scenario:
+    POST /chat/message  "What should I do next?"          (get_next_task)
+    POST /chat/message  "Schedule a focus block for it"   (find_free_blocks -> proposal)
+    POST /chat/approve                                    (create_calendar_event)
+    GET  /chat/{thread_id}?since=N                        (delta poll)
+    GET  /tasks?sort=priority&limit=50
+    GET  /calendar/events
+    POST /guided/start, /guided/{id}/skip, /guided/{id}/complete
+
+Needs a reachable Postgres (DATABASE_URL). Usage (from backend/):
+    python -m benchmarks.load_test --users 20 --iterations 5 --llm-latency-ms 300 --mcp-latency-ms 80
+    python -m benchmarks.load_test --url http://localhost:8000 ...   # against an already running backend
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted sample list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5 - 1e-9)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        finally:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        rows = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            rows[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "rps": len(samples) / wall_seconds if wall_seconds else 0.0,
+            }
+        return rows
+
+
+async def conversation(client: httpx.AsyncClient, rec: Recorder):
+    r = await rec.request(client, "POST /chat/message", "POST", "/chat/message", json={"message": "What should I do next?"})
+    if r is None or r.status_code != 200:
+        return
+    body = r.json()
+    thread_id, total = body["thread_id"], body["total_messages"]
+
+    r = await rec.request(client, "POST /chat/message", "POST", "/chat/message",
+                          json={"message": "Schedule a focus block for it", "thread_id": thread_id, "since": total})
+    if r is not None and r.status_code == 200:
+        body = r.json()
+        total = body["total_messages"]
+        if body["status"] == "waiting_for_approval":
+            r = await rec.request(client, "POST /chat/approve", "POST", "/chat/approve", json={"thread_id": thread_id, "since": total})
+            if r is not None and r.status_code == 200:
+                total = r.json()["total_messages"]
+
+    await rec.request(client, "GET /chat/{thread_id}", "GET", f"/chat/{thread_id}", params={"since": total})
+    await rec.request(client, "GET /tasks", "GET", "/tasks/", params={"sort": "priority", "limit": 50})
+    await rec.request(client, "GET /calendar/events", "GET", "/calendar/events", params={"days": 7})
+
+    r = await rec.request(client, "POST /guided/start", "POST", "/guided/start", json={"labels": ["admin"]})
+    if r is not None and r.status_code == 200:
+        session_id = r.json()["session_id"]
+        await rec.request(client, "POST /guided/{id}/skip", "POST", f"/guided/{session_id}/skip")
+        await rec.request(client, "POST /guided/{id}/complete", "POST", f"/guided/{session_id}/complete")
+
+
+async def run_load(url: str, users: int, iterations: int, timeout: float) -> Dict[str, Dict[str, float]]:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def user():
+            for _ in range(iterations):
+                await conversation(client, rec)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+        wall = time.perf_counter() - start
+    report = rec.report(wall)
+    report["_total"] = {
+        "conversations": users * iterations,
+        "wall_seconds": wall,
+        "rps": sum(len(s) for s in rec.latencies.values()) / wall if wall else 0.0,
+    }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    total = report.get("_total", {})
+    print(f"\n{total.get('conversations', 0)} conversations in {total.get('wall_seconds', 0):.1f}s, "
+          f"{total.get('rps', 0):.1f} req/s overall\n")
+    print(f"{'endpoint':<28}{'count':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for endpoint, row in report.items():
+        if endpoint.startswith("_"):
+            continue
+        print(f"{endpoint:<28}{row['count']:>7}{row['errors']:>6}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['rps']:>9.1f}")
+
+
+def _wait_for(url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _wait_for_port(port: int, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Port {port} did not open within {timeout:.0f}s")
+
+
+def boot_stack(args) -> List[subprocess.Popen]:
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    mcp = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_mcp_servers", "--port-base", str(args.mcp_port_base),
+         "--tasks", str(args.tasks), "--latency-ms", str(args.mcp_latency_ms)],
+        cwd=backend_dir,
+    )
+    env = dict(
+        os.environ,
+        LLM_PROVIDER="fake",
+        FAKE_LLM_LATENCY_MS=str(args.llm_latency_ms),
+        FAKE_LLM_JITTER_MS=str(args.llm_latency_ms * 0.2),
+        MCP_SERVER_URL=f"http://127.0.0.1:{args.mcp_port_base}/sse",
+        CALENDAR_MCP_SERVER_URL=f"http://127.0.0.1:{args.mcp_port_base + 1}/sse",
+        GMAIL_MCP_SERVER_URL=f"http://127.0.0.1:{args.mcp_port_base + 2}/sse",
+    )
+    procs = [mcp]
+    for offset in range(3):
+        _wait_for_port(args.mcp_port_base + offset, 20)
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+    procs.append(backend)
+    _wait_for(f"http://127.0.0.1:{args.port}/health", 60)
+    return procs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target an already running backend instead of booting one")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=3, help="Conversations per user")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--mcp-latency-ms", type=float, default=80)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks seeded in the fake Todoist")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mcp-port-base", type=int, default=8101)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    procs = [] if args.url else boot_stack(args)
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run_load(url, args.users, args.iterations, args.timeout))
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Per-call overhead of each MCP client transport (sse, http, inprocess, stdio).
+
+Runs the fake Todoist MCP server (benchmarks/fake_mcp_servers.py, zero upstream
+latency) and times `get_task` through app.mcp_client.session exactly as the
+backend clients do: open session (per call for sse/http/inprocess, shared for
+stdio) + call_tool + parse_tool_result.
+
+Usage (from backend/):
+    python -m benchmarks.mcp_transport_overhead [--calls 200] [--concurrency 1]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from mcp.client.stdio import StdioServerParameters
+
+from app.mcp_client import session as mcp
+from benchmarks.fake_mcp_servers import FakeData, build_servers
+from benchmarks.load_test import percentile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SSE_PORT = 8121
+HTTP_PORT = 8131
+
+
+def _wait_for_port(port: int, timeout: float = 20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Port {port} did not open")
+
+
+async def _one_call(transport: str, url: str):
+    async with mcp.open_session("todoist", transport, url) as session:
+        result = await mcp.call_tool(session, "todoist", "get_task", {"task_id": "9000001"})
+        return mcp.parse_tool_result("get_task", result)
+
+
+async def measure(transport: str, url: str, calls: int, concurrency: int) -> List[float]:
+    for _ in range(5):  # warm-up (imports, stdio process start, keep-alive)
+        await _one_call(transport, url)
+
+    samples: List[float] = []
+    remaining = iter(range(calls))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            data = await _one_call(transport, url)
+            samples.append(time.perf_counter() - start)
+            assert isinstance(data, dict) and data["id"] == "9000001", data
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def run(calls: int, concurrency: int, transports: List[str]) -> Dict[str, List[float]]:
+    # In-process and stdio use the fake server instead of mcp/todoist_server
+    mcp._inprocess_servers["todoist"] = build_servers(FakeData(tasks=50))["todoist"]
+    mcp._stdio_connections["todoist"] = mcp.StdioConnection(StdioServerParameters(
+        command=sys.executable, args=["-m", "benchmarks.fake_mcp_servers", "--transport", "stdio",
+                                      "--tasks", "50", "--latency-ms", "0"],
+        cwd=BACKEND_DIR,
+    ))
+    urls = {
+        "sse": f"http://127.0.0.1:{SSE_PORT}/sse",
+        "http": f"http://127.0.0.1:{HTTP_PORT}/mcp",
+        "inprocess": None,
+        "stdio": None,
+    }
+    results = {}
+    try:
+        for transport in transports:
+            results[transport] = await measure(transport, urls[transport], calls, concurrency)
+    finally:
+        await mcp.close_sessions()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--transports", default="sse,http,inprocess,stdio")
+    args = parser.parse_args()
+    transports = args.transports.split(",")
+
+    servers = []
+    for transport, port in (("sse", SSE_PORT), ("http", HTTP_PORT)):
+        if transport in transports:
+            servers.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.fake_mcp_servers", "--transport", transport,
+                 "--port-base", str(port), "--tasks", "50", "--latency-ms", "0"],
+                cwd=BACKEND_DIR,
+            ))
+            _wait_for_port(port)
+    try:
+        results = asyncio.run(run(args.calls, args.concurrency, transports))
+    finally:
+        for proc in servers:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    print(f"\n{args.calls} get_task calls per transport, concurrency {args.concurrency}\n")
+    print(f"{'transport':<12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>10}")
+    for transport, samples in results.items():
+        mean = sum(samples) / len(samples)
+        print(f"{transport:<12}{mean * 1000:>10.2f}{percentile(samples, 50) * 1000:>10.2f}"
+              f"{percentile(samples, 95) * 1000:>10.2f}{percentile(samples, 99) * 1000:>10.2f}"
+              f"{args.concurrency / mean:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
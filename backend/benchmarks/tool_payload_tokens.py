@@ -0,0 +1,131 @@
+"""
+Measure prompt-token reduction from compact tool projections.
+
+Builds a representative thread (a "what should I do next" triage over a mid-sized
+Todoist account, a calendar review, an inbox check and one approved task update)
+and compares the ToolMessage content the agent used to see (full `model_dump()`
+rows incl. `raw_data`) with the compact projections from `app.agent.projections`.
+
+Tool messages stay in the transcript, so every later turn re-sends them; the
+"per later prompt" column is what each subsequent LLM call pays.
+
+Usage (from backend/):
+    python -m benchmarks.tool_payload_tokens [--tasks 60] [--events 20] [--emails 10]
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.agent.projections import compact, estimate_tokens
+from app.models.task import Task
+from app.models.event import Event
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return estimate_tokens(text)
+
+
+def todoist_payload(i: int) -> dict:
+    """A task dict shaped like `Task.to_dict()` from todoist-api-python."""
+    due_date = (datetime(2026, 10, 19) + timedelta(days=i % 14)).strftime("%Y-%m-%d")
+    return {
+        "id": str(8000000000 + i),
+        "assignee_id": None,
+        "assigner_id": None,
+        "comment_count": i % 3,
+        "is_completed": False,
+        "content": f"Follow up on project item #{i}",
+        "created_at": "2026-09-01T10:15:42.123456Z",
+        "creator_id": "41234567",
+        "description": "Check the latest notes and reply to the thread with a short status update." if i % 2 else "",
+        "due": {"date": due_date, "is_recurring": i % 5 == 0, "string": "every week" if i % 5 == 0 else due_date,
+                "datetime": None, "timezone": None, "lang": "en"},
+        "duration": None,
+        "labels": ["admin"] if i % 3 == 0 else ["work", "followup"],
+        "order": i,
+        "priority": 1 + i % 4,
+        "project_id": "2203306141",
+        "section_id": "7025" if i % 2 else None,
+        "parent_id": None,
+        "url": f"https://app.todoist.com/app/task/{8000000000 + i}",
+    }
+
+
+def task_row(data: dict) -> Task:
+    due = data.get("due") or {}
+    return Task(
+        id=data["id"], content=data["content"], description=data["description"],
+        project_id=data["project_id"], section_id=data["section_id"], parent_id=data["parent_id"],
+        priority=data["priority"], due_string=due.get("string"), due_date=due.get("date"),
+        labels=data["labels"], order=data["order"], url=data["url"], raw_data=data,
+    )
+
+
+def event_row(i: int) -> Event:
+    start = datetime(2026, 10, 19, 9) + timedelta(hours=5 * i)
+    raw = {"id": f"evt{i:04d}abcdef", "summary": f"Meeting {i}", "start": start.isoformat() + "Z",
+           "end": (start + timedelta(minutes=45)).isoformat() + "Z", "description": "Weekly sync. Agenda in doc."}
+    return Event(id=raw["id"], summary=raw["summary"], description=raw["description"],
+                 start_time=start, end_time=start + timedelta(minutes=45), raw_data=raw)
+
+
+def email_dict(i: int) -> dict:
+    return {"id": f"18c{i:013x}", "threadId": f"18c{i:013x}", "subject": f"Re: Quarterly planning ({i})",
+            "from": "Alex Example <alex@example.com>", "date": "Mon, 19 Oct 2026 08:1%d:00 +0000" % (i % 10),
+            "snippet": "Thanks for the update — could you send over the revised numbers before Thursday's review? " * 2}
+
+
+def full_content(result) -> str:
+    """The pre-projection serialization (model_dump with raw_data, as approve_action used to do)."""
+    if isinstance(result, list):
+        return json.dumps([r.model_dump() if hasattr(r, "model_dump") else r for r in result], default=str)
+    if hasattr(result, "model_dump"):
+        return json.dumps(result.model_dump(), default=str)
+    return json.dumps(result, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=60)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--emails", type=int, default=10)
+    args = parser.parse_args()
+
+    tasks = [task_row(todoist_payload(i)) for i in range(args.tasks)]
+    events = [event_row(i) for i in range(args.events)]
+    emails = [email_dict(i) for i in range(args.emails)]
+    updated = task_row(dict(todoist_payload(0), content="Follow up on project item #0 (moved)"))
+
+    thread = [
+        ("list_tasks", tasks),
+        ("list_calendar_events", events),
+        ("list_emails", emails),
+        ("update_task", updated),
+    ]
+
+    print(f"Token counter: {'tiktoken cl100k_base' if _ENCODING else '~4 chars/token estimate'}")
+    print(f"{'tool':<24}{'full':>10}{'compact':>10}{'saved':>9}")
+    total_full = total_compact = 0
+    for tool_name, result in thread:
+        before = count_tokens(full_content(result))
+        after = count_tokens(compact(tool_name, result))
+        total_full += before
+        total_compact += after
+        print(f"{tool_name:<24}{before:>10}{after:>10}{(1 - after / before):>9.0%}")
+    print(f"{'per later prompt':<24}{total_full:>10}{total_compact:>10}{(1 - total_compact / total_full):>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Send fake Todoist / Google Calendar push notifications to a local backend.
+
+Todoist payloads are signed exactly like Todoist does (X-Todoist-Hmac-SHA256 with
+TODOIST_CLIENT_SECRET), and Google notifications carry the X-Goog-* headers with
+GOOGLE_CALENDAR_CHANNEL_TOKEN, so the real validation path is exercised.
+
+Usage (from backend/):
+    python -m scripts.fake_webhook_sender todoist item:added --id 123 --content "Write report" --priority 4
+    python -m scripts.fake_webhook_sender todoist item:completed --id 123
+    python -m scripts.fake_webhook_sender calendar [--state exists]
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.routers.webhooks import todoist_signature
+
+
+def send_todoist(base_url: str, secret: str, event_name: str, item: dict) -> httpx.Response:
+    body = json.dumps({
+        "event_name": event_name,
+        "event_data": item,
+        "user_id": "1",
+        "version": "9",
+    }).encode()
+    return httpx.post(
+        f"{base_url}/webhooks/todoist",
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-Todoist-Hmac-SHA256": todoist_signature(secret, body),
+            "X-Todoist-Delivery-ID": str(uuid.uuid4()),
+        },
+    )
+
+
+def send_calendar(base_url: str, token: str, state: str) -> httpx.Response:
+    return httpx.post(
+        f"{base_url}/webhooks/google-calendar",
+        headers={
+            "X-Goog-Channel-ID": "fake-channel",
+            "X-Goog-Channel-Token": token,
+            "X-Goog-Resource-ID": "fake-resource",
+            "X-Goog-Resource-State": state,
+            "X-Goog-Message-Number": "1",
+        },
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://localhost:8000"))
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    todoist = sub.add_parser("todoist")
+    todoist.add_argument("event_name", help="e.g. item:added, item:updated, item:completed, item:deleted")
+    todoist.add_argument("--id", required=True)
+    todoist.add_argument("--content", default="Fake task")
+    todoist.add_argument("--description", default="")
+    todoist.add_argument("--priority", type=int, default=1)
+    todoist.add_argument("--due", default=None, help="YYYY-MM-DD")
+    todoist.add_argument("--label", action="append", default=[])
+    todoist.add_argument("--secret", default=os.getenv("TODOIST_CLIENT_SECRET"))
+
+    calendar = sub.add_parser("calendar")
+    calendar.add_argument("--state", default="exists", help="sync, exists or not_exists")
+    calendar.add_argument("--token", default=os.getenv("GOOGLE_CALENDAR_CHANNEL_TOKEN"))
+
+    args = parser.parse_args()
+    if args.source == "todoist":
+        if not args.secret:
+            parser.error("--secret or TODOIST_CLIENT_SECRET is required")
+        item = {
+            "id": args.id,
+            "content": args.content,
+            "description": args.description,
+            "priority": args.priority,
+            "labels": args.label,
+            "due": {"date": args.due, "string": args.due} if args.due else None,
+            "child_order": 1,
+            "checked": args.event_name == "item:completed",
+            "is_deleted": args.event_name == "item:deleted",
+        }
+        response = send_todoist(args.url, args.secret, args.event_name, item)
+    else:
+        if not args.token:
+            parser.error("--token or GOOGLE_CALENDAR_CHANNEL_TOKEN is required")
+        response = send_calendar(args.url, args.token, args.state)
+
+    print(response.status_code, response.text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 import os
+import sys
 import datetime
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -7,6 +8,7 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from rate_limiter import TokenBucket, threaded_tool
 
 # Load .env
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
@@ -16,6 +18,19 @@ mcp = FastMCP("calendar")
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Calendar API default quota is ~600 queries/minute per user; stay below it
+calendar_quota = TokenBucket(
+    "google_calendar",
+    rate=float(os.getenv("CALENDAR_QUOTA_PER_SECOND", "5")),
+    burst=float(os.getenv("CALENDAR_QUOTA_BURST", "20")),
+    max_wait=float(os.getenv("QUOTA_MAX_WAIT_SECONDS", "30")),
+)
+
+def execute(request):
+    """request.execute(), paced by the Calendar API quota."""
+    calendar_quota.acquire()
+    return request.execute()
+
 def get_service():
     """Shows basic usage of the Google Calendar API."""
     creds = None
@@ -47,10 +62,10 @@ def get_service():
         service = build('calendar', 'v3', credentials=creds)
         return service
     except Exception as e:
-        print(f"Error building service: {e}")
+        print(f"Error building service: {e}", file=sys.stderr)
         return None
 
-@mcp.tool()
+@threaded_tool(mcp)
 def list_events(days: int = 7) -> List[dict]:
     """List upcoming calendar events."""
     service = get_service()
@@ -61,31 +76,21 @@ def list_events(days: int = 7) -> List[dict]:
     end_time = (datetime.datetime.utcnow() + datetime.timedelta(days=days)).isoformat() + 'Z'
     
     try:
-        events_result = service.events().list(
+        events_result = execute(service.events().list(
             calendarId='primary', 
             timeMin=now,
             timeMax=end_time,
             maxResults=50, 
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
         events = events_result.get('items', [])
         
-        results = []
-        for event in events:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            results.append({
-                "id": event['id'],
-                "summary": event.get('summary', 'No Title'),
-                "start": start,
-                "end": event['end'].get('dateTime', event['end'].get('date')),
-                "description": event.get('description', '')
-            })
-        return results
+        return [_event_summary(event) for event in events]
     except Exception as e:
         return [{"error": str(e)}]
 
-@mcp.tool()
+@threaded_tool(mcp)
 def create_event(summary: str, start_time: str, end_time: str, description: str = "") -> dict:
     """Create a new calendar event. Times must be ISO format strings."""
     service = get_service()
@@ -106,7 +111,7 @@ def create_event(summary: str, start_time: str, end_time: str, description: str
     }
 
     try:
-        event = service.events().insert(calendarId='primary', body=event).execute()
+        event = execute(service.events().insert(calendarId='primary', body=event))
         return {
             "id": event.get('id'),
             "summary": event.get('summary'),
@@ -116,7 +121,135 @@ def create_event(summary: str, start_time: str, end_time: str, description: str
     except Exception as e:
         return {"error": str(e)}
 
-@mcp.tool()
+def _event_summary(event: dict) -> dict:
+    return {
+        "id": event['id'],
+        "summary": event.get('summary', 'No Title'),
+        "start": event['start'].get('dateTime', event['start'].get('date')),
+        "end": event['end'].get('dateTime', event['end'].get('date')),
+        "description": event.get('description', '')
+    }
+
+def _today_start_utc() -> str:
+    today = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today.isoformat() + 'Z'
+
+@threaded_tool(mcp)
+def list_event_changes(sync_token: Optional[str] = None) -> dict:
+    """
+    Incremental sync: events changed since `sync_token` (cancelled ones carry status "cancelled"),
+    plus the token for the next call. Without a token, only a fresh token is returned.
+    """
+    service = get_service()
+    if not service:
+        return {"error": "Calendar service not configured."}
+
+    changes = []
+    page_token = None
+    try:
+        while True:
+            if sync_token:
+                request = service.events().list(calendarId='primary', syncToken=sync_token, pageToken=page_token, showDeleted=True, singleEvents=True)
+            else:
+                # Initial sync: page through IDs only, we just need the final nextSyncToken.
+                # Bounded at today like the backend's cache window, so recurring events
+                # aren't expanded across the calendar's whole history
+                request = service.events().list(calendarId='primary', pageToken=page_token, singleEvents=True, maxResults=2500,
+                                                timeMin=_today_start_utc(), fields='nextPageToken,nextSyncToken')
+            result = execute(request)
+            for event in result.get('items', []):
+                if event.get('status') == 'cancelled':
+                    changes.append({"id": event['id'], "status": "cancelled"})
+                elif 'start' in event:
+                    changes.append(_event_summary(event))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return {"events": changes, "next_sync_token": result.get('nextSyncToken')}
+    except Exception as e:
+        if getattr(getattr(e, 'resp', None), 'status', None) == 410:
+            return {"error": "sync_token_expired"}
+        return {"error": str(e)}
+
+@threaded_tool(mcp)
+def watch_events(address: str, channel_id: str, token: str = "", ttl_seconds: int = 604800) -> dict:
+    """Register a push notification channel for the primary calendar (HTTPS `address` required by Google)."""
+    service = get_service()
+    if not service:
+        return {"error": "Calendar service not configured."}
+
+    body = {"id": channel_id, "type": "web_hook", "address": address, "params": {"ttl": str(ttl_seconds)}}
+    if token:
+        body["token"] = token
+    try:
+        channel = execute(service.events().watch(calendarId='primary', body=body))
+        return {
+            "id": channel.get('id'),
+            "resource_id": channel.get('resourceId'),
+            "expiration": channel.get('expiration')
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+def day_free_blocks(events: List[dict], work_start: datetime.datetime, work_end: datetime.datetime,
+                    duration_minutes: int, tz) -> List[dict]:
+    """Gaps of at least `duration_minutes` between `events` (sorted by start) within [work_start, work_end]."""
+    free_blocks = []
+    last_end = work_start
+    
+    for event in events:
+        # Parse event times
+        start_str = event['start'].get('dateTime')
+        if not start_str: continue # All-day event (skip for now or treat as blocking?)
+        
+        # Handle 'Z' for UTC
+        if start_str.endswith('Z'):
+            start_str = start_str[:-1] + '+00:00'
+            
+        event_start = datetime.datetime.fromisoformat(start_str)
+        
+        # Normalize timezone
+        if event_start.tzinfo is None:
+            event_start = tz.localize(event_start)
+        else:
+            event_start = event_start.astimezone(tz)
+
+        # If event starts after last_end, we have a gap
+        if event_start > last_end:
+            gap_duration = (event_start - last_end).total_seconds() / 60
+            if gap_duration >= duration_minutes:
+                free_blocks.append({
+                    "start": last_end.isoformat(),
+                    "end": event_start.isoformat(),
+                    "duration_minutes": int(gap_duration)
+                })
+        
+        # Update last_end
+        end_str = event['end'].get('dateTime')
+        if end_str:
+            if end_str.endswith('Z'):
+                end_str = end_str[:-1] + '+00:00'
+            event_end = datetime.datetime.fromisoformat(end_str)
+            if event_end.tzinfo is None:
+                event_end = tz.localize(event_end)
+            else:
+                event_end = event_end.astimezone(tz)
+            
+            if event_end > last_end:
+                last_end = event_end
+
+    # Check gap after last event until work_end
+    if last_end < work_end:
+        gap_duration = (work_end - last_end).total_seconds() / 60
+        if gap_duration >= duration_minutes:
+            free_blocks.append({
+                "start": last_end.isoformat(),
+                "end": work_end.isoformat(),
+                "duration_minutes": int(gap_duration)
+            })
+
+    return free_blocks
+
+@threaded_tool(mcp)
 def find_free_blocks(duration_minutes: int = 60, days: int = 3) -> List[dict]:
     """Find free time blocks of a specific duration within working hours (9 AM - 5 PM)."""
     service = get_service()
@@ -125,7 +258,7 @@ def find_free_blocks(duration_minutes: int = 60, days: int = 3) -> List[dict]:
         
     # Get calendar timezone
     try:
-        cal_setting = service.calendars().get(calendarId='primary').execute()
+        cal_setting = execute(service.calendars().get(calendarId='primary'))
         time_zone = cal_setting.get('timeZone', 'UTC')
     except:
         time_zone = 'UTC'
@@ -164,73 +297,28 @@ def find_free_blocks(duration_minutes: int = 60, days: int = 3) -> List[dict]:
         day_start_iso = current_day.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
         day_end_iso = current_day.replace(hour=23, minute=59, second=59, microsecond=0).isoformat()
         
-        events_result = service.events().list(
+        events_result = execute(service.events().list(
             calendarId='primary', 
             timeMin=day_start_iso,
             timeMax=day_end_iso,
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
         events = events_result.get('items', [])
 
-        # Find gaps
-        last_end = work_start
-        
-        for event in events:
-            # Parse event times
-            start_str = event['start'].get('dateTime')
-            if not start_str: continue # All-day event (skip for now or treat as blocking?)
-            
-            # Handle 'Z' for UTC
-            if start_str.endswith('Z'):
-                start_str = start_str[:-1] + '+00:00'
-                
-            event_start = datetime.datetime.fromisoformat(start_str)
-            
-            # Normalize timezone
-            if event_start.tzinfo is None:
-                event_start = tz.localize(event_start)
-            else:
-                event_start = event_start.astimezone(tz)
-
-            # If event starts after last_end, we have a gap
-            if event_start > last_end:
-                gap_duration = (event_start - last_end).total_seconds() / 60
-                if gap_duration >= duration_minutes:
-                    free_blocks.append({
-                        "start": last_end.isoformat(),
-                        "end": event_start.isoformat(),
-                        "duration_minutes": int(gap_duration)
-                    })
-            
-            # Update last_end
-            end_str = event['end'].get('dateTime')
-            if end_str:
-                if end_str.endswith('Z'):
-                    end_str = end_str[:-1] + '+00:00'
-                event_end = datetime.datetime.fromisoformat(end_str)
-                if event_end.tzinfo is None:
-                    event_end = tz.localize(event_end)
-                else:
-                    event_end = event_end.astimezone(tz)
-                
-                if event_end > last_end:
-                    last_end = event_end
-
-        # Check gap after last event until work_end
-        if last_end < work_end:
-            gap_duration = (work_end - last_end).total_seconds() / 60
-            if gap_duration >= duration_minutes:
-                free_blocks.append({
-                    "start": last_end.isoformat(),
-                    "end": work_end.isoformat(),
-                    "duration_minutes": int(gap_duration)
-                })
+        free_blocks.extend(day_free_blocks(events, work_start, work_end, duration_minutes, tz))
 
     return free_blocks
 
+@mcp.tool()
+def quota_status() -> List[dict]:
+    """Upstream API pacing: available units, queue depth and wait times."""
+    return [calendar_quota.stats()]
+
 # Expose the SSE ASGI app for Uvicorn
 app = mcp.sse_app()
+# Streamable HTTP transport (served at /mcp): uvicorn <server>.server:http_app
+http_app = mcp.streamable_http_app()
 
 if __name__ == "__main__":
     mcp.run()
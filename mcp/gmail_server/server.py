@@ -1,5 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 import os
+import sys
 import base64
 from typing import List, Optional
 from dotenv import load_dotenv
@@ -8,6 +9,7 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from email.mime.text import MIMEText
+from rate_limiter import TokenBucket, threaded_tool
 
 # Load .env
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
@@ -20,6 +22,26 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.compose'
 ]
 
+# Gmail meters quota units per method (limit: 250 units/second per user)
+QUOTA_UNITS = {
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.get": 5,
+    "gmail.users.history.list": 2,
+    "gmail.users.getProfile": 1,
+    "gmail.users.drafts.create": 10,
+}
+gmail_quota = TokenBucket(
+    "gmail",
+    rate=float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "200")),
+    burst=float(os.getenv("GMAIL_QUOTA_BURST", "250")),
+    max_wait=float(os.getenv("QUOTA_MAX_WAIT_SECONDS", "30")),
+)
+
+def execute(request):
+    """request.execute(), paced by the method's Gmail quota cost."""
+    gmail_quota.acquire(QUOTA_UNITS.get(getattr(request, "methodId", None), 5))
+    return request.execute()
+
 def get_service():
     """Shows basic usage of the Gmail API."""
     creds = None
@@ -45,10 +67,10 @@ def get_service():
         service = build('gmail', 'v1', credentials=creds)
         return service
     except Exception as e:
-        print(f"Error building service: {e}")
+        print(f"Error building service: {e}", file=sys.stderr)
         return None
 
-@mcp.tool()
+@threaded_tool(mcp)
 def list_emails(max_results: int = 10, query: str = "") -> List[dict]:
     """List emails matching a query (e.g., 'is:unread')."""
     service = get_service()
@@ -56,33 +78,109 @@ def list_emails(max_results: int = 10, query: str = "") -> List[dict]:
         return [{"error": "Gmail service not configured. Please add credentials.json."}]
 
     try:
-        results = service.users().messages().list(userId='me', maxResults=max_results, q=query).execute()
+        results = execute(service.users().messages().list(userId='me', maxResults=max_results, q=query))
         messages = results.get('messages', [])
-        
-        email_list = []
-        for msg in messages:
-            txt = service.users().messages().get(userId='me', id=msg['id']).execute()
-            payload = txt.get('payload', {})
-            headers = payload.get('headers', [])
-            
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown')
-            
-            email_list.append({
-                "id": msg['id'],
-                "threadId": msg['threadId'],
-                "subject": subject,
-                "from": sender,
-                "date": date,
-                "snippet": txt.get('snippet', '')
-            })
-            
-        return email_list
+        return [_email_summary(_get_message(service, msg['id'])) for msg in messages]
     except Exception as e:
         return [{"error": str(e)}]
 
-@mcp.tool()
+@threaded_tool(mcp)
+def list_email_page(query: str = "", max_results: int = 25, page_token: Optional[str] = None) -> dict:
+    """
+    One page of messages matching `query` and the token for the next page (None on the
+    last one). Lets callers walk a large listing in calls that each stay short.
+    """
+    service = get_service()
+    if not service:
+        return {"error": "Gmail service not configured."}
+
+    try:
+        results = execute(service.users().messages().list(
+            userId='me', maxResults=max_results, q=query, pageToken=page_token
+        ))
+        emails = [_email_summary(_get_message(service, msg['id'])) for msg in results.get('messages', [])]
+        return {"emails": emails, "next_page_token": results.get('nextPageToken')}
+    except Exception as e:
+        return {"error": str(e)}
+
+def _get_message(service, message_id: str) -> dict:
+    # Headers + labels only: the summary never needs the body
+    return execute(service.users().messages().get(
+        userId='me', id=message_id, format='metadata', metadataHeaders=['Subject', 'From', 'Date']
+    ))
+
+def _email_summary(txt: dict) -> dict:
+    headers = txt.get('payload', {}).get('headers', [])
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
+    date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown')
+    return {
+        "id": txt['id'],
+        "threadId": txt['threadId'],
+        "subject": subject,
+        "from": sender,
+        "date": date,
+        "snippet": txt.get('snippet', ''),
+        "labels": txt.get('labelIds', []),
+        "internalDate": txt.get('internalDate'),
+        "historyId": txt.get('historyId'),
+    }
+
+@threaded_tool(mcp)
+def list_email_changes(history_id: Optional[str] = None) -> dict:
+    """
+    Incremental sync: messages added or relabelled since `history_id` (with their current
+    summary) and ids of deleted ones, plus the history id for the next call. Without a
+    history id, only the mailbox's current history id is returned.
+    """
+    service = get_service()
+    if not service:
+        return {"error": "Gmail service not configured."}
+
+    try:
+        if not history_id:
+            profile = execute(service.users().getProfile(userId='me'))
+            return {"emails": [], "deleted": [], "history_id": profile.get('historyId')}
+
+        changed, deleted = [], set()
+        latest = history_id
+        page_token = None
+        while True:
+            result = execute(service.users().history().list(
+                userId='me', startHistoryId=history_id, pageToken=page_token,
+                historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+            ))
+            for record in result.get('history', []):
+                for item in record.get('messagesDeleted', []):
+                    deleted.add(item['message']['id'])
+                for key in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                    for item in record.get(key, []):
+                        if item['message']['id'] not in changed:
+                            changed.append(item['message']['id'])
+            latest = result.get('historyId', latest)
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+
+        emails = []
+        for message_id in changed:
+            if message_id in deleted:
+                continue
+            try:
+                emails.append(_email_summary(_get_message(service, message_id)))
+            except Exception as e:
+                # Deleted after the change was recorded
+                if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+                    deleted.add(message_id)
+                else:
+                    raise
+        return {"emails": emails, "deleted": sorted(deleted), "history_id": latest}
+    except Exception as e:
+        if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+            return {"error": "history_id_expired"}
+        return {"error": str(e)}
+
+@threaded_tool(mcp)
 def create_draft(to: str, subject: str, body: str) -> dict:
     """Create a draft email."""
     service = get_service()
@@ -96,7 +194,7 @@ def create_draft(to: str, subject: str, body: str) -> dict:
         raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
         body = {'message': {'raw': raw}}
         
-        draft = service.users().drafts().create(userId='me', body=body).execute()
+        draft = execute(service.users().drafts().create(userId='me', body=body))
         return {
             "id": draft['id'],
             "message": draft['message'],
@@ -105,5 +203,15 @@ def create_draft(to: str, subject: str, body: str) -> dict:
     except Exception as e:
         return {"error": str(e)}
 
+@mcp.tool()
+def quota_status() -> List[dict]:
+    """Upstream API pacing: available units, queue depth and wait times."""
+    return [gmail_quota.stats()]
+
 # Expose the SSE app for Uvicorn
 app = mcp.sse_app()
+# Streamable HTTP transport (served at /mcp): uvicorn <server>.server:http_app
+http_app = mcp.streamable_http_app()
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,109 @@
+"""
+Token-bucket pacing for the upstream API calls made by the MCP servers.
+
+Each upstream API gets a bucket refilled at `rate` quota units per second, up to
+`burst`. `acquire(cost)` reserves the units and sleeps until they are covered, so
+a burst of tool calls queues behind the quota instead of running into 429s; only
+a reservation that would wait longer than `max_wait` seconds raises RateLimited.
+Reservations are handed out in arrival order.
+
+FastMCP runs plain (sync) tool functions directly on its event loop, so a paced
+wait - or the blocking upstream request itself - would stall every other call,
+the transport and, with the backend's in-process transport, the backend too.
+Tools that call the upstream API are therefore registered with `threaded_tool`,
+which runs them in a worker thread; this limiter is thread-safe and blocking, and
+concurrent waiters queue on it.
+"""
+import functools
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+import anyio.to_thread
+
+# Never print: with the stdio transport, stdout is the JSON-RPC channel
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float, max_wait: float = 30.0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.calls = 0
+        self.waited_calls = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self.rejected = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1) -> float:
+        """Block until `cost` units are available; returns the seconds waited."""
+        with self._lock:
+            self._refill(time.monotonic())
+            # Tokens may go negative: that's the queue of outstanding reservations
+            wait = max(0.0, (cost - self._tokens) / self.rate)
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise RateLimited(f"{self.name} quota exhausted: next slot in {wait:.1f}s")
+            self._tokens -= cost
+            self.calls += 1
+            if wait:
+                self.waiting += 1
+                self.waited_calls += 1
+                self.total_wait += wait
+                self.max_observed_wait = max(self.max_observed_wait, wait)
+        if wait:
+            if wait >= 1:
+                logger.warning("[rate-limit] %s: waiting %.1fs for %g units (queue depth %d)",
+                               self.name, wait, cost, self.waiting)
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "name": self.name,
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "available": round(max(0.0, self._tokens), 2),
+                "queue_depth": self.waiting,
+                "calls": self.calls,
+                "waited_calls": self.waited_calls,
+                "avg_wait_seconds": round(self.total_wait / self.waited_calls, 3) if self.waited_calls else 0.0,
+                "max_wait_seconds": round(self.max_observed_wait, 3),
+                "rejected": self.rejected,
+            }
+
+
+def threaded_tool(server) -> Callable:
+    """
+    Like `@server.tool()` for a blocking function, but the registered tool runs it in a
+    worker thread. The module-level function stays a plain sync function.
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def run_in_thread(*args, **kwargs):
+            return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+        server.tool()(run_in_thread)
+        return fn
+    return decorator
+
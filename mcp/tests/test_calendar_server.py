@@ -0,0 +1,22 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from calendar_server import server
+
+
+def test_initial_change_listing_starts_today():
+    service = MagicMock()
+    service.events().list().execute.return_value = {"nextSyncToken": "sync-1"}
+    service.events().list.reset_mock()
+    with patch.object(server, "get_service", return_value=service):
+        assert server.list_event_changes() == {"events": [], "next_sync_token": "sync-1"}
+        kwargs = service.events().list.call_args.kwargs
+        assert kwargs["timeMin"] == server._today_start_utc() and kwargs["timeMin"].endswith("T00:00:00Z")
+
+        # Incremental calls can't carry timeMin alongside the sync token
+        server.list_event_changes("sync-1")
+        kwargs = service.events().list.call_args.kwargs
+        assert kwargs["syncToken"] == "sync-1" and "timeMin" not in kwargs
@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rate_limiter import RateLimited, TokenBucket
+
+
+def test_token_bucket_queues_bursts_and_rejects_long_waits():
+    bucket = TokenBucket("test", rate=100, burst=2, max_wait=0.5)
+    assert bucket.acquire() == 0 and bucket.acquire() == 0
+
+    # Over the burst: callers queue in arrival order instead of failing
+    waits = []
+    threads = [threading.Thread(target=lambda: waits.append(bucket.acquire())) for _ in range(5)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - start >= 0.04
+    assert sorted(waits)[-1] == pytest.approx(0.05, abs=0.01)
+
+    stats = bucket.stats()
+    assert stats["calls"] == 7 and stats["waited_calls"] == 5 and stats["queue_depth"] == 0
+
+    # A reservation further out than max_wait fails fast
+    with pytest.raises(RateLimited):
+        bucket.acquire(100)
+    assert bucket.stats()["rejected"] == 1
+
+
+def test_paced_tool_does_not_block_other_tool_calls():
+    import asyncio
+    from mcp.server.fastmcp import FastMCP
+    from rate_limiter import threaded_tool
+
+    server = FastMCP("test", log_level="WARNING")
+    bucket = TokenBucket("test", rate=5, burst=1, max_wait=5)
+    bucket.acquire()  # drained: the next call waits ~0.2s
+
+    @threaded_tool(server)
+    def paced() -> str:
+        bucket.acquire()
+        return "paced"
+
+    @server.tool()
+    def quick() -> str:
+        return "quick"
+
+    assert paced() == "paced"  # still a plain function when called directly
+    bucket.acquire()
+
+    async def main():
+        finished = []
+
+        async def call(name):
+            await server.call_tool(name, {})
+            finished.append((name, time.monotonic()))
+
+        start = time.monotonic()
+        await asyncio.gather(call("paced"), call("quick"))
+        return start, dict(finished), [name for name, _ in finished]
+
+    start, times, order = asyncio.run(main())
+    assert order == ["quick", "paced"]
+    assert times["quick"] - start < 0.1
+    assert times["paced"] - start >= 0.15
+
+
+def test_long_waits_are_logged_off_stdout(capfd, caplog):
+    # stdout is the JSON-RPC channel under the stdio transport
+    bucket = TokenBucket("test", rate=1000, burst=1, max_wait=5)
+    bucket.acquire()
+    bucket._tokens = -1000  # next slot ~1s out
+    with caplog.at_level("WARNING", logger="rate_limiter"):
+        assert bucket.acquire() >= 1
+    assert capfd.readouterr().out == ""
+    assert "[rate-limit] test: waiting" in caplog.text
@@ -0,0 +1,59 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from todoist_server import server
+
+
+def _task(task_id):
+    task = MagicMock()
+    task.to_dict.return_value = {"id": task_id, "content": f"Task {task_id}"}
+    return task
+
+
+def test_batch_commands_posts_to_sync_and_fetches_only_touched_tasks():
+    response = MagicMock()
+    response.json.return_value = {
+        "sync_status": {"u1": "ok", "u2": "ok", "u3": {"error": "Item not found"}},
+        "temp_id_mapping": {"t1": "101"},
+    }
+    api = MagicMock()
+    api.get_tasks.return_value = [_task("101")]
+    with patch.object(server, "_sync_session") as session, patch.object(server, "api", api):
+        session.post.return_value = response
+        result = server.batch_commands([
+            {"action": "create", "temp_id": "t1", "content": "Plan trip", "uuid": "u1"},
+            {"action": "complete", "task_id": "7", "uuid": "u2"},
+            {"action": "update", "task_id": "8", "content": "x", "uuid": "u3"},
+        ])
+
+    # Commands only: no sync_token, so nothing else in the account is downloaded
+    args, kwargs = session.post.call_args
+    assert args == (server.TODOIST_SYNC_URL,)
+    assert set(kwargs["data"]) == {"commands"}
+    assert kwargs["headers"] == {"Authorization": f"Bearer {server.api_token}"}
+
+    api.get_tasks.assert_called_once_with(ids=["101"])
+    assert result["tasks"] == [{"id": "101", "content": "Task 101"}]
+    assert [(r["id"], r.get("status"), r.get("error")) for r in result["results"]] == [
+        ("101", "ok", None), ("7", "ok", None), ("8", None, "Item not found"),
+    ]
+
+
+def test_list_tasks_charges_the_quota_per_page():
+    api = MagicMock()
+    api.get_tasks.return_value = iter([[_task("1"), _task("2")], [_task("3")]])
+    with patch.object(server, "api", api), patch.object(server, "todoist_quota") as quota:
+        tasks = server.list_tasks()
+
+    assert [t["id"] for t in tasks] == ["1", "2", "3"]
+    # One token per page, plus one for the probe that finds the paginator exhausted
+    assert quota.acquire.call_count == 3
+
+    # Older SDKs return everything from a single request
+    api.get_tasks.return_value = [_task("1")]
+    with patch.object(server, "api", api), patch.object(server, "todoist_quota") as quota:
+        assert len(server.list_tasks()) == 1
+    assert quota.acquire.call_count == 1
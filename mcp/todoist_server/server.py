@@ -1,9 +1,14 @@
 from mcp.server.fastmcp import FastMCP
 from todoist_api_python.api import TodoistAPI
 import os
+import sys
+import json
+import uuid
+import requests
 from dotenv import load_dotenv
 import dataclasses
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from rate_limiter import TokenBucket, threaded_tool
 
 # Load .env from project root (2 levels up from this file)
 # mcp/todoist_server/server.py -> mcp/todoist_server -> mcp -> root
@@ -17,22 +22,47 @@ api = TodoistAPI(api_token)
 
 mcp = FastMCP("todoist")
 
-@mcp.tool()
+# Todoist allows 1000 REST requests per user per 15 minutes
+todoist_quota = TokenBucket(
+    "todoist",
+    rate=float(os.getenv("TODOIST_QUOTA_PER_SECOND", "1")),
+    burst=float(os.getenv("TODOIST_QUOTA_BURST", "50")),
+    max_wait=float(os.getenv("QUOTA_MAX_WAIT_SECONDS", "30")),
+)
+
+def _task_pages(collection):
+    """
+    Yield the pages of a get_tasks() result, taking a quota token before each request
+    after the first (which the caller pays for). Older SDKs return one list from a
+    single request; newer ones return a paginator that fetches a page per step (the
+    last step, which finds no next page, is charged too: it can't be told apart).
+    """
+    if isinstance(collection, list):
+        yield collection
+        return
+    pages = iter(collection)
+    first = True
+    while True:
+        if not first:
+            todoist_quota.acquire()
+        first = False
+        try:
+            page = next(pages)
+        except StopIteration:
+            return
+        yield page if isinstance(page, list) else [page]
+
+@threaded_tool(mcp)
 def list_tasks():
     """List all active tasks."""
     # Let exceptions propagate so they are reported as tool errors
+    todoist_quota.acquire()
     tasks_collection = api.get_tasks()
     
     all_tasks = []
     try:
-        # Handle both direct list of tasks and paginated results
-        # If it's a list, iterating yields tasks.
-        # If it's a paginator, iterating yields pages (lists of tasks).
-        for item in tasks_collection:
-            if isinstance(item, list):
-                all_tasks.extend(item)
-            else:
-                all_tasks.append(item)
+        for page in _task_pages(tasks_collection):
+            all_tasks.extend(page)
     except Exception:
         return []
 
@@ -47,19 +77,21 @@ def list_tasks():
             results.append(str(task))
     return results
 
-@mcp.tool()
+@threaded_tool(mcp)
 def get_task(task_id: str):
     """Get a single task by ID."""
     try:
+        todoist_quota.acquire()
         task = api.get_task(task_id=task_id)
         return task.to_dict()
     except Exception as e:
         return f"Error: {str(e)}"
 
-@mcp.tool()
+@threaded_tool(mcp)
 def create_task(content: str, description: Optional[str] = None, due_string: Optional[str] = None, priority: Optional[int] = None):
     """Create a new task."""
     try:
+        todoist_quota.acquire()
         task = api.add_task(
             content=content, 
             description=description, 
@@ -70,7 +102,7 @@ def create_task(content: str, description: Optional[str] = None, due_string: Opt
     except Exception as e:
         return f"Error: {str(e)}"
 
-@mcp.tool()
+@threaded_tool(mcp)
 def update_task(task_id: str, content: Optional[str] = None, description: Optional[str] = None, due_string: Optional[str] = None, priority: Optional[int] = None):
     """Update an existing task."""
     try:
@@ -81,6 +113,7 @@ def update_task(task_id: str, content: Optional[str] = None, description: Option
         if due_string is not None: kwargs['due_string'] = due_string
         if priority is not None: kwargs['priority'] = priority
         
+        todoist_quota.acquire(2)  # update + re-fetch
         is_success = api.update_task(task_id=task_id, **kwargs)
         if is_success:
             task = api.get_task(task_id=task_id)
@@ -89,26 +122,125 @@ def update_task(task_id: str, content: Optional[str] = None, description: Option
     except Exception as e:
         return f"Error: {str(e)}"
 
-@mcp.tool()
+@threaded_tool(mcp)
 def delete_task(task_id: str):
     """Delete a task."""
     try:
+        todoist_quota.acquire()
         is_success = api.delete_task(task_id=task_id)
         return {"success": is_success, "id": task_id}
     except Exception as e:
         return f"Error: {str(e)}"
 
-@mcp.tool()
+@threaded_tool(mcp)
 def complete_task(task_id: str):
     """Complete (close) a task. Also known as finish or mark as completed."""
     try:
+        todoist_quota.acquire()
         is_success = api.close_task(task_id=task_id)
         return {"success": is_success, "id": task_id}
     except Exception as e:
         return f"Error: {str(e)}"
 
+# Sync API: at most 100 commands per request. Called directly (not through the SDK's
+# internals), with a session of our own so connections are reused
+TODOIST_SYNC_URL = os.getenv("TODOIST_SYNC_URL", "https://api.todoist.com/sync/v9/sync")
+MAX_BATCH_COMMANDS = 100
+_sync_session = requests.Session()
+
+def _sync_command(op: Dict[str, Any]) -> Dict[str, Any]:
+    """One batch_commands operation -> Sync API command (item_add/item_update/item_move/item_delete/item_close)."""
+    action = op.get("action")
+    fields = {k: op[k] for k in ("content", "description", "priority") if op.get(k) is not None}
+    if op.get("due_string") is not None:
+        fields["due"] = {"string": op["due_string"]}
+    command = {"uuid": op.get("uuid") or str(uuid.uuid4())}
+    if action == "create":
+        parents = {k: op[k] for k in ("project_id", "section_id", "parent_id") if op.get(k) is not None}
+        command.update(type="item_add", temp_id=op.get("temp_id") or str(uuid.uuid4()), args={**fields, **parents})
+    elif action == "update":
+        command.update(type="item_update", args={"id": op["task_id"], **fields})
+    elif action == "move":
+        # Exactly one destination
+        target = next((k for k in ("parent_id", "section_id", "project_id") if op.get(k) is not None), None)
+        if target is None:
+            raise ValueError("move needs a project_id, section_id or parent_id")
+        command.update(type="item_move", args={"id": op["task_id"], target: op[target]})
+    elif action == "delete":
+        command.update(type="item_delete", args={"id": op["task_id"]})
+    elif action == "complete":
+        command.update(type="item_close", args={"id": op["task_id"]})
+    else:
+        raise ValueError(f"unknown action {action!r}")
+    return command
+
+@threaded_tool(mcp)
+def batch_commands(commands: List[dict]):
+    """
+    Apply many task changes in one Todoist Sync API request.
+    Each command: {"action": "create"|"update"|"move"|"delete"|"complete", "task_id", "temp_id",
+    "content", "description", "due_string", "priority", "project_id", "section_id", "parent_id", "uuid"}.
+    A create's temp_id can be used as task_id/parent_id by later commands in the same batch.
+    Commands with the same uuid are applied only once, so a batch can be resent safely.
+    Returns {"results": [{uuid, action, id, status|error}], "temp_id_mapping", "tasks"} where
+    tasks holds the current state of the created/updated/moved tasks.
+    """
+    if len(commands) > MAX_BATCH_COMMANDS:
+        return {"error": f"At most {MAX_BATCH_COMMANDS} commands per batch, got {len(commands)}"}
+    try:
+        sync_commands = [_sync_command(op) for op in commands]
+    except (KeyError, ValueError) as e:
+        return {"error": f"Invalid command: {e}"}
+
+    try:
+        todoist_quota.acquire()
+        response = _sync_session.post(
+            TODOIST_SYNC_URL,
+            headers={"Authorization": f"Bearer {api_token}"},
+            data={"commands": json.dumps(sync_commands)},
+            timeout=30,
+        )
+        response.raise_for_status()
+        data = response.json()
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+    mapping = data.get("temp_id_mapping", {})
+    statuses = data.get("sync_status", {})
+    results, touched = [], set()
+    for op, command in zip(commands, sync_commands):
+        task_id = command.get("args", {}).get("id") or command.get("temp_id")
+        task_id = mapping.get(task_id, task_id)
+        result = {"uuid": command["uuid"], "action": op["action"], "id": task_id}
+        status = statuses.get(command["uuid"])
+        if status == "ok":
+            result["status"] = "ok"
+            if op["action"] in ("create", "update", "move"):
+                touched.add(task_id)
+        else:
+            result["error"] = (status or {}).get("error", "no status returned") if isinstance(status, dict) else str(status)
+        results.append(result)
+
+    # Only the touched tasks, in one REST request
+    tasks = []
+    if touched:
+        try:
+            todoist_quota.acquire()
+            tasks = [task.to_dict() for page in _task_pages(api.get_tasks(ids=sorted(touched))) for task in page]
+        except Exception as e:
+            # The commands went through; the caller's next sync picks up their state
+            print(f"Error fetching batch results: {e}", file=sys.stderr)
+    return {"results": results, "temp_id_mapping": mapping, "tasks": tasks}
+
+@mcp.tool()
+def quota_status() -> List[dict]:
+    """Upstream API pacing: available units, queue depth and wait times."""
+    return [todoist_quota.stats()]
+
 # Expose the SSE ASGI app for Uvicorn
 app = mcp.sse_app()
+# Streamable HTTP transport (served at /mcp): uvicorn <server>.server:http_app
+http_app = mcp.streamable_http_app()
 
 if __name__ == "__main__":
     mcp.run()